@@ -1,9 +1,5 @@
 
 import streamlit as st
-import networkx as nx
-from pyvis.network import Network
-import tempfile
-import time
 from datetime import datetime
 import numpy as np
 import sys
@@ -15,11 +11,13 @@ sys.path.append(str(Path(__file__).parent.parent))
 # Importa módulos del proyecto
 from src.agent.functions import FUNCTION_REGISTRY
 from src.agent.dependency_resolver import DependencyResolver
-from src.agent.planner_agent import embedding_model, cosine_similarity
+from src.agent.planner_agent import get_embedding_model, FUNCTION_DESCRIPTIONS
+from src.agent.embedding_index import DescriptionIndex, encode_query
 
 # Importa estilos y templates SEPARADOS
 from styles import CSS_STYLES, header_html, success_banner_html, footer_html, SIDEBAR_INFO, SIDEBAR_FOOTER
 from templates import log_entry_html, plan_step_html, metric_card_html, documentation_html
+from graph_view import load_neighborhood, render_graph_html, dependency_rows
 
 # ========== CONFIGURACIÓN INICIAL ==========
 st.set_page_config(
@@ -33,59 +31,65 @@ st.set_page_config(
 st.markdown(CSS_STYLES, unsafe_allow_html=True)
 
 # ========== COMPONENTES REUTILIZABLES ==========
+# Tiempo de vida de los datos cacheados que dependen de Neo4j (segundos)
+CACHE_TTL = 300
+
 @st.cache_resource
 def get_resolver():
     """Obtiene instancia singleton del resolver (evita reconexiones)"""
     return DependencyResolver()
 
-def visualize_graph(plan_functions: list, target_function: str):
-    """Visualiza el grafo de dependencias usando PyVis"""
-    G = nx.DiGraph()
+@st.cache_resource(show_spinner=False)
+def get_description_index():
+    """Matriz de descripciones normalizada: se codifica una vez por proceso"""
+    return DescriptionIndex.from_descriptions(get_embedding_model(), FUNCTION_DESCRIPTIONS)
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def select_function(user_query: str):
+    """Embedding + búsqueda semántica cacheados por texto del query"""
+    return get_description_index().best(encode_query(get_embedding_model(), user_query))
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_plan(target_function: str):
+    """Plan de ejecución cacheado por función objetivo"""
+    return get_resolver().get_execution_plan(target_function)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_namespaces():
+    """Particiones del catálogo (namespace → número de funciones)"""
+    return get_resolver().list_namespaces()
+
+def invalidate_caches():
+    """Invalida explícitamente los datos cacheados (p. ej. tras modificar el grafo)"""
+    get_description_index.clear()
+    select_function.clear()
+    get_plan.clear()
+    get_namespaces.clear()
+    load_neighborhood.clear()
+    render_graph_html.clear()
+
+def visualize_graph(plan_functions: list, target_function: str, hops: int = 1, max_nodes: int = 500,
+                    namespace: str = None):
+    """
+    Visualiza la vecindad del plan usando PyVis (layout precalculado, HTML en memoria)
     
+    Retorna el snapshot dibujado para que la tabla de dependencias use el mismo.
+    """
     resolver = get_resolver()
-    with resolver.driver.session() as session:
-        result = session.run("""
-            MATCH (f:Function)-[:REQUIRES]->(dep:Function)
-            RETURN f.name AS from, dep.name AS to
-        """)
-        for record in result:
-            G.add_edge(record["from"], record["to"])
-    
-    net = Network(
-        height='500px',
-        width='100%',
-        directed=True,
-        bgcolor='#ffffff',
-        font_color='#000000'
-    )
-    net.from_nx(G)
-    
-    for node in net.nodes:
-        if node['id'] == target_function:
-            node['color'] = '#ff5252'
-            node['size'] = 25
-        elif node['id'] in plan_functions:
-            node['color'] = '#4caf50'
-            node['size'] = 20
-        else:
-            node['color'] = '#2196f3'
-            node['size'] = 15
-        node['title'] = f"Función: {node['id']}"
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as f:
-        net.save_graph(f.name)
-        with open(f.name, 'r', encoding='utf-8') as html_file:
-            html_content = html_file.read()
-        st.components.v1.html(html_content, height=500)
+    requires = load_neighborhood(resolver, target_function, hops, max_nodes, resolver.relationship, namespace)
+    if len(requires) >= max_nodes:
+        st.warning(f"Vecindad truncada a {max_nodes} nodos; reduce los saltos para ver el detalle")
+    html_content = render_graph_html(requires, tuple(plan_functions), target_function)
+    st.components.v1.html(html_content, height=500)
+    return requires
 
 def execute_plan(target_function: str):
     """Ejecuta el plan completo y retorna logs + resultados"""
-    resolver = get_resolver()
     logs = []
     results = {}
     
     logs.append(("GRAPH", f"Resolviendo dependencias para '{target_function}'"))
-    plan = resolver.get_execution_plan(target_function)
+    plan = get_plan(target_function)
     logs.append(("GRAPH", f"Plan generado con {len(plan)} pasos"))
     
     for i, step in enumerate(plan, 1):
@@ -125,6 +129,9 @@ with st.sidebar:
     st.image("https://dist.neo4j.com/wp-content/uploads/2024/03/neo4j-logo-2024.svg", width=150)
     st.markdown("<div class='sidebar-title'>ℹ️ Información</div>", unsafe_allow_html=True)
     st.markdown(SIDEBAR_INFO)
+    if st.button("🔄 Limpiar cachés", use_container_width=True):
+        invalidate_caches()
+        st.success("Cachés invalidadas: se recargarán desde Neo4j")
     st.markdown(SIDEBAR_FOOTER)
 
 # Tabs principales
@@ -146,27 +153,11 @@ with tab1:
     
     if execute_btn and user_query:
         with st.spinner("🧠 Procesando solicitud..."):
-            st.info(f"Generando embedding para: '{user_query}'")
-            query_embedding = embedding_model.encode([user_query])[0]
-            
-            st.info("Realizando búsqueda semántica...")
-            function_descriptions = [
-                {"name": "obtenerInfoCliente", "desc": "Obtener información del cliente por ID o nombre"},
-                {"name": "obtenerInfoProducto", "desc": "Obtener información del producto por SKU o nombre"},
-                {"name": "verificarStock", "desc": "Verificar disponibilidad de stock del producto"},
-                {"name": "calcularPrecioTotal", "desc": "Calcular el precio total incluyendo impuestos y descuentos"},
-                {"name": "crearPedido", "desc": "Crear un nuevo pedido en el sistema"},
-                {"name": "enviarConfirmacion", "desc": "Enviar correo de confirmación al cliente"}
-            ]
-            desc_embeddings = embedding_model.encode([f["desc"] for f in function_descriptions])
-            similarities = cosine_similarity(query_embedding.reshape(1, -1), desc_embeddings)[0]
-            best_idx = int(similarities.argmax())
-            target_function = function_descriptions[best_idx]["name"]
-            confidence = float(similarities[best_idx])
+            st.info(f"Generando embedding y búsqueda semántica para: '{user_query}'")
+            target_function, confidence = select_function(user_query)
             
             st.success(f"🎯 Función objetivo seleccionada: **{target_function}** (confianza: {confidence:.2%})")
             
-            time.sleep(1)
             logs, plan, response, results = execute_plan(target_function)
             
             st.markdown("---")
@@ -200,16 +191,23 @@ with tab1:
 with tab2:
     st.subheader("🕸️ Grafo de dependencias de funciones")
     
-    resolver = get_resolver()
     target_func = st.selectbox(
         "Selecciona la función objetivo para visualizar su plan:",
         ["crearPedido", "enviarConfirmacion", "verificarStock", "calcularPrecioTotal", "obtenerInfoCliente", "obtenerInfoProducto"],
         index=0
     )
+    hops_col, limit_col, namespace_col = st.columns(3)
+    with hops_col:
+        hops = st.slider("Saltos de vecindad alrededor del plan (k):", 0, 3, 1)
+    with limit_col:
+        max_nodes = st.number_input("Máximo de nodos a dibujar:", min_value=10, max_value=5000, value=500, step=50)
+    with namespace_col:
+        namespace = st.selectbox("Namespace:", ["(todos)"] + list(get_namespaces()), index=0)
+    namespace = None if namespace == "(todos)" else namespace
     
     if st.button("📊 Visualizar grafo", type="secondary"):
         with st.spinner("Cargando grafo desde Neo4j..."):
-            plan = resolver.get_execution_plan(target_func)
+            plan = get_plan(target_func)
             plan_functions = [step['name'] for step in plan]
             
             st.info(f"Plan para `{target_func}`: {len(plan)} pasos")
@@ -223,21 +221,16 @@ with tab2:
                 st.metric("Dependencias", len(plan) - 1 if len(plan) > 0 else 0)
             
             st.subheader("Visualización interactiva del grafo")
-            visualize_graph(plan_functions, target_func)
+            requires = visualize_graph(plan_functions, target_func, hops=hops, max_nodes=int(max_nodes), namespace=namespace)
             
+            # Misma vecindad que el grafo dibujado: nunca la tabla del grafo completo
             st.subheader("📋 Dependencias detalladas")
-            with resolver.driver.session() as session:
-                result = session.run("""
-                    MATCH (f:Function)-[r:REQUIRES]->(dep:Function)
-                    RETURN f.name AS funcion, dep.name AS dependencia
-                    ORDER BY f.name
-                """)
-                deps = [{"funcion": r["funcion"], "dependencia": r["dependencia"]} for r in result]
+            deps = dependency_rows(requires)
             
             if deps:
                 st.dataframe(deps, use_container_width=True)
             else:
-                st.warning("No se encontraron dependencias en el grafo")
+                st.warning("No se encontraron dependencias en la vecindad")
 
 # ========== TAB 3: DOCUMENTACIÓN ==========
 with tab3:
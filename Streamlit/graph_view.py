@@ -0,0 +1,89 @@
+"""
+Visualización escalable del grafo de dependencias
+Vecindad acotada + snapshots cacheados + layout precalculado en el servidor + HTML en memoria
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+from pyvis.network import Network
+
+from src.agent.graph_utils import topological_waves
+
+# Tiempo de vida de los snapshots de aristas (segundos)
+SNAPSHOT_TTL = 300
+X_SPACING = 220
+Y_SPACING = 90
+
+
+@st.cache_data(ttl=SNAPSHOT_TTL, show_spinner=False)
+def load_neighborhood(_resolver, target_function: str, hops: int, max_nodes: int,
+                      relationship: str, namespace: Optional[str] = None) -> Dict[str, List[str]]:
+    """Snapshot cacheado de aristas: cierre del plan + k saltos (no hashea el resolver)"""
+    return _resolver.get_neighborhood(
+        target_function, hops=hops, max_nodes=max_nodes, relationship=relationship, namespace=namespace
+    )
+
+
+def dependency_rows(requires: Dict[str, List[str]]) -> List[Dict[str, str]]:
+    """Tabla funcion → dependencia del mismo snapshot que se dibuja (sin otra consulta)"""
+    return [
+        {"funcion": name, "dependencia": dep}
+        for name in sorted(requires)
+        for dep in requires[name]
+    ]
+
+
+def layered_layout(requires: Dict[str, List[str]]) -> Dict[str, Tuple[int, int]]:
+    """
+    Layout por capas topológicas, O(V + E)
+
+    Las dependencias quedan a la izquierda y quien las requiere a la derecha.
+    Se calcula en el servidor para que el navegador no simule física.
+    """
+    try:
+        waves = topological_waves(requires)
+    except ValueError:
+        # Grafo con ciclos: cuadrícula simple para no bloquear la vista
+        names = sorted(requires)
+        width = max(1, int(len(names) ** 0.5))
+        waves = [names[i:i + width] for i in range(0, len(names), width)]
+
+    positions = {}
+    for x, wave in enumerate(waves):
+        offset = (len(wave) - 1) * Y_SPACING / 2
+        for y, name in enumerate(wave):
+            positions[name] = (x * X_SPACING, int(y * Y_SPACING - offset))
+    return positions
+
+
+@st.cache_data(ttl=SNAPSHOT_TTL, show_spinner=False)
+def render_graph_html(requires: Dict[str, List[str]], plan_functions: Tuple[str, ...], target_function: str) -> str:
+    """Genera el HTML de PyVis en memoria (sin archivos temporales)"""
+    positions = layered_layout(requires)
+    plan_set = set(plan_functions)
+
+    net = Network(
+        height='500px',
+        width='100%',
+        directed=True,
+        bgcolor='#ffffff',
+        font_color='#000000',
+        cdn_resources='remote'
+    )
+    for name, (x, y) in positions.items():
+        if name == target_function:
+            color, size = '#ff5252', 25
+        elif name in plan_set:
+            color, size = '#4caf50', 20
+        else:
+            color, size = '#2196f3', 15
+        net.add_node(name, label=name, color=color, size=size, x=x, y=y, title=f"Función: {name}")
+    for name, deps in requires.items():
+        for dep in deps:
+            if dep in positions:
+                net.add_edge(name, dep)
+
+    # Posiciones fijas: el navegador solo pinta, no estabiliza
+    net.toggle_physics(False)
+    return net.generate_html()
@@ -0,0 +1,149 @@
+"""
+Catálogos particionados por namespace
+Cada partición (propiedad namespace de los nodos Function) tiene su propio
+índice de embeddings y una instantánea en memoria de sus dependencias. Se carga
+al primer uso y se desaloja (LRU) al superar el número de particiones o el
+presupuesto de memoria. Un request enrutado a un namespace solo busca y recorre
+su partición, sin consultas de grafo por request.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.agent.embedding_index import DescriptionIndex
+from src.agent.memory_resolver import InMemoryResolver
+from src.agent.single_flight import SingleFlight
+
+
+def _partition_bytes(index: DescriptionIndex, functions: List[Dict]) -> int:
+    """Estimación del tamaño en memoria: matriz de embeddings + catálogo"""
+    catalog = sum(
+        len(f["name"]) + len(f["description"] or "") + 64 * (1 + len(f["requires"]))
+        for f in functions
+    )
+    return index.matrix.nbytes + catalog
+
+
+class PartitionedCatalog:
+    """Particiones del catálogo cargadas bajo demanda con desalojo LRU"""
+
+    def __init__(self, source, model, max_partitions: int = 8, max_bytes: int = 0):
+        if max_partitions < 1:
+            raise ValueError("❌ max_partitions debe ser >= 1")
+        # source: DependencyResolver o InMemoryResolver (get_function_graph(namespace=...))
+        self.source = source
+        self.model = model
+        self.max_partitions = max_partitions
+        self.max_bytes = max_bytes
+        self._partitions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Requests concurrentes al mismo namespace frío lo cargan una sola vez
+        self._loading = SingleFlight()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def partition(self, namespace: str) -> Dict[str, Any]:
+        """
+        Partición del namespace (la carga si no está en memoria)
+
+        Returns:
+            {namespace, names, index, resolver, bytes, external_edges}
+        """
+        with self._lock:
+            entry = self._partitions.get(namespace)
+            if entry is not None:
+                self._partitions.move_to_end(namespace)
+                self.hits += 1
+                return entry
+        entry, _ = self._loading.do(("partition", namespace), lambda: self._load_and_store(namespace))
+        return entry
+
+    def loaded(self, namespace: str) -> Optional[Dict[str, Any]]:
+        """Partición si ya está en memoria (sin cargarla ni tocar el orden LRU)"""
+        with self._lock:
+            return self._partitions.get(namespace)
+
+    def _load_and_store(self, namespace: str) -> Dict[str, Any]:
+        entry = self._load(namespace)
+        with self._lock:
+            self._partitions[namespace] = entry
+            self.loads += 1
+            self._evict_over_budget()
+        return entry
+
+    def _load(self, namespace: str) -> Dict[str, Any]:
+        graph = self.source.get_function_graph(namespace=namespace)
+        if not graph:
+            raise ValueError(f"❌ Namespace '{namespace}' sin funciones")
+        names = {f["name"] for f in graph}
+        external = sorted((f["name"], dep) for f in graph for dep in f["requires"] if dep not in names)
+        if external:
+            # La partición debe ser cerrada: lo que apunta fuera no se recorre
+            sample = ", ".join(f"{name} → {dep}" for name, dep in external[:5])
+            print(f"⚠️  '{namespace}': {len(external)} dependencias fuera de la partición ignoradas ({sample})")
+
+        functions = [
+            {
+                "name": f["name"],
+                "description": f["description"],
+                "requires": [dep for dep in f["requires"] if dep in names],
+                "optional": [dep for dep in f.get("optional") or [] if dep in names],
+                "avg_duration_ms": f.get("avg_duration_ms"),
+                "exec_count": f.get("exec_count"),
+                "namespace": namespace,
+            }
+            for f in graph
+        ]
+
+        # Embeddings guardados en Neo4j si están completos; si no, se codifican una vez
+        stored = [f.get("embedding") or [] for f in graph]
+        if len({len(vector) for vector in stored}) == 1 and stored[0]:
+            matrix = np.asarray(stored, dtype=np.float32)
+        else:
+            matrix = self.model.encode(
+                [f["description"] for f in graph], normalize_embeddings=True, convert_to_numpy=True
+            )
+        index = DescriptionIndex([f["name"] for f in graph], matrix)
+
+        return {
+            "namespace": namespace,
+            "names": names,
+            "index": index,
+            "resolver": InMemoryResolver(functions),
+            "bytes": _partition_bytes(index, functions),
+            "external_edges": external,
+        }
+
+    def _evict_over_budget(self):
+        """Desaloja las menos usadas (nunca la recién cargada, que queda al final)"""
+        while len(self._partitions) > 1 and (
+            len(self._partitions) > self.max_partitions
+            or (self.max_bytes > 0 and self._total_bytes() > self.max_bytes)
+        ):
+            self._partitions.popitem(last=False)
+            self.evictions += 1
+
+    def _total_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self._partitions.values())
+
+    def evict(self, namespace: Optional[str] = None):
+        """Descarta una partición (o todas) p. ej. tras cambiar el grafo"""
+        with self._lock:
+            if namespace is None:
+                self._partitions.clear()
+            else:
+                self._partitions.pop(namespace, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": list(self._partitions),
+                "bytes": self._total_bytes(),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,204 @@
+"""
+Ejecución por flujo de datos (dataflow) con futures
+Cada paso tiene un Future; un paso se lanza en el instante en que se resuelven
+los futures de sus dependencias (callbacks, sin bucle coordinador ni oleadas)
+y recibe las salidas que declara en FUNCTION_INPUTS por referencia, sin copias.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, InvalidStateError, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from src.agent.functions import FUNCTION_INPUTS
+from src.agent.graph_utils import build_dependents, step_sources
+
+
+class StepTimeoutError(TimeoutError):
+    """Un paso superó su timeout (o depende de uno que lo superó)"""
+
+
+class DataflowExecutor:
+    """Ejecuta un plan disparando cada paso desde los futures de sus entradas"""
+
+    def __init__(self, max_workers: int = 4, inputs: Mapping[str, Dict[str, str]] = FUNCTION_INPUTS):
+        self.max_workers = max_workers
+        # Entradas declaradas: {función: {parámetro: función productora}}
+        self.inputs = inputs
+
+    def input_sources(self, plan: List[Dict]) -> Dict[str, List[str]]:
+        """Futures que espera cada paso: sus [:REQUIRES] más sus entradas declaradas"""
+        names = {step["name"] for step in plan}
+        sources = {}
+        for step in plan:
+            declared = set(self.inputs.get(step["name"], {}).values())
+            # Una dependencia opcional podada por presupuesto simplemente no llega
+            missing = declared - names - set(step.get("optional_requires", []))
+            if missing:
+                raise ValueError(
+                    f"❌ {step['name']} declara entradas fuera del plan: {', '.join(sorted(missing))}"
+                )
+            sources[step["name"]] = sorted(step_sources(step, self.inputs) & names)
+        return sources
+
+    def execute(self, plan: List[Dict], run_step: Callable[[str, Dict[str, Any]], Any],
+                deadline: Optional[float] = None, step_timeout_s: Optional[float] = None,
+                pool: Optional[Executor] = None) -> Tuple[Dict[str, Any], Dict[str, float], List[str]]:
+        """
+        Misma interfaz que CostAwareScheduler.execute
+
+        Args:
+            plan: Pasos con {name, requires}
+            run_step: Callable(nombre, {función productora: salida}) que retorna el resultado
+            deadline: Instante límite (time.monotonic()); al vencer no se lanzan más pasos
+            step_timeout_s: Tiempo máximo por paso; el vencimiento se propaga a los dependientes
+                que lo requieren como obligatorio, los que lo tienen como opcional corren sin él
+            pool: Pool de larga vida compartido entre requests (sin él se crea uno por plan)
+
+        Returns:
+            (resultados por función, duraciones medidas en ms, orden de finalización)
+            Los pasos vencidos u omitidos no aparecen en los resultados.
+        """
+        sources = self.input_sources(plan)
+        dependents = build_dependents(sources)
+        mandatory = {step["name"]: set(step.get("requires", [])) - set(step.get("optional_requires", []))
+                     for step in plan}
+        futures: Dict[str, Future] = {name: Future() for name in sources}
+        remaining = {name: len(deps) for name, deps in sources.items()}
+        durations: Dict[str, float] = {}
+        completed: List[str] = []
+        started: Dict[str, float] = {}
+        timed_out = set()
+        stop = threading.Event()
+        lock = threading.Lock()
+        own_pool = pool is None
+        if own_pool:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dataflow")
+        submitted: List[Future] = []
+        # Con el pool compartido el límite del plan lo impone esta cola: a lo sumo max_workers en curso
+        ready: List[str] = []
+        inflight = [0]
+
+        def launch(name: str):
+            # Siempre bajo el lock
+            if stop.is_set():
+                return
+            if inflight[0] < self.max_workers:
+                inflight[0] += 1
+                submitted.append(pool.submit(run, name))
+            else:
+                ready.append(name)
+
+        def run(name: str):
+            try:
+                if not stop.is_set():
+                    execute_step(name)
+            finally:
+                with lock:
+                    inflight[0] -= 1
+                    if ready:
+                        launch(ready.pop(0))
+
+        def execute_step(name: str):
+            if futures[name].done():
+                return  # Ya resuelto por el vencimiento de una dependencia obligatoria
+            # Las entradas ya están resueltas: result() no bloquea y no copia;
+            # una opcional vencida simplemente no llega
+            dep_outputs = {dep: futures[dep].result() for dep in sources[name]
+                           if futures[dep].exception() is None}
+            with lock:
+                started[name] = time.monotonic()
+            start = time.perf_counter()
+            try:
+                value = run_step(name, dep_outputs)
+            except BaseException as e:
+                with lock:
+                    if name in timed_out:
+                        return
+                _settle(futures[name], error=e)
+                return
+            with lock:
+                if name in timed_out:
+                    return  # Llegó tarde: el future ya se resolvió con StepTimeoutError
+                durations[name] = (time.perf_counter() - start) * 1000
+                completed.append(name)
+            futures[name].set_result(value)
+
+        def on_done(name: str, future: Future):
+            if stop.is_set():
+                return
+            error = future.exception()
+            for dependent in dependents.get(name, []):
+                optional_timeout = isinstance(error, StepTimeoutError) and name not in mandatory[dependent]
+                if error is not None and not optional_timeout:
+                    # El fallo se propaga para que nadie espere una entrada que no llegará
+                    _settle(futures[dependent], error=error)
+                    continue
+                with lock:
+                    if futures[dependent].done():
+                        continue  # Ya falló por otra entrada: no se lanza
+                    remaining[dependent] -= 1
+                    # Bajo el lock: tras el cierre (deadline) ya no se agenda nada
+                    if remaining[dependent] == 0:
+                        launch(dependent)
+
+        for name, future in futures.items():
+            future.add_done_callback(partial(on_done, name))
+        try:
+            with lock:
+                for name, count in remaining.items():
+                    if count == 0:
+                        launch(name)
+            pending = set(futures.values())
+            while pending:
+                timeout = None
+                if deadline is not None or step_timeout_s is not None:
+                    with lock:
+                        limits = [started[name] + step_timeout_s for name in started
+                                  if step_timeout_s is not None and not futures[name].done()]
+                    if step_timeout_s is not None:
+                        # Un paso aún en cola del pool vence como muy pronto dentro de step_timeout_s
+                        limits.append(time.monotonic() + step_timeout_s)
+                    if deadline is not None:
+                        limits.append(deadline)
+                    timeout = max(0.0, min(limits) - time.monotonic()) if limits else None
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                _, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if step_timeout_s is not None:
+                    now = time.monotonic()
+                    with lock:
+                        expired = [name for name, at in started.items()
+                                   if now - at >= step_timeout_s and name not in durations and name not in timed_out]
+                        timed_out.update(expired)
+                    for name in expired:
+                        _settle(futures[name], error=StepTimeoutError(f"{name} superó {step_timeout_s:.3f} s"))
+        finally:
+            with lock:
+                stop.set()
+            if own_pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                for future in submitted:
+                    future.cancel()  # Solo los que aún esperan un worker del pool compartido
+
+        results = {}
+        for name, future in futures.items():
+            if not future.done():
+                continue
+            error = future.exception()
+            if isinstance(error, StepTimeoutError):
+                continue
+            if error is not None:
+                raise error
+            results[name] = future.result()
+        return results, durations, completed
+
+
+def _settle(future: Future, error: BaseException):
+    """Resuelve el future con un error salvo que otra entrada ya lo haya resuelto"""
+    try:
+        future.set_exception(error)
+    except InvalidStateError:
+        pass
@@ -6,30 +6,135 @@ Paso 3 del EXAMEN VAN LOS PLANEERS: Exploración del grafo y creación de plan
 from neo4j import GraphDatabase
 from typing import List, Dict, Optional
 import os
+import re
+import threading
 from dotenv import load_dotenv
 
+from src.agent.graph_utils import topological_order
+
 load_dotenv()
 
+# Relación de dependencias que recorren los planes: REQUIRES completo o la
+# reducción transitiva derivada (REQUIRES_MIN, ver src/agent/graph_reduction.py)
+REQUIRES_RELATIONSHIP = os.getenv("NEO4J_REQUIRES_REL", "REQUIRES")
+
+# Partición de los nodos Function sin propiedad namespace
+DEFAULT_NAMESPACE = os.getenv("AGENT_DEFAULT_NAMESPACE", "default")
+
+# Estadísticas de ejecución: se acumulan en memoria y se vuelcan cada N segundos
+# (0 = una escritura por request) o antes si se juntan N observaciones
+COST_FLUSH_INTERVAL_S = float(os.getenv("NEO4J_COST_FLUSH_S", "5"))
+COST_FLUSH_BATCH = int(os.getenv("NEO4J_COST_FLUSH_BATCH", "200"))
+
+
+def plans_query(relationship: str = "REQUIRES") -> str:
+    """Consulta base: cierre transitivo de cada objetivo con dependencias directas"""
+    return f"""
+UNWIND $targets AS target_name
+MATCH (target:Function {{name: target_name}})
+CALL apoc.path.subgraphNodes(target, {{
+    relationshipFilter: '{relationship}>',
+    minLevel: 0
+}}) YIELD node
+// Dependencias directas de cada nodo (para ordenar y planificar)
+// r.optional marca enriquecimientos que se pueden podar si falta presupuesto
+OPTIONAL MATCH (node)-[r:{relationship}]->(dep)
+WITH target_name, node, collect(dep.name) AS requires,
+     collect(CASE WHEN r.optional THEN dep.name END) AS optional_requires
+RETURN target_name, collect({{
+    name: node.name,
+    description: node.description,
+    requires: requires,
+    optional_requires: optional_requires,
+    avg_duration_ms: node.avg_duration_ms,
+    exec_count: node.exec_count
+}}) AS steps
+"""
+
+
+PLANS_QUERY = plans_query()
+
+
+def ewma_batch(samples: List[float], alpha: float) -> Dict[str, float]:
+    """
+    Varias observaciones de la EWMA aplicadas de una vez
+
+    Aplicar x1..xk en orden equivale a avg * decay + weighted; si aún no hay
+    promedio, `seed` es la EWMA que parte de x1.
+    """
+    decay, weighted, seed = 1.0, 0.0, None
+    for x in samples:
+        decay *= 1 - alpha
+        weighted = weighted * (1 - alpha) + x * alpha
+        seed = x if seed is None else seed * (1 - alpha) + x * alpha
+    return {"count": len(samples), "decay": decay, "weighted": weighted, "seed": seed, "last": samples[-1]}
+
+
+def _check_relationship(relationship: str) -> str:
+    # El tipo de relación no admite parámetros en Cypher: solo identificadores simples
+    if not re.fullmatch(r"[A-Z_][A-Z0-9_]*", relationship):
+        raise ValueError(f"❌ Tipo de relación inválido: {relationship!r}")
+    return relationship
+
 class DependencyResolver:
     """Resuelve dependencias transitivas y genera plan ordenado topológicamente"""
     
-    def __init__(self, uri: str = None, user: str = None, password: str = None):
+    def __init__(self, uri: str = None, user: str = None, password: str = None,
+                 max_pool_size: int = None, acquisition_timeout: float = None,
+                 max_retry_time: float = None, verify: bool = True,
+                 relationship: str = None, cost_flush_interval_s: float = None,
+                 cost_flush_batch: int = None):
         self.uri = uri or os.getenv("NEO4J_URI", "bolt://localhost:7687")
         self.user = user or os.getenv("NEO4J_USER", "neo4j")
         self.password = password or os.getenv("NEO4J_PASSWORD", "password123")
-        self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
-        self._verify_connection()
+        self.relationship = _check_relationship(relationship or REQUIRES_RELATIONSHIP)
+        self._plans_query = plans_query(self.relationship)
+        self.driver = GraphDatabase.driver(
+            self.uri,
+            auth=(self.user, self.password),
+            max_connection_pool_size=max_pool_size or int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")),
+            connection_acquisition_timeout=acquisition_timeout or float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60")),
+            # Reintentos de transacciones administradas (execute_read / execute_write)
+            max_transaction_retry_time=max_retry_time or float(os.getenv("NEO4J_MAX_RETRY_TIME", "15"))
+        )
+        # Costos pendientes de volcar {función: [duraciones ms]}; los escribe un hilo propio
+        self.cost_flush_interval_s = COST_FLUSH_INTERVAL_S if cost_flush_interval_s is None else cost_flush_interval_s
+        self.cost_flush_batch = cost_flush_batch or COST_FLUSH_BATCH
+        self._pending_costs: Dict[str, List[float]] = {}
+        self._pending_count = 0
+        self._pending_alpha = None
+        self._costs_lock = threading.Lock()
+        self._flush_now = threading.Event()
+        self._flusher = None
+        self._closed = False
+        if verify:
+            self._verify_connection()
     
     def _verify_connection(self):
-        """Verifica que Neo4j esté accesible"""
+        """Verifica que Neo4j esté accesible (handshake del driver, sin consulta)"""
         try:
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            self.driver.verify_connectivity()
             print("✅ Conexión a Neo4j establecida")
         except Exception as e:
             raise ConnectionError(f"❌ No se puede conectar a Neo4j: {e}")
     
-    def get_execution_plan(self, target_function: str) -> List[Dict[str, str]]:
+    def _read(self, query: str, **params) -> List[Dict]:
+        """
+        Transacción administrada de lectura (con reintentos ante fallos transitorios)
+        
+        Sesión por llamada: es liviana, la conexión sale del pool acotado del driver
+        y vuelve a él al cerrar; ningún hilo (requests, reruns de Streamlit) retiene
+        sesiones ni conexiones entre llamadas.
+        """
+        with self.driver.session() as session:
+            return session.execute_read(lambda tx: tx.run(query, **params).data())
+    
+    def _write(self, query: str, **params) -> List[Dict]:
+        """Transacción administrada de escritura (con reintentos ante fallos transitorios)"""
+        with self.driver.session() as session:
+            return session.execute_write(lambda tx: tx.run(query, **params).data())
+    
+    def get_execution_plan(self, target_function: str) -> List[Dict]:
         """
         Genera plan de ejecución ordenado topológicamente (compatible Neo4j 5.x)
         
@@ -37,30 +142,234 @@ class DependencyResolver:
             target_function: Nombre de la función objetivo (ej: 'crearPedido')
         
         Returns:
-            Lista de dicts con {name, description} en orden de ejecución
+            Lista de dicts con {name, description, requires, optional_requires,
+            avg_duration_ms, exec_count}
+            en orden de ejecución
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (target:Function {name: $function_name})
-                CALL apoc.path.subgraphNodes(target, {
-                    relationshipFilter: 'REQUIRES>',
-                    minLevel: 0
-                }) YIELD node
-                // Cuenta dependencias directas para ordenar topológicamente
-                OPTIONAL MATCH (node)-[:REQUIRES]->(dep)
-                WITH node, COUNT(dep) AS dependency_count
-                ORDER BY dependency_count ASC, node.name ASC
-                RETURN node.name AS name, node.description AS description
+        return self.get_execution_plans([target_function])[target_function]
+    
+    def get_execution_plans(self, target_functions: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Resuelve los planes de varios objetivos en un solo round-trip (UNWIND)
+        
+        Returns:
+            Dict {objetivo: plan en orden topológico}
+        """
+        targets = list(dict.fromkeys(target_functions))
+        rows = self._read(self._plans_query, targets=targets)
+        plans = {row["target_name"]: self._plan_from_records(row["steps"]) for row in rows}
+        
+        missing = [name for name in targets if name not in plans]
+        if missing:
+            raise ValueError(f"❌ Función '{', '.join(missing)}' no encontrada en el grafo")
+        return plans
+    
+    @staticmethod
+    def _plan_from_records(records) -> List[Dict]:
+        """Convierte registros Neo4j en pasos del plan en orden topológico real"""
+        steps = {
+            record["name"]: {
+                "name": record["name"],
+                "description": record["description"],
+                "requires": sorted(record["requires"]),
+                "optional_requires": sorted(record.get("optional_requires") or []),
+                "avg_duration_ms": record["avg_duration_ms"],
+                "exec_count": record["exec_count"] or 0,
+            }
+            for record in records
+        }
+        order = topological_order({name: step["requires"] for name, step in steps.items()})
+        return [steps[name] for name in order]
+    
+    def record_executions(self, durations_ms: Dict[str, float], alpha: float = 0.3):
+        """
+        Actualiza las estadísticas de ejecución observadas en los nodos Function
+        
+        Usa una media móvil exponencial (EWMA) para que las estimaciones sigan
+        los cambios de latencia sin olvidar el histórico. Las observaciones se
+        acumulan y un hilo las vuelca en una sola consulta por lote, fuera del
+        camino del request (cost_flush_interval_s = 0 escribe en el acto).
+        """
+        if not durations_ms:
+            return
+        if self.cost_flush_interval_s <= 0:
+            self._write_costs({name: [float(ms)] for name, ms in durations_ms.items()}, alpha)
+            return
+        with self._costs_lock:
+            if self._pending_alpha not in (None, alpha):
+                # Otro alpha: lo pendiente se vuelca antes de mezclarlo, bajo el mismo lock
+                # para que ningún otro hilo cuele observaciones con el alpha anterior
+                self._write_costs(self._pending_costs, self._pending_alpha)
+                self._pending_costs, self._pending_count = {}, 0
+            self._pending_alpha = alpha
+            for name, ms in durations_ms.items():
+                self._pending_costs.setdefault(name, []).append(float(ms))
+            self._pending_count += len(durations_ms)
+            if self._pending_count >= self.cost_flush_batch:
+                self._flush_now.set()
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="neo4j-costs", daemon=True)
+                self._flusher.start()
+    
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_now.wait(self.cost_flush_interval_s)
+            self._flush_now.clear()
+            try:
+                self.flush_costs()
+            except Exception as e:
+                print(f"⚠️  No se pudieron volcar estadísticas de ejecución: {e}")
+    
+    def flush_costs(self) -> int:
+        """Escribe las observaciones pendientes; retorna cuántas funciones actualizó"""
+        with self._costs_lock:
+            pending, alpha = self._pending_costs, self._pending_alpha
+            self._pending_costs, self._pending_count, self._pending_alpha = {}, 0, None
+        if pending:
+            self._write_costs(pending, alpha)
+        return len(pending)
+    
+    def _write_costs(self, samples: Dict[str, List[float]], alpha: float):
+        self._write(
+            """
+            UNWIND $observations AS obs
+            MATCH (f:Function {name: obs.name})
+            WITH f, obs, coalesce(f.exec_count, 0) AS n
+            SET f.exec_count = n + obs.count,
+                f.last_duration_ms = obs.last,
+                f.avg_duration_ms = CASE
+                    WHEN n = 0 OR f.avg_duration_ms IS NULL THEN obs.seed
+                    ELSE f.avg_duration_ms * obs.decay + obs.weighted
+                END
+            """,
+            observations=[{"name": name, **ewma_batch(values, alpha)} for name, values in samples.items()]
+        )
+    
+    def get_neighborhood(self, target_function: str, hops: int = 1, max_nodes: int = 500,
+                         relationship: Optional[str] = None, namespace: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        Subgrafo acotado para visualización: cierre del plan + k saltos alrededor
+        
+        Evita recorrer el grafo completo; `max_nodes` corta la expansión en grafos grandes.
+        Recorre la misma relación que los planes (REQUIRES o REQUIRES_MIN) y, con
+        `namespace`, solo conserva las funciones de esa partición.
+        
+        Returns:
+            Dict {función: [dependencias dentro del subgrafo]}
+        """
+        relationship = _check_relationship(relationship or self.relationship)
+        in_namespace = "$namespace IS NULL OR coalesce(node.namespace, $default_namespace) = $namespace"
+        rows = self._read(
+            f"""
+            MATCH (target:Function {{name: $function_name}})
+            CALL apoc.path.subgraphNodes(target, {{
+                relationshipFilter: '{relationship}>',
+                minLevel: 0
+            }}) YIELD node
+            WITH node WHERE {in_namespace}
+            WITH collect(node) AS closure
+            CALL apoc.path.subgraphNodes(closure, {{
+                relationshipFilter: '{relationship}',
+                minLevel: 0,
+                maxLevel: $hops,
+                limit: $max_nodes
+            }}) YIELD node
+            WITH node WHERE {in_namespace}
+            WITH collect(node) AS nodes
+            UNWIND nodes AS n
+            OPTIONAL MATCH (n)-[:{relationship}]->(m)
+            WHERE m IN nodes
+            RETURN n.name AS name, collect(m.name) AS requires
+            """,
+            function_name=target_function,
+            hops=hops,
+            max_nodes=max_nodes,
+            namespace=namespace,
+            default_namespace=DEFAULT_NAMESPACE
+        )
+        return {row["name"]: sorted(row["requires"]) for row in rows}
+    
+    def get_function_graph(self, relationship: Optional[str] = None, namespace: Optional[str] = None) -> List[Dict]:
+        """
+        Catálogo: cada Function con sus dependencias directas, costo y embedding
+        
+        Con `namespace` solo se leen las funciones de esa partición (sus
+        dependencias se listan tal cual, aunque apunten a otra partición).
+        """
+        relationship = _check_relationship(relationship or self.relationship)
+        namespace_filter = "WHERE coalesce(f.namespace, $default_namespace) = $namespace" if namespace is not None else ""
+        return self._read(f"""
+            MATCH (f:Function)
+            {namespace_filter}
+            OPTIONAL MATCH (f)-[r:{relationship}]->(dep:Function)
+            WITH f, collect(dep.name) AS requires,
+                 collect(CASE WHEN r.optional THEN dep.name END) AS optional
+            RETURN f.name AS name, f.description AS description, requires, optional,
+                   f.avg_duration_ms AS avg_duration_ms, f.exec_count AS exec_count,
+                   f.embedding AS embedding, coalesce(f.namespace, $default_namespace) AS namespace
+            ORDER BY name
+        """, namespace=namespace, default_namespace=DEFAULT_NAMESPACE)
+    
+    def list_namespaces(self) -> Dict[str, int]:
+        """Particiones del catálogo con su número de funciones"""
+        rows = self._read(
+            """
+            MATCH (f:Function)
+            RETURN coalesce(f.namespace, $default_namespace) AS namespace, count(f) AS functions
+            ORDER BY namespace
+            """,
+            default_namespace=DEFAULT_NAMESPACE
+        )
+        return {row["namespace"]: row["functions"] for row in rows}
+    
+    def get_dependency_table(self) -> List[Dict[str, str]]:
+        """Tabla plana de relaciones [:REQUIRES] (funcion → dependencia)"""
+        return self._read("""
+            MATCH (f:Function)-[r:REQUIRES]->(dep:Function)
+            RETURN f.name AS funcion, dep.name AS dependencia
+            ORDER BY f.name
+        """)
+    
+    def write_derived_edges(self, requires: Dict[str, List[str]], relationship: str = "REQUIRES_MIN",
+                            optional: Optional[Dict[str, List[str]]] = None) -> int:
+        """Reemplaza todas las aristas `relationship` por las dadas (una transacción), con su flag optional"""
+        relationship = _check_relationship(relationship)
+        if relationship == "REQUIRES":
+            raise ValueError("❌ Usa remove_edges para modificar [:REQUIRES]")
+        optional = optional or {}
+        edges = [
+            {"name": name, "dep": dep, "optional": dep in optional.get(name, [])}
+            for name, deps in requires.items() for dep in deps
+        ]
+        
+        def work(tx):
+            tx.run(f"MATCH (:Function)-[r:{relationship}]->(:Function) DELETE r").consume()
+            tx.run(
+                f"""
+                UNWIND $edges AS edge
+                MATCH (f:Function {{name: edge.name}})
+                MATCH (d:Function {{name: edge.dep}})
+                CREATE (f)-[:{relationship} {{optional: edge.optional}}]->(d)
                 """,
-                function_name=target_function
-            )
-            plan = [{"name": record["name"], "description": record["description"]} for record in result]
-            
-            if not plan:
-                raise ValueError(f"❌ Función '{target_function}' no encontrada en el grafo")
-            
-            return plan
+                edges=edges
+            ).consume()
+        with self.driver.session() as session:
+            session.execute_write(work)
+        return len(edges)
+    
+    def remove_edges(self, edges: List[tuple], relationship: str = "REQUIRES") -> int:
+        """Elimina aristas (función, dependencia) concretas"""
+        relationship = _check_relationship(relationship)
+        rows = self._write(
+            f"""
+            UNWIND $edges AS edge
+            MATCH (:Function {{name: edge[0]}})-[r:{relationship}]->(:Function {{name: edge[1]}})
+            DELETE r
+            RETURN count(r) AS removed
+            """,
+            edges=[list(edge) for edge in edges]
+        )
+        return sum(row["removed"] for row in rows)
     
     def visualize_plan(self, plan: List[Dict[str, str]]):
         """Muestra el plan de forma visual"""
@@ -81,6 +390,12 @@ class DependencyResolver:
         print("   RETURN path")
     
     def close(self):
+        # Lo acumulado no se pierde al cerrar
+        self._closed = True
+        self._flush_now.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush_costs()
         self.driver.close()
 
 def test_resolver():
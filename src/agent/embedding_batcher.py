@@ -0,0 +1,104 @@
+"""
+Micro-batching dinámico de embeddings de queries
+Los requests concurrentes encolan su texto; un único hilo junta lo que llega
+dentro de una ventana corta (o hasta max_batch textos), hace una sola pasada
+del modelo y reparte cada vector a su llamador. Con una ventana de 0 ms solo
+se agrupa lo que se acumuló mientras el modelo estaba ocupado.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.agent.embedding_index import EMBEDDING_DTYPE
+
+
+class EmbeddingBatcher:
+    """Agrupa llamadas concurrentes a model.encode en lotes"""
+
+    def __init__(self, model, window_ms: float = 3.0, max_batch: int = 32, dtype: np.dtype = EMBEDDING_DTYPE):
+        if max_batch < 1:
+            raise ValueError("❌ max_batch debe ser >= 1")
+        self.model = model
+        self.window_s = window_ms / 1000
+        self.max_batch = max_batch
+        self.dtype = dtype
+        self._pending: List[Tuple[str, Future, float]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.wait_ms_total = 0.0
+        self._thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, text: str) -> np.ndarray:
+        """Embedding normalizado del texto (bloquea hasta que su lote se procese)"""
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("❌ EmbeddingBatcher cerrado")
+            self._pending.append((text, future, time.perf_counter()))
+            self._cond.notify()
+        return future.result()
+
+    def _next_batch(self) -> Optional[List[Tuple[str, Future, float]]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # La ventana corre desde la llegada del más antiguo: acota la latencia añadida
+            window_end = self._pending[0][2] + self.window_s
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = window_end - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            try:
+                vectors = self.model.encode(
+                    [text for text, _, _ in batch], batch_size=len(batch),
+                    normalize_embeddings=True, convert_to_numpy=True
+                ).astype(self.dtype, copy=False)
+            except BaseException as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            with self._cond:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.wait_ms_total += sum(start - queued for _, _, queued in batch) * 1000
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch": self.items / self.batches if self.batches else 0.0,
+                "max_batch": self.max_batch_seen,
+                "mean_wait_ms": self.wait_ms_total / self.items if self.items else 0.0,
+            }
+
+    def close(self):
+        """Procesa lo pendiente y detiene el hilo"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,61 @@
+"""
+Índice de embeddings de descripciones para la selección semántica
+La matriz se normaliza una sola vez: la similitud coseno queda como un único
+producto matriz-vector sobre arrays float32, sin listas de Python intermedias.
+"""
+
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Tipo de los embeddings de query en el estado del agente (float32 u opcionalmente float16)
+EMBEDDING_DTYPE = np.dtype(os.getenv("AGENT_EMBEDDING_DTYPE", "float32"))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza filas a norma L2 unitaria (float32, contigua)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms)
+
+
+def encode_query(model, text: str, dtype: np.dtype = EMBEDDING_DTYPE) -> np.ndarray:
+    """Embedding normalizado del query como array 1-D (sin .tolist())"""
+    vector = model.encode([text], normalize_embeddings=True, convert_to_numpy=True)[0]
+    return vector.astype(dtype, copy=False)
+
+
+class DescriptionIndex:
+    """Matriz pre-normalizada de descripciones (n_funciones × dim, float32)"""
+
+    def __init__(self, names: Sequence[str], matrix: np.ndarray, normalized: bool = False):
+        self.names = list(names)
+        # Ya normalizada (p. ej. desde el artefacto mmap): se usa sin copiar
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32) if normalized else normalize_rows(matrix)
+
+    @classmethod
+    def from_descriptions(cls, model, descriptions: List[Dict[str, str]]) -> "DescriptionIndex":
+        """Codifica las descripciones una sola vez ({name, desc})"""
+        matrix = model.encode(
+            [f["desc"] for f in descriptions], normalize_embeddings=True, convert_to_numpy=True
+        )
+        return cls([f["name"] for f in descriptions], matrix, normalized=True)
+
+    def scores(self, query_vector: np.ndarray) -> np.ndarray:
+        """Similitud coseno contra todas las descripciones (query ya normalizado)"""
+        # float16 en el estado ahorra memoria; el producto se hace en float32 (BLAS)
+        return self.matrix @ query_vector.astype(np.float32, copy=False)
+
+    def best(self, query_vector: np.ndarray) -> Tuple[str, float]:
+        scores = self.scores(query_vector)
+        best_idx = int(np.argmax(scores))
+        return self.names[best_idx], float(scores[best_idx])
+
+    def top_k(self, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        scores = self.scores(query_vector)
+        k = min(k, len(self.names))
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(self.names[i], float(scores[i])) for i in idx]
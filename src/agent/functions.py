@@ -16,29 +16,36 @@ def obtenerInfoProducto():
     print("   → [FUNC] Producto: Laptop Gamer X1 (SKU: LAP-2026)")
     return {"sku": "LAP-2026", "nombre": "Laptop Gamer X1", "precio": 1299.99}
 
-def verificarStock():
+def verificarStock(producto=None):
     """Verifica disponibilidad de stock del producto"""
-    print("   → [FUNC] Verificando disponibilidad de stock...")
+    sku = producto["sku"] if producto else "LAP-2026"
+    print(f"   → [FUNC] Verificando disponibilidad de stock ({sku})...")
     print("   → [FUNC] Stock disponible: 15 unidades")
     return {"disponible": True, "cantidad": 15}
 
-def calcularPrecioTotal():
+def calcularPrecioTotal(producto=None, cliente=None):
     """Calcula el precio total incluyendo impuestos y descuentos"""
+    subtotal = producto["precio"] if producto else 1299.99
+    impuestos = round(subtotal * 0.12, 2)
+    total = round(subtotal + impuestos, 2)
     print("   → [FUNC] Calculando precio total...")
-    print("   → [FUNC] Subtotal: $1,299.99 | Impuestos: $156.00 | Total: $1,455.99")
-    return {"subtotal": 1299.99, "impuestos": 156.00, "total": 1455.99}
+    print(f"   → [FUNC] Subtotal: ${subtotal:,.2f} | Impuestos: ${impuestos:,.2f} | Total: ${total:,.2f}")
+    return {"subtotal": subtotal, "impuestos": impuestos, "total": total}
 
-def crearPedido():
+def crearPedido(cliente=None, producto=None, stock=None, precio=None):
     """Crea un nuevo pedido en el sistema"""
+    total = precio["total"] if precio else 1455.99
+    estado = "pendiente_stock" if stock and not stock["disponible"] else "confirmado"
     print("   → [FUNC] Creando nuevo pedido en el sistema...")
     print("   → [FUNC] Pedido #ORD-78901 creado exitosamente")
-    return {"pedido_id": "ORD-78901", "estado": "confirmado", "total": 1455.99}
+    return {"pedido_id": "ORD-78901", "estado": estado, "total": total}
 
-def enviarConfirmacion():
+def enviarConfirmacion(cliente=None, pedido=None):
     """Envía correo de confirmación al cliente"""
+    destinatario = cliente["email"] if cliente else "ericontreras16@gmail.com"
     print("   → [FUNC] Enviando correo de confirmación...")
-    print("   → [FUNC] Email enviado a ericontreras16@gmail.com con detalles del pedido")
-    return {"enviado": True, "destinatario": "ericontreras16@gmail.com"}
+    print(f"   → [FUNC] Email enviado a {destinatario} con detalles del pedido")
+    return {"enviado": True, "destinatario": destinatario}
 
 # Mapeo de nombres de funciones (strings) a implementaciones
 FUNCTION_REGISTRY = {
@@ -50,6 +57,44 @@ FUNCTION_REGISTRY = {
     "enviarConfirmacion": enviarConfirmacion
 }
 
+# Entradas declaradas: parámetro → función [:REQUIRES] cuya salida recibe.
+# Sin entradas, cada función usa sus valores por defecto (modo simulado).
+FUNCTION_INPUTS = {
+    "verificarStock": {"producto": "obtenerInfoProducto"},
+    "calcularPrecioTotal": {"producto": "obtenerInfoProducto", "cliente": "obtenerInfoCliente"},
+    "crearPedido": {
+        "cliente": "obtenerInfoCliente",
+        "producto": "obtenerInfoProducto",
+        "stock": "verificarStock",
+        "precio": "calcularPrecioTotal"
+    },
+    "enviarConfirmacion": {"cliente": "obtenerInfoCliente", "pedido": "crearPedido"}
+}
+
+# Modo de ejecución por función: "thread" (por defecto) o "process" para funciones
+# intensivas en CPU que el GIL serializaría (requiere AGENT_PROCESS_WORKERS > 0)
+FUNCTION_EXECUTION_MODE = {
+    "calcularPrecioTotal": "process"
+}
+
+# TTL (segundos) de la memoización de resultados entre requests.
+# Las funciones con efectos secundarios (crearPedido, enviarConfirmacion) no se cachean.
+FUNCTION_CACHE_TTL = {
+    "obtenerInfoCliente": 300,
+    "obtenerInfoProducto": 300,
+    "verificarStock": 30,
+    "calcularPrecioTotal": 60
+}
+
+# Funciones sin efectos secundarios: se pueden ejecutar de forma especulativa
+# (prefetch) y descartar su resultado si el plan final no las usa.
+SIDE_EFFECT_FREE_FUNCTIONS = {
+    "obtenerInfoCliente",
+    "obtenerInfoProducto",
+    "verificarStock",
+    "calcularPrecioTotal"
+}
+
 if __name__ == "__main__":
     print("🧪 PRUEBA DE FUNCIONES SIMULADAS\n")
     for nombre, func in FUNCTION_REGISTRY.items():
@@ -0,0 +1,144 @@
+"""
+Reducción transitiva del grafo [:REQUIRES]
+Las aristas implicadas por otros caminos (p. ej. crearPedido → obtenerInfoProducto,
+ya alcanzable vía verificarStock) no cambian ningún plan pero sí el trabajo
+de cada recorrido y de cada pasada del planificador. Un camino que pasa por una
+arista opcional no implica una obligatoria: al podar por presupuesto se perdería.
+
+Uso:
+    python -m src.agent.graph_reduction report            # aristas redundantes (sin escribir)
+    python -m src.agent.graph_reduction derive            # crea [:REQUIRES_MIN] con la reducción
+    python -m src.agent.graph_reduction check             # ¿[:REQUIRES_MIN] al día con [:REQUIRES]?
+    python -m src.agent.graph_reduction replace --yes     # borra las redundantes de [:REQUIRES]
+
+Con la relación derivada, el agente la usa con NEO4J_REQUIRES_REL=REQUIRES_MIN.
+"""
+
+import argparse
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from src.agent.dependency_resolver import DependencyResolver
+from src.agent.graph_utils import (
+    redundant_edges,
+    topological_waves,
+    transitive_closure,
+    transitive_reduction,
+)
+
+DERIVED_RELATIONSHIP = "REQUIRES_MIN"
+
+
+def reduced_optional(reduced: Dict[str, List[str]], optional: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Flags optional de las aristas que sobreviven a la reducción"""
+    return {name: sorted(set(deps) & set(optional.get(name, []))) for name, deps in reduced.items()}
+
+
+def _mandatory(requires: Dict[str, List[str]], optional: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    return {name: [dep for dep in deps if dep not in optional.get(name, [])] for name, deps in requires.items()}
+
+
+def verify_equivalent(requires: Dict[str, List[str]], reduced: Dict[str, List[str]],
+                      optional: Optional[Dict[str, List[str]]] = None,
+                      reduced_flags: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """
+    Objetivos cuyo plan cambiaría con el grafo reducido (vacío = equivalentes)
+
+    Además del plan completo compara el plan podado por presupuesto: lo alcanzable
+    solo por aristas obligatorias debe coincidir, y cada arista conservada debe
+    mantener su flag optional (`reduced_flags`; por defecto el del grafo original).
+    """
+    optional = optional or {}
+    if reduced_flags is None:
+        reduced_flags = reduced_optional(reduced, optional)
+    mandatory = _mandatory(requires, optional)
+    reduced_mandatory = _mandatory(reduced, reduced_flags)
+    changed = []
+    for name in requires:
+        closure = transitive_closure(requires, name)
+        if closure != transitive_closure(reduced, name):
+            changed.append(name)
+            continue
+        if transitive_closure(mandatory, name) != transitive_closure(reduced_mandatory, name):
+            changed.append(name)
+            continue
+        if any(
+            (dep in optional.get(name, [])) != (dep in reduced_flags.get(name, []))
+            for dep in reduced.get(name, [])
+        ):
+            changed.append(name)
+            continue
+        waves = topological_waves({n: requires[n] for n in closure})
+        if waves != topological_waves({n: reduced[n] for n in closure}):
+            changed.append(name)
+    return changed
+
+
+def _graph_maps(resolver: DependencyResolver, relationship: str) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """({función: dependencias}, {función: dependencias opcionales}) de la relación"""
+    graph = resolver.get_function_graph(relationship)
+    return (
+        {f["name"]: sorted(f["requires"]) for f in graph},
+        {f["name"]: sorted(f.get("optional") or []) for f in graph},
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Reducción transitiva del grafo [:REQUIRES]")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="Lista las aristas redundantes")
+    derive = sub.add_parser("derive", help="Escribe la reducción como relación derivada")
+    derive.add_argument("--relationship", default=DERIVED_RELATIONSHIP)
+    check = sub.add_parser("check", help="Verifica que la relación derivada esté al día")
+    check.add_argument("--relationship", default=DERIVED_RELATIONSHIP)
+    replace = sub.add_parser("replace", help="Elimina las aristas redundantes de [:REQUIRES]")
+    replace.add_argument("--yes", action="store_true", help="Confirma la escritura sobre [:REQUIRES]")
+    args = parser.parse_args(argv)
+
+    resolver = DependencyResolver()
+    try:
+        requires, optional = _graph_maps(resolver, "REQUIRES")
+        reduced = transitive_reduction(requires, optional)
+        flags = reduced_optional(reduced, optional)
+        redundant = redundant_edges(requires, optional)
+        total = sum(len(deps) for deps in requires.values())
+        print(f"🕸️  {len(requires)} funciones | {total} aristas [:REQUIRES] | {len(redundant)} redundantes")
+
+        if args.command == "report":
+            for name, dep in redundant:
+                print(f"   • {name} → {dep}")
+            return
+
+        if args.command == "check":
+            current, current_optional = _graph_maps(resolver, args.relationship)
+            stale = sorted(
+                name for name in reduced
+                if current.get(name, []) != reduced[name] or current_optional.get(name, []) != flags[name]
+            )
+            if stale:
+                print(f"❌ [:{args.relationship}] desactualizada en: {', '.join(stale)}")
+                print("   Ejecuta: python -m src.agent.graph_reduction derive")
+                sys.exit(1)
+            print(f"✅ [:{args.relationship}] coincide con la reducción de [:REQUIRES]")
+            return
+
+        changed = verify_equivalent(requires, reduced, optional, flags)
+        if changed:
+            raise RuntimeError(f"❌ La reducción cambiaría los planes de: {', '.join(changed)}")
+
+        if args.command == "derive":
+            written = resolver.write_derived_edges(reduced, args.relationship, flags)
+            print(f"✅ {written} aristas [:{args.relationship}] escritas ({total - written} menos que [:REQUIRES])")
+            print(f"   Activa con NEO4J_REQUIRES_REL={args.relationship}")
+        elif args.command == "replace":
+            if not args.yes:
+                print("⚠️  replace modifica [:REQUIRES] de forma permanente: repite con --yes")
+                sys.exit(1)
+            removed = resolver.remove_edges(redundant)
+            print(f"✅ {removed} aristas redundantes eliminadas de [:REQUIRES]")
+    finally:
+        resolver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Utilidades de grafos para planes de ejecución
+Algoritmos puros (sin Neo4j) sobre el mapa de dependencias {función: [dependencias]}
+"""
+
+from typing import Dict, List, Iterable, Mapping, Optional, Set, Tuple
+
+
+def build_dependents(requires: Dict[str, Iterable[str]]) -> Dict[str, List[str]]:
+    """Invierte el mapa [:REQUIRES]: para cada función, quién depende de ella"""
+    dependents: Dict[str, List[str]] = {name: [] for name in requires}
+    for name, deps in requires.items():
+        for dep in deps:
+            dependents.setdefault(dep, []).append(name)
+    return dependents
+
+
+def step_sources(step: Dict, inputs: Mapping[str, Mapping[str, str]]) -> Set[str]:
+    """
+    Funciones cuyas salidas recibe un paso: sus [:REQUIRES] más sus entradas
+    declaradas ({función: {parámetro: función productora}}). En un grafo reducido
+    una entrada declarada puede ser un ancestro sin arista directa.
+    """
+    return set(step.get("requires", [])) | set(inputs.get(step["name"], {}).values())
+
+
+def topological_waves(requires: Dict[str, Iterable[str]]) -> List[List[str]]:
+    """
+    Agrupa las funciones en oleadas topológicas (Kahn por niveles)
+
+    Cada oleada solo depende de oleadas anteriores, así que sus funciones
+    pueden ejecutarse en paralelo. Lanza ValueError si hay ciclos.
+    """
+    pending = {name: set(deps) & set(requires) for name, deps in requires.items()}
+    dependents = build_dependents(pending)
+    wave = sorted(name for name, deps in pending.items() if not deps)
+    waves = []
+    done = 0
+    while wave:
+        waves.append(wave)
+        done += len(wave)
+        next_wave = []
+        for name in wave:
+            for dependent in dependents.get(name, []):
+                pending[dependent].discard(name)
+                if not pending[dependent]:
+                    next_wave.append(dependent)
+        wave = sorted(next_wave)
+    if done != len(pending):
+        cyclic = sorted(name for name, deps in pending.items() if deps)
+        raise ValueError(f"❌ Ciclo detectado en [:REQUIRES] entre: {', '.join(cyclic)}")
+    return waves
+
+
+def topological_order(requires: Dict[str, Iterable[str]]) -> List[str]:
+    """Orden topológico determinista (oleada, nombre)"""
+    return [name for wave in topological_waves(requires) for name in wave]
+
+
+def transitive_closure(requires: Dict[str, Iterable[str]], target: str) -> List[str]:
+    """Funciones alcanzables desde `target` siguiendo [:REQUIRES] (incluye al objetivo)"""
+    seen = {target}
+    stack = [target]
+    while stack:
+        name = stack.pop()
+        for dep in requires.get(name, []):
+            if dep not in seen:
+                seen.add(dep)
+                stack.append(dep)
+    return sorted(seen)
+
+
+def prune_optional(plan: List[Dict], target: str) -> Tuple[List[Dict], List[str]]:
+    """
+    Quita del plan las funciones alcanzables solo por aristas opcionales
+
+    Una dependencia marcada como opcional se conserva si otro camino obligatorio
+    la requiere. Returns: (plan podado en el mismo orden, funciones omitidas)
+    """
+    mandatory = {
+        step["name"]: [dep for dep in step.get("requires", []) if dep not in step.get("optional_requires", [])]
+        for step in plan
+    }
+    keep = set(transitive_closure(mandatory, target))
+    pruned = [
+        {**step, "requires": [dep for dep in step.get("requires", []) if dep in keep]}
+        for step in plan if step["name"] in keep
+    ]
+    return pruned, [step["name"] for step in plan if step["name"] not in keep]
+
+
+def find_cycles(requires: Dict[str, Iterable[str]]) -> List[List[str]]:
+    """
+    Componentes fuertemente conexas con ciclo (Tarjan iterativo)
+
+    Retorna solo los ciclos reales: componentes de más de un nodo o autoreferencias.
+    """
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack = set()
+    stack: List[str] = []
+    cycles: List[List[str]] = []
+    counter = 0
+
+    for root in sorted(requires):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(requires.get(root, []))))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            name, children = work[-1]
+            advanced = False
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(requires.get(child, [])))))
+                    advanced = True
+                    break
+                if child in on_stack:
+                    lowlink[name] = min(lowlink[name], index[child])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[name])
+            if lowlink[name] == index[name]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == name:
+                        break
+                if len(component) > 1 or name in requires.get(name, []):
+                    cycles.append(sorted(component))
+    return cycles
+
+
+def transitive_reduction(requires: Dict[str, Iterable[str]],
+                         optional: Optional[Mapping[str, Iterable[str]]] = None) -> Dict[str, List[str]]:
+    """
+    Reducción transitiva del DAG: quita d de requires[f] si d ya es alcanzable
+    a través de otra dependencia de f. Conserva alcanzabilidad y oleadas.
+
+    Con `optional` ({función: dependencias opcionales}) una arista obligatoria
+    solo es redundante si d se alcanza por un camino sin aristas opcionales:
+    así prune_optional conserva las mismas funciones sobre el grafo reducido.
+
+    Alcanzabilidad como bitsets (enteros de Python) en orden topológico:
+    O(V·E / tamaño de palabra). Lanza ValueError si hay ciclos.
+    """
+    optional = optional or {}
+    order = topological_order(requires)
+    bit = {name: 1 << i for i, name in enumerate(order)}
+    # reach: por cualquier camino; mandatory: solo por aristas obligatorias
+    reach: Dict[str, int] = {}
+    mandatory: Dict[str, int] = {}
+    reduced: Dict[str, List[str]] = {}
+    for name in order:
+        deps = [dep for dep in set(requires.get(name, [])) if dep in bit]
+        optional_deps = set(optional.get(name, []))
+        required = [dep for dep in deps if dep not in optional_deps]
+        # Lo alcanzable pasando por alguna dependencia directa (sin contarla a ella)
+        indirect = 0
+        for dep in deps:
+            indirect |= reach[dep]
+        indirect_mandatory = 0
+        for dep in required:
+            indirect_mandatory |= mandatory[dep]
+        reduced[name] = sorted(
+            dep for dep in deps
+            if not (indirect if dep in optional_deps else indirect_mandatory) & bit[dep]
+        )
+        reach[name] = indirect
+        for dep in deps:
+            reach[name] |= bit[dep]
+        mandatory[name] = indirect_mandatory
+        for dep in required:
+            mandatory[name] |= bit[dep]
+    return reduced
+
+
+def redundant_edges(requires: Dict[str, Iterable[str]],
+                    optional: Optional[Mapping[str, Iterable[str]]] = None) -> List[Tuple[str, str]]:
+    """Aristas (función, dependencia) implicadas por otros caminos"""
+    reduced = transitive_reduction(requires, optional)
+    return sorted(
+        (name, dep)
+        for name, deps in requires.items()
+        for dep in set(deps)
+        if dep in reduced and dep not in reduced.get(name, [])
+    )
@@ -7,12 +7,14 @@ Modelo requerido por el examen: FunctionMatcher Planner
 from neo4j import GraphDatabase
 from typing import List, Dict
 
+from src.agent.dependency_resolver import DEFAULT_NAMESPACE
+
 # Configuración local (segura)
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "password123"
 
-# Definición de funciones con sus dependencias
+# Definición de funciones con sus dependencias ("namespace" opcional: partición del catálogo)
 FUNCTIONS: List[Dict] = [
     {
         "name": "obtenerInfoCliente",
@@ -32,7 +34,8 @@ FUNCTIONS: List[Dict] = [
     {
         "name": "calcularPrecioTotal",
         "description": "Calcula el precio total incluyendo impuestos y descuentos",
-        "requires": ["obtenerInfoProducto", "obtenerInfoCliente"]  # Depende de ambas
+        "requires": ["obtenerInfoProducto", "obtenerInfoCliente"],  # Depende de ambas
+        "optional": ["obtenerInfoCliente"]  # Solo para descuentos: prescindible si falta tiempo
     },
     {
         "name": "crearPedido",
@@ -65,6 +68,7 @@ class FunctionGraphInitializer:
         with self.driver.session() as session:
             session.run("CREATE CONSTRAINT function_name_unique IF NOT EXISTS FOR (f:Function) REQUIRE f.name IS UNIQUE")
             session.run("CREATE INDEX function_name_index IF NOT EXISTS FOR (f:Function) ON (f.name)")
+            session.run("CREATE INDEX function_namespace_index IF NOT EXISTS FOR (f:Function) ON (f.namespace)")
             print("✅ Constraints e índices creados")        
     
     def create_functions(self):
@@ -76,11 +80,14 @@ class FunctionGraphInitializer:
                     CREATE (f:Function {
                         name: $name,
                         description: $description,
-                        embedding: []  // Placeholder para embeddings (se llenará después)
+                        namespace: $namespace,
+                        embedding: [],  // Placeholder para embeddings (se llenará después)
+                        exec_count: 0   // Estadísticas de ejecución (avg_duration_ms se llena al ejecutar)
                     })
                     """,
                     name=func["name"],
-                    description=func["description"]
+                    description=func["description"],
+                    namespace=func.get("namespace", DEFAULT_NAMESPACE)
                 )
             print(f"✅ {len(FUNCTIONS)} funciones creadas")
     
@@ -93,10 +100,11 @@ class FunctionGraphInitializer:
                         """
                         MATCH (f:Function {name: $func_name})
                         MATCH (d:Function {name: $dep_name})
-                        CREATE (f)-[:REQUIRES]->(d)
+                        CREATE (f)-[:REQUIRES {optional: $optional}]->(d)
                         """,
                         func_name=func["name"],
-                        dep_name=dep_name
+                        dep_name=dep_name,
+                        optional=dep_name in func.get("optional", [])
                     )
             print("✅ Relaciones de dependencias creadas")
     
@@ -142,6 +150,45 @@ class FunctionGraphInitializer:
             embedding=embedding_vector
         )
         print(f"✅ Embedding actualizado para: {function_name}")
+    
+    def iter_descriptions(self, page_size: int = 1000, after: str = ""):
+        """
+        Recorre las descripciones por páginas (paginación por clave sobre f.name)
+        Cada página usa el índice de nombre: sin SKIP que recorra lo ya leído.
+        """
+        with self.driver.session() as session:
+            while True:
+                page = session.execute_read(
+                    lambda tx: tx.run(
+                        """
+                        MATCH (f:Function)
+                        WHERE f.name > $after
+                        RETURN f.name AS name, coalesce(f.description, "") AS description
+                        ORDER BY f.name
+                        LIMIT $limit
+                        """,
+                        after=after,
+                        limit=page_size
+                    ).data()
+                )
+                if not page:
+                    return
+                yield page
+                after = page[-1]["name"]
+    
+    def update_embeddings(self, rows: List[Dict]):
+        """Actualiza embeddings en lote: una transacción con UNWIND por llamada"""
+        with self.driver.session() as session:
+            session.execute_write(
+                lambda tx: tx.run(
+                    """
+                    UNWIND $rows AS row
+                    MATCH (f:Function {name: row.name})
+                    SET f.embedding = row.embedding
+                    """,
+                    rows=rows
+                ).consume()
+            )
    
    
 def main():
@@ -0,0 +1,341 @@
+"""
+Cola de trabajos local (SQLite) para ejecutar pasos del plan en workers externos
+El agente publica cada paso listo; los workers (procesos en este u otros hosts
+que compartan el archivo) toman el siguiente pendiente, ejecutan la entrada de
+FUNCTION_REGISTRY y devuelven el resultado. Un lease vencido (worker caído)
+vuelve a quedar disponible: entrega al-menos-una-vez. Un trabajo que agota
+max_attempts (falla o tumba al worker una y otra vez) pasa a 'dead' y no se reintenta.
+
+Uso:
+    python -m src.agent.job_queue worker --db jobs.sqlite --processes 4
+    python -m src.agent.job_queue stats --db jobs.sqlite
+    AGENT_JOB_QUEUE=jobs.sqlite python -m src.agent.planner_agent
+
+Varios hosts: el archivo debe vivir en un volumen compartido con bloqueo de
+archivos confiable (SQLite no es seguro sobre NFS sin locks).
+"""
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import queue as queue_module
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    func_name TEXT NOT NULL,
+    inputs BLOB,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result BLOB,
+    error TEXT,
+    duration_ms REAL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+# Estados terminales: 'failed' (la función lanzó en el último intento) y 'dead'
+# (lease vencido en el último intento: el worker cayó sin reportar)
+FINISHED_STATUSES = ("done", "failed", "dead")
+
+
+class SQLiteJobQueue:
+    """Cola de trabajos con leases sobre un archivo SQLite (modo WAL)"""
+
+    def __init__(self, path: str, busy_timeout_s: float = 30.0, pool_size: int = 4, max_attempts: int = 3):
+        if max_attempts < 1:
+            raise ValueError("❌ max_attempts debe ser al menos 1")
+        self.path = path
+        self.busy_timeout_s = busy_timeout_s
+        self.max_attempts = max_attempts
+        # Conexiones ociosas reutilizables: nunca más de pool_size abiertas sin uso
+        self._idle: "queue_module.LifoQueue[sqlite3.Connection]" = queue_module.LifoQueue(maxsize=pool_size)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False: la conexión vuelve al pool y la toma otro hilo
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión prestada durante una operación (sqlite3 no admite uso concurrente
+        de una misma conexión); al devolverla sobra si el pool ya está lleno y se cierra
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue_module.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue_module.Full:
+                conn.close()
+
+    def publish(self, func_name: str, inputs: Optional[Dict[str, Any]] = None) -> int:
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (func_name, inputs, created_at) VALUES (?, ?, ?)",
+                (func_name, pickle.dumps(inputs or {}, protocol=pickle.HIGHEST_PROTOCOL), time.time())
+            )
+            return cursor.lastrowid
+
+    def lease(self, worker_id: str, lease_s: float = 30.0) -> Optional[Dict[str, Any]]:
+        """
+        Toma el trabajo pendiente más antiguo (o uno con lease vencido)
+
+        Un lease vencido que ya agotó max_attempts no se reentrega: pasa a 'dead'
+        para que un trabajo que tumba al worker no se reintente para siempre.
+        """
+        now = time.time()
+        with self._conn() as conn:
+            # BEGIN IMMEDIATE: un solo escritor elige y marca el trabajo, sin carreras
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'dead', finished_at = ?, lease_owner = NULL, lease_expires = NULL,
+                                    error = coalesce(error, 'lease vencido en ' || attempts || ' intentos')
+                    WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+                    """,
+                    (now, now, self.max_attempts)
+                )
+                row = conn.execute(
+                    """
+                    SELECT id, func_name, inputs, attempts FROM jobs
+                    WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                    ORDER BY id LIMIT 1
+                    """,
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                                    attempts = attempts + 1
+                    WHERE id = ?
+                    """,
+                    (worker_id, now + lease_s, row[0])
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return {"id": row[0], "func_name": row[1], "inputs": pickle.loads(row[2]), "attempts": row[3] + 1}
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_s: float = 30.0) -> bool:
+        """Extiende el lease; False si el trabajo ya fue reasignado"""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time() + lease_s, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, result: Any, duration_ms: float) -> bool:
+        """Registra el resultado; la primera entrega gana (las repetidas se ignoran)"""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = 'done', result = ?, duration_ms = ?, finished_at = ?,
+                                lease_owner = NULL, lease_expires = NULL
+                WHERE id = ? AND status NOT IN ('done', 'failed', 'dead')
+                """,
+                (pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), duration_ms, time.time(), job_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str, max_attempts: Optional[int] = None):
+        """Reencola el trabajo o lo marca como fallido tras max_attempts (por defecto el de la cola)"""
+        max_attempts = max_attempts or self.max_attempts
+        with self._conn() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                error = ?, lease_owner = NULL, lease_expires = NULL,
+                                finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?
+                """,
+                (max_attempts, error, max_attempts, time.time(), job_id, worker_id)
+            )
+
+    def fetch(self, job_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Trabajos terminados (done, failed o dead) entre los indicados"""
+        if not job_ids:
+            return {}
+        placeholders = ",".join("?" * len(job_ids))
+        with self._conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, status, result, error, duration_ms FROM jobs
+                WHERE id IN ({placeholders}) AND status IN ('done', 'failed', 'dead')
+                """,
+                list(job_ids)
+            ).fetchall()
+        return {
+            row[0]: {
+                "status": row[1],
+                "result": pickle.loads(row[2]) if row[2] is not None else None,
+                "error": row[3],
+                "duration_ms": row[4],
+            }
+            for row in rows
+        }
+
+    def delete(self, job_ids: List[int]):
+        if job_ids:
+            placeholders = ",".join("?" * len(job_ids))
+            with self._conn() as conn:
+                conn.execute(f"DELETE FROM jobs WHERE id IN ({placeholders})", list(job_ids))
+
+    def stats(self) -> Dict[str, int]:
+        with self._conn() as conn:
+            rows = conn.execute("SELECT status, count(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        """Cierra las conexiones ociosas (las prestadas se cierran al devolverse si el pool está lleno)"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue_module.Empty:
+                break
+
+
+class QueueStepExecutor:
+    """Backend de ejecución del agente: publica el paso y espera su resultado"""
+
+    def __init__(self, path: str, timeout_s: float = 300.0, poll_s: float = 0.002, max_poll_s: float = 0.05):
+        self.queue = SQLiteJobQueue(path)
+        self.timeout_s = timeout_s
+        self.poll_s = poll_s
+        self.max_poll_s = max_poll_s
+
+    def run(self, func_name: str, inputs: Optional[Dict[str, Any]] = None) -> Any:
+        """Misma firma que ProcessStepExecutor.run (bloquea hasta el resultado)"""
+        job_id = self.queue.publish(func_name, inputs)
+        deadline = time.monotonic() + self.timeout_s
+        delay = self.poll_s
+        try:
+            while True:
+                done = self.queue.fetch([job_id]).get(job_id)
+                if done is not None:
+                    if done["status"] == "dead":
+                        raise RuntimeError(f"❌ {func_name} agotó sus intentos sin respuesta del worker: {done['error']}")
+                    if done["status"] == "failed":
+                        raise RuntimeError(f"❌ {func_name} falló en el worker: {done['error']}")
+                    return done["result"]
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"❌ {func_name} sin resultado tras {self.timeout_s:.0f} s (¿hay workers?)")
+                time.sleep(delay)
+                delay = min(delay * 1.5, self.max_poll_s)  # Backoff: poco sondeo con pasos largos
+        finally:
+            self.queue.delete([job_id])
+
+    def shutdown(self):
+        self.queue.close()
+
+
+def run_worker(path: str, worker_id: Optional[str] = None, lease_s: float = 30.0,
+               poll_s: float = 0.01, max_attempts: int = 3, max_jobs: Optional[int] = None):
+    """Bucle de un worker: toma, ejecuta y reporta trabajos hasta max_jobs (o siempre)"""
+    from src.agent.functions import FUNCTION_REGISTRY
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    queue = SQLiteJobQueue(path, max_attempts=max_attempts)
+    print(f"👷 Worker {worker_id} escuchando {path}")
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = queue.lease(worker_id, lease_s)
+        if job is None:
+            time.sleep(poll_s)
+            continue
+
+        # Mantiene vivo el lease mientras la función se ejecuta (misma cola: su pool es thread-safe)
+        stop = threading.Event()
+        def keep_alive(job_id=job["id"]):
+            while not stop.wait(lease_s / 3):
+                if not queue.heartbeat(job_id, worker_id, lease_s):
+                    break
+        heartbeat = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat.start()
+
+        start = time.perf_counter()
+        try:
+            if job["func_name"] not in FUNCTION_REGISTRY:
+                raise KeyError(f"Función '{job['func_name']}' no registrada")
+            result = FUNCTION_REGISTRY[job["func_name"]](**job["inputs"])
+            queue.complete(job["id"], result, (time.perf_counter() - start) * 1000)
+        except Exception:
+            queue.fail(job["id"], worker_id, traceback.format_exc(limit=5))
+        finally:
+            stop.set()
+            heartbeat.join()
+        processed += 1
+    queue.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Cola de trabajos SQLite del FunctionMatcher Planner")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Ejecuta pasos publicados por el agente")
+    worker.add_argument("--db", default=os.getenv("AGENT_JOB_QUEUE", "jobs.sqlite"))
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--lease", type=float, default=30.0, help="Segundos de lease por trabajo")
+    worker.add_argument("--max-attempts", type=int, default=int(os.getenv("AGENT_JOB_MAX_ATTEMPTS", "3")),
+                        help="Entregas por trabajo antes de marcarlo failed/dead")
+    stats = sub.add_parser("stats", help="Trabajos por estado")
+    stats.add_argument("--db", default=os.getenv("AGENT_JOB_QUEUE", "jobs.sqlite"))
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        queue = SQLiteJobQueue(args.db)
+        print(queue.stats())
+        queue.close()
+        return
+
+    SQLiteJobQueue(args.db).close()  # Crea el esquema antes de arrancar los workers
+    if args.processes == 1:
+        run_worker(args.db, lease_s=args.lease, max_attempts=args.max_attempts)
+        return
+    processes = [
+        multiprocessing.Process(
+            target=run_worker, args=(args.db,),
+            kwargs={"lease_s": args.lease, "max_attempts": args.max_attempts}
+        )
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Prueba de carga del agente: usuarios concurrentes simulados sobre el camino
+completo de un request (embedding → selección → resolución → ejecución).
+
+Reporta throughput, latencias p50/p95/p99, tasa de error y CPU/RSS en el tiempo;
+con varios niveles de concurrencia genera la curva de saturación.
+
+Uso:
+    python -m src.agent.load_test --levels 1,2,4,8,16 --duration 20 --backend memory
+    python -m src.agent.load_test --levels 4 --backend neo4j --think-ms 100 --output carga.json
+    python -m src.agent.load_test --embedding-bench --levels 1,8,32 --windows 0,2,5
+    python -m src.agent.load_test --levels 1,4,8 --replay trace.json.gz   # reproducible, sin efectos
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import random
+import threading
+import time
+from functools import partial
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # psutil es opcional: se usa /proc o getrusage
+    psutil = None
+
+# Paráfrasis de las intenciones más frecuentes en producción
+DEFAULT_QUERIES = [
+    "Quiero comprar una laptop gamer",
+    "comprar laptop gamer",
+    "¿Hay stock de la laptop?",
+    "¿Cuánto cuesta en total con impuestos?",
+    "Muéstrame la información del cliente",
+    "Datos del producto LAP-2026",
+    "Envíame la confirmación del pedido",
+]
+
+
+def _rss_mb() -> Optional[float]:
+    """RSS del proceso en MB; None si la plataforma no permite medirlo (Windows sin psutil)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1e6
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        pass
+    try:
+        import resource  # Solo Unix
+    except ImportError:
+        return None
+    # Sin /proc (macOS): pico de RSS en lugar de RSS actual
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+class ResourceMonitor:
+    """Muestrea CPU (% de un núcleo) y RSS del proceso a intervalos fijos"""
+
+    def __init__(self, interval_s: float = 0.5):
+        self.interval_s = interval_s
+        self.timeline: List[Dict] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+
+    def _run(self):
+        start = last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        while not self._stop.wait(self.interval_s):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.timeline.append({
+                "t_s": round(wall - start, 3),
+                "cpu_percent": 100 * (cpu - last_cpu) / (wall - last_wall),
+                "rss_mb": _rss_mb(),
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _think(think_ms: float, distribution: str):
+    if think_ms <= 0:
+        return
+    delay = random.expovariate(1 / think_ms) if distribution == "exp" else think_ms
+    time.sleep(delay / 1000)
+
+
+def run_level(agent, users: int, duration_s: float, queries: List[str],
+              think_ms: float = 0.0, think_distribution: str = "exp") -> Dict:
+    """Ejecuta `users` usuarios concurrentes durante `duration_s` segundos"""
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration_s
+
+    def user_loop(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            query = rng.choice(queries)
+            start = time.perf_counter()
+            try:
+                agent.invoke(query)
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+            _think(think_ms, think_distribution)
+
+    started = time.perf_counter()
+    with ResourceMonitor() as monitor:
+        threads = [threading.Thread(target=user_loop, args=(i,), name=f"user-{i}") for i in range(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = len(latencies) + len(errors)
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    cpu = [sample["cpu_percent"] for sample in monitor.timeline] or [0.0]
+    rss = [sample["rss_mb"] for sample in monitor.timeline if sample["rss_mb"] is not None]
+    if not rss and _rss_mb() is not None:
+        rss = [_rss_mb()]
+    return {
+        "users": users,
+        "requests": total,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "error_rate": len(errors) / total if total else 0.0,
+        "cpu_avg_percent": float(np.mean(cpu)),
+        "cpu_max_percent": float(np.max(cpu)),
+        "rss_max_mb": float(np.max(rss)) if rss else None,
+        "sample_errors": errors[:5],
+        "timeline": monitor.timeline,
+    }
+
+
+def format_report(report: Dict) -> str:
+    rss = f"{report['rss_max_mb']:.0f} MB" if report["rss_max_mb"] is not None else "n/d"
+    return (
+        f"👥 {report['users']:>3} usuarios | {report['throughput_rps']:8.1f} req/s | "
+        f"p50 {report['p50_ms']:7.1f} ms | p95 {report['p95_ms']:7.1f} ms | "
+        f"p99 {report['p99_ms']:7.1f} ms | errores {report['error_rate']:.1%} | "
+        f"CPU {report['cpu_avg_percent']:5.0f}% | RSS {rss}"
+    )
+
+
+def saturation_curve(agent, levels: List[int], duration_s: float, queries: List[str],
+                     think_ms: float = 0.0, think_distribution: str = "exp",
+                     warmup_s: float = 2.0) -> List[Dict]:
+    """Recorre los niveles de concurrencia (con calentamiento previo)"""
+    if warmup_s > 0:
+        run_level(agent, 1, warmup_s, queries)
+    reports = []
+    for users in levels:
+        report = run_level(agent, users, duration_s, queries, think_ms, think_distribution)
+        reports.append(report)
+        print(format_report(report))
+    return reports
+
+
+REPORT_COLUMNS = ["users", "requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+                  "error_rate", "cpu_avg_percent", "cpu_max_percent", "rss_max_mb"]
+
+EMBEDDING_COLUMNS = ["window_ms", "users", "requests", "throughput_rps", "speedup", "p50_ms", "p95_ms",
+                     "p99_ms", "added_p50_ms", "mean_batch", "max_batch", "mean_wait_ms", "cpu_avg_percent"]
+
+
+class _EncoderLoad:
+    """Adaptador para medir solo el embedding del query con run_level"""
+
+    def __init__(self, encode):
+        self.invoke = encode
+
+
+def embedding_batching_curve(model, levels: List[int], windows: List[float], duration_s: float,
+                             queries: List[str], max_batch: int = 32) -> List[Dict]:
+    """Throughput vs. latencia añadida del micro-batching frente a lotes de uno"""
+    from src.agent.embedding_batcher import EmbeddingBatcher
+    from src.agent.embedding_index import encode_query
+
+    rows: List[Dict] = []
+    baseline: Dict[int, Dict] = {}
+    for window_ms in [None] + windows:
+        for users in levels:
+            batcher = EmbeddingBatcher(model, window_ms, max_batch) if window_ms is not None else None
+            encode = batcher.encode if batcher is not None else partial(encode_query, model)
+            try:
+                report = run_level(_EncoderLoad(encode), users, duration_s, queries)
+            finally:
+                if batcher is not None:
+                    batcher.close()
+            row = {column: report[column] for column in EMBEDDING_COLUMNS if column in report}
+            row.update(batcher.stats() if batcher is not None else {"mean_batch": 1.0, "max_batch": 1, "mean_wait_ms": 0.0})
+            row["window_ms"] = window_ms
+            if window_ms is None:
+                baseline[users] = row
+            row["speedup"] = row["throughput_rps"] / baseline[users]["throughput_rps"] if baseline[users]["throughput_rps"] else 0.0
+            row["added_p50_ms"] = row["p50_ms"] - baseline[users]["p50_ms"]
+            rows.append(row)
+            print(format_embedding_row(row))
+    return rows
+
+
+def format_embedding_row(row: Dict) -> str:
+    window = "sin lote" if row["window_ms"] is None else f"{row['window_ms']:g} ms"
+    return (
+        f"🧠 ventana {window:>8} | {row['users']:>3} usuarios | {row['throughput_rps']:8.1f} q/s "
+        f"(x{row['speedup']:.2f}) | p50 {row['p50_ms']:6.2f} ms ({row['added_p50_ms']:+.2f}) | "
+        f"p99 {row['p99_ms']:6.2f} ms | lote medio {row['mean_batch']:.1f}"
+    )
+
+
+def write_reports(reports: List[Dict], output: str, columns: List[str] = REPORT_COLUMNS):
+    """JSON completo (con timeline) y CSV de la curva de saturación"""
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(reports, f, indent=2, ensure_ascii=False)
+    with open(os.path.splitext(output)[0] + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(reports)
+
+
+def build_agent(backend: str, db_latency_ms: float = 0.0, **agent_options):
+    """Agente silencioso contra Neo4j real o el sustituto en memoria"""
+    from src.agent.planner_agent import FunctionMatcherAgent
+    resolver = None
+    if backend == "memory":
+        from src.agent.memory_resolver import InMemoryResolver
+        resolver = InMemoryResolver(latency_ms=db_latency_ms)
+    return FunctionMatcherAgent(resolver=resolver, verbose=False, **agent_options)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del FunctionMatcher Planner")
+    parser.add_argument("--levels", default="1,2,4,8", help="Niveles de concurrencia separados por coma")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Tiempo de pensamiento medio por usuario")
+    parser.add_argument("--think-dist", choices=["exp", "fixed"], default="exp")
+    parser.add_argument("--backend", choices=["memory", "neo4j"], default="memory")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Latencia simulada del backend en memoria")
+    parser.add_argument("--max-workers", type=int, default=1)
+    parser.add_argument("--result-cache", type=int, default=0)
+    parser.add_argument("--single-flight", action="store_true", help="Coalesce planes y pasos idénticos en curso")
+    parser.add_argument("--embedding-batch-window-ms", type=float, default=None,
+                        help="Micro-batching de embeddings en el agente (ventana en ms)")
+    parser.add_argument("--embedding-batch-size", type=int, default=32)
+    parser.add_argument("--embedding-bench", action="store_true",
+                        help="Mide solo el embedding: sin lote vs. cada ventana de --windows")
+    parser.add_argument("--windows", default="0,2,5", help="Ventanas de micro-batching (ms) para --embedding-bench")
+    trace = parser.add_mutually_exclusive_group()
+    trace.add_argument("--record", help="Graba salidas y duraciones de las funciones en esta traza")
+    trace.add_argument("--replay", help="Reproduce una traza grabada en lugar de las funciones reales")
+    parser.add_argument("--replay-timing", choices=["sequence", "sample", "none"], default="sequence")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de la reproducción (timing sample)")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--queries", help="Archivo con un query por línea")
+    parser.add_argument("--output", default="load_test.json")
+    args = parser.parse_args(argv)
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    levels = [int(level) for level in args.levels.split(",")]
+    if args.embedding_bench:
+        from src.agent.planner_agent import get_embedding_model
+        windows = [float(window) for window in args.windows.split(",") if window]
+        print(f"🧠 Micro-batching de embeddings: niveles {levels}, ventanas {windows} ms")
+        rows = embedding_batching_curve(
+            get_embedding_model(), levels, windows, args.duration, queries, args.embedding_batch_size
+        )
+        write_reports(rows, args.output, EMBEDDING_COLUMNS)
+        print(f"✅ Resultados en {args.output} y {os.path.splitext(args.output)[0]}.csv")
+        return
+
+    registry = None
+    if args.replay:
+        from src.agent.replay import ReplayRegistry
+        registry = ReplayRegistry(args.replay, timing=args.replay_timing, seed=args.seed)
+    elif args.record:
+        from src.agent.functions import FUNCTION_REGISTRY
+        from src.agent.replay import RecordingRegistry
+        registry = RecordingRegistry(FUNCTION_REGISTRY, args.record)
+
+    agent = build_agent(args.backend, args.db_latency_ms, registry=registry,
+                        max_workers=args.max_workers, result_cache_size=args.result_cache,
+                        single_flight=args.single_flight,
+                        embedding_batch_window_ms=args.embedding_batch_window_ms,
+                        embedding_batch_size=args.embedding_batch_size)
+    print(f"🚦 Prueba de carga: niveles {levels}, {args.duration:.0f}s por nivel, backend {args.backend}")
+    try:
+        # Las funciones simuladas imprimen: se silencian para no medir la consola
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            reports = saturation_curve(
+                agent, levels, args.duration, queries, args.think_ms, args.think_dist, args.warmup
+            )
+    finally:
+        agent.close()
+    for report in reports:
+        print(format_report(report))
+    if args.record:
+        print(f"🎞️  Traza guardada en {registry.save()} ({registry.calls()} llamadas)")
+    if args.replay:
+        replay = registry.stats()
+        print(f"🎞️  Reproducción: {replay['replayed']} llamadas ({replay['unmatched']} sin entradas grabadas)")
+    if agent.embedding_batcher is not None:
+        batching = agent.embedding_batcher.stats()
+        print(f"🧠 Micro-batching: {batching['items']} queries en {batching['batches']} lotes "
+              f"(medio {batching['mean_batch']:.1f}, espera media {batching['mean_wait_ms']:.2f} ms)")
+    if agent.single_flight is not None:
+        coalescing = agent.single_flight.stats()
+        print(f"🔗 Single-flight: {coalescing['coalesced']}/{coalescing['calls']} llamadas coalescidas "
+              f"({coalescing['coalesced_rate']:.1%})")
+        for key, stats in sorted(coalescing["by_key"].items(), key=lambda item: -item[1]["coalesced"])[:10]:
+            print(f"   • {key[:60]}: {stats['coalesced']}/{stats['calls']}")
+    write_reports(reports, args.output)
+    print(f"✅ Resultados en {args.output} y {os.path.splitext(args.output)[0]}.csv")
+
+
+if __name__ == "__main__":
+    main()
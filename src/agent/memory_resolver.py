@@ -0,0 +1,108 @@
+"""
+Resolver en memoria (sustituto local de Neo4j)
+Misma interfaz de lectura que DependencyResolver, construido desde init_graph.FUNCTIONS.
+Útil para pruebas de carga y benchmarks sin base de datos.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.agent.dependency_resolver import DEFAULT_NAMESPACE
+from src.agent.graph_utils import topological_order, transitive_closure
+from src.agent.init_graph import FUNCTIONS
+
+
+class InMemoryResolver:
+    """Resuelve planes sobre un catálogo en memoria con latencia simulada opcional"""
+
+    def __init__(self, functions: Optional[List[Dict]] = None, latency_ms: float = 0.0):
+        functions = functions if functions is not None else FUNCTIONS
+        self.latency_ms = latency_ms
+        self._requires = {f["name"]: list(f["requires"]) for f in functions}
+        self._optional = {f["name"]: sorted(f.get("optional", [])) for f in functions}
+        self._descriptions = {f["name"]: f["description"] for f in functions}
+        self._namespaces = {f["name"]: f.get("namespace", DEFAULT_NAMESPACE) for f in functions}
+        # Estadísticas iniciales si vienen en el catálogo (p. ej. instantánea de Neo4j)
+        self._stats: Dict[str, Dict] = {
+            f["name"]: {"avg_duration_ms": f["avg_duration_ms"], "exec_count": f.get("exec_count") or 0}
+            for f in functions if f.get("avg_duration_ms") is not None
+        }
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+
+    def _plan(self, target_function: str) -> List[Dict]:
+        if target_function not in self._requires:
+            raise ValueError(f"❌ Función '{target_function}' no encontrada en el grafo")
+        closure = transitive_closure(self._requires, target_function)
+        order = topological_order({name: self._requires[name] for name in closure})
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "description": self._descriptions[name],
+                    "requires": sorted(self._requires[name]),
+                    "optional_requires": self._optional[name],
+                    "avg_duration_ms": self._stats.get(name, {}).get("avg_duration_ms"),
+                    "exec_count": self._stats.get(name, {}).get("exec_count", 0),
+                }
+                for name in order
+            ]
+
+    def get_execution_plan(self, target_function: str) -> List[Dict]:
+        self._round_trip()
+        return self._plan(target_function)
+
+    def get_execution_plans(self, target_functions: List[str]) -> Dict[str, List[Dict]]:
+        self._round_trip()
+        return {name: self._plan(name) for name in dict.fromkeys(target_functions)}
+
+    def record_executions(self, durations_ms: Dict[str, float], alpha: float = 0.3):
+        """Misma EWMA que DependencyResolver.record_executions"""
+        if not durations_ms:
+            return
+        self._round_trip()
+        with self._lock:
+            for name, ms in durations_ms.items():
+                stats = self._stats.setdefault(name, {"exec_count": 0, "avg_duration_ms": None})
+                avg = stats["avg_duration_ms"]
+                stats["avg_duration_ms"] = ms if avg is None else avg * (1 - alpha) + ms * alpha
+                stats["exec_count"] += 1
+
+    def get_function_graph(self, namespace: Optional[str] = None) -> List[Dict]:
+        self._round_trip()
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "description": self._descriptions[name],
+                    "requires": sorted(deps),
+                    "optional": self._optional[name],
+                    "avg_duration_ms": self._stats.get(name, {}).get("avg_duration_ms"),
+                    "exec_count": self._stats.get(name, {}).get("exec_count", 0),
+                    "embedding": [],
+                    "namespace": self._namespaces[name],
+                }
+                for name, deps in sorted(self._requires.items())
+                if namespace is None or self._namespaces[name] == namespace
+            ]
+
+    def list_namespaces(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for namespace in self._namespaces.values():
+            counts[namespace] = counts.get(namespace, 0) + 1
+        return dict(sorted(counts.items()))
+
+    def get_dependency_table(self) -> List[Dict[str, str]]:
+        self._round_trip()
+        return [
+            {"funcion": name, "dependencia": dep}
+            for name, deps in sorted(self._requires.items())
+            for dep in deps
+        ]
+
+    def close(self):
+        pass
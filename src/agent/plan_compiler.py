@@ -0,0 +1,300 @@
+"""
+Compilador offline de planes
+Valida el grafo Function/[:REQUIRES] y genera un artefacto binario con los planes
+precalculados para que el agente arranque sin consultar Neo4j.
+
+Uso:
+    python -m src.agent.plan_compiler validate
+    python -m src.agent.plan_compiler build --output plans.fmplan
+    python -m src.agent.plan_compiler check plans.fmplan
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.agent.functions import FUNCTION_REGISTRY
+from src.agent.graph_utils import find_cycles, topological_waves, transitive_closure
+
+# Formato del artefacto (little-endian):
+#   header | offsets de strings (u32[2n+1]) | blob utf-8 (alineado a 4) | costos (f32[n])
+#   | índice (u32[n+1]) | pool (u32[]) | embeddings normalizados (f32[n*dim])
+# Para cada función i el pool guarda: n_requires, requires..., n_optional, optional...,
+# n_waves, (len, ids...)*   (v2: agrega las dependencias opcionales podables)
+MAGIC = b"FMPLAN\x00\x00"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sHHIIII32s32s")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def graph_checksum(graph: List[Dict]) -> bytes:
+    """Huella del grafo (nombres, descripciones, aristas y su flag optional); ignora costos y embeddings"""
+    canonical = json.dumps(
+        [
+            [f["name"], f["description"], sorted(f["requires"]), sorted(f.get("optional") or [])]
+            for f in sorted(graph, key=lambda f: f["name"])
+        ],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).digest()
+
+
+def validate_graph(graph: List[Dict], registry: Dict = FUNCTION_REGISTRY) -> Dict[str, List]:
+    """
+    Valida el catálogo antes de compilar
+
+    Returns:
+        {"cycles": [[...]], "missing_registry": [...], "orphans": [...]}
+    """
+    requires = {f["name"]: list(f["requires"]) for f in graph}
+    connected = set()
+    for name, deps in requires.items():
+        if deps:
+            connected.add(name)
+            connected.update(deps)
+    return {
+        "cycles": find_cycles(requires),
+        "missing_registry": sorted(name for name in requires if name not in registry),
+        "orphans": sorted(name for name in requires if name not in connected),
+    }
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def description_embeddings(graph: List[Dict]) -> np.ndarray:
+    """Usa los embeddings guardados en Neo4j; si faltan, codifica las descripciones"""
+    stored = [f.get("embedding") or [] for f in graph]
+    dims = {len(vector) for vector in stored}
+    if len(dims) == 1 and 0 not in dims:
+        return _normalize(np.asarray(stored, dtype=np.float32))
+
+    from sentence_transformers import SentenceTransformer
+    print(f"🧠 Codificando {len(graph)} descripciones con {EMBEDDING_MODEL}...")
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    return _normalize(model.encode([f["description"] for f in graph], convert_to_numpy=True))
+
+
+def compile_artifact(graph: List[Dict], output_path: str, embeddings: Optional[np.ndarray] = None) -> Dict:
+    """Escribe el artefacto binario de planes (escritura atómica)"""
+    graph = sorted(graph, key=lambda f: f["name"])
+    names = [f["name"] for f in graph]
+    ids = {name: i for i, name in enumerate(names)}
+    requires = {f["name"]: [dep for dep in f["requires"] if dep in ids] for f in graph}
+    optional = {f["name"]: sorted(set(f.get("optional") or []) & set(requires[f["name"]])) for f in graph}
+    n = len(names)
+
+    # Strings internados: nombres y descripciones en un único blob
+    encoded = [s.encode("utf-8") for s in names] + [(f["description"] or "").encode("utf-8") for f in graph]
+    offsets = np.zeros(2 * n + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = b"".join(encoded)
+    blob += b"\x00" * (-len(blob) % 4)
+
+    costs = np.array(
+        [f["avg_duration_ms"] if f.get("avg_duration_ms") is not None else np.nan for f in graph],
+        dtype="<f4"
+    )
+
+    # Dependencias directas (y cuáles son opcionales) y oleadas topológicas por objetivo
+    index = np.zeros(n + 1, dtype="<u4")
+    pool: List[int] = []
+    for i, name in enumerate(names):
+        deps = sorted(requires[name])
+        pool.append(len(deps))
+        pool.extend(ids[dep] for dep in deps)
+        pool.append(len(optional[name]))
+        pool.extend(ids[dep] for dep in optional[name])
+        closure = transitive_closure(requires, name)
+        waves = topological_waves({member: requires[member] for member in closure})
+        pool.append(len(waves))
+        for wave in waves:
+            pool.append(len(wave))
+            pool.extend(ids[member] for member in wave)
+        index[i + 1] = len(pool)
+    pool_array = np.asarray(pool, dtype="<u4")
+
+    if embeddings is None:
+        embeddings = np.zeros((n, 0), dtype=np.float32)
+    embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+    dim = embeddings.shape[1] if n else 0
+
+    payload = b"".join([
+        offsets.tobytes(), blob, costs.tobytes(), index.tobytes(), pool_array.tobytes(), embeddings.tobytes()
+    ])
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, n, dim, len(blob), len(pool_array),
+        graph_checksum(graph), hashlib.sha256(payload).digest()
+    )
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, output_path)
+    return {"functions": n, "dim": dim, "bytes": HEADER.size + len(payload)}
+
+
+class PlanArtifact:
+    """
+    Artefacto de planes mapeado en memoria (mmap)
+
+    Expone la misma interfaz de lectura que DependencyResolver
+    (get_execution_plan / get_execution_plans) sin tocar Neo4j.
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, n, dim, blob_len, pool_len,
+         self.graph_checksum, payload_checksum) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"❌ '{path}' no es un artefacto de planes compatible")
+        if verify and hashlib.sha256(memoryview(self._mmap)[HEADER.size:]).digest() != payload_checksum:
+            self.close()
+            raise ValueError(f"❌ Artefacto '{path}' corrupto (checksum no coincide)")
+
+        pos = HEADER.size
+        self._offsets = np.frombuffer(self._mmap, dtype="<u4", count=2 * n + 1, offset=pos)
+        pos += self._offsets.nbytes
+        self._blob_pos = pos
+        pos += blob_len
+        self._costs = np.frombuffer(self._mmap, dtype="<f4", count=n, offset=pos)
+        pos += self._costs.nbytes
+        self._index = np.frombuffer(self._mmap, dtype="<u4", count=n + 1, offset=pos)
+        pos += self._index.nbytes
+        self._pool = np.frombuffer(self._mmap, dtype="<u4", count=pool_len, offset=pos)
+        pos += self._pool.nbytes
+        self.embeddings = (
+            np.frombuffer(self._mmap, dtype="<f4", count=n * dim, offset=pos).reshape(n, dim) if dim else None
+        )
+
+        self.names = [self._string(i) for i in range(n)]
+        self._ids = {name: i for i, name in enumerate(self.names)}
+        self._plans: Dict[str, List[Dict]] = {}
+
+    def _string(self, i: int) -> str:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._mmap[self._blob_pos + start:self._blob_pos + end].decode("utf-8")
+
+    def description(self, name: str) -> str:
+        return self._string(len(self.names) + self._ids[name])
+
+    def _decode(self, i: int):
+        pool = self._pool[self._index[i]:self._index[i + 1]].tolist()
+        n_requires = pool[0]
+        requires = pool[1:1 + n_requires]
+        pos = 1 + n_requires
+        optional = pool[pos + 1:pos + 1 + pool[pos]]
+        pos += 1 + pool[pos]
+        waves = []
+        for _ in range(pool[pos]):
+            size = pool[pos + 1]
+            waves.append(pool[pos + 2:pos + 2 + size])
+            pos += 1 + size
+        return requires, optional, waves
+
+    def get_execution_plan(self, target_function: str) -> List[Dict]:
+        """Plan precompilado en orden topológico (mismo formato que DependencyResolver)"""
+        if target_function in self._plans:
+            return self._plans[target_function]
+        if target_function not in self._ids:
+            raise ValueError(f"❌ Función '{target_function}' no encontrada en el grafo")
+        _, _, waves = self._decode(self._ids[target_function])
+        plan = []
+        for wave in waves:
+            for i in wave:
+                requires, optional, _ = self._decode(i)
+                cost = float(self._costs[i])
+                plan.append({
+                    "name": self.names[i],
+                    "description": self._string(len(self.names) + i),
+                    "requires": [self.names[dep] for dep in requires],
+                    "optional_requires": [self.names[dep] for dep in optional],
+                    "avg_duration_ms": None if np.isnan(cost) else cost,
+                    "exec_count": 0,
+                })
+        self._plans[target_function] = plan
+        return plan
+
+    def get_execution_plans(self, target_functions: List[str]) -> Dict[str, List[Dict]]:
+        return {name: self.get_execution_plan(name) for name in dict.fromkeys(target_functions)}
+
+    def is_stale(self, resolver) -> bool:
+        """Compara la huella del artefacto con el grafo actual en Neo4j (una consulta)"""
+        return graph_checksum(resolver.get_function_graph()) != self.graph_checksum
+
+    def close(self):
+        # Las vistas numpy apuntan al mmap: se sueltan antes de cerrarlo
+        self._offsets = self._costs = self._index = self._pool = self.embeddings = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # Aún hay vistas vivas; el mmap se libera al recolectarlas
+        self._file.close()
+
+
+def _print_report(report: Dict[str, List]):
+    print("\n🔎 Validación del grafo:")
+    print(f"   • Ciclos: {len(report['cycles'])}")
+    for cycle in report["cycles"]:
+        print(f"      ↻ {' → '.join(cycle)}")
+    print(f"   • Sin implementación en FUNCTION_REGISTRY: {report['missing_registry'] or 'ninguna'}")
+    print(f"   • Nodos huérfanos (sin [:REQUIRES]): {report['orphans'] or 'ninguno'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compilador offline de planes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("validate", help="Valida el grafo en Neo4j")
+    build = sub.add_parser("build", help="Valida y genera el artefacto")
+    build.add_argument("--output", default=os.getenv("AGENT_PLAN_ARTIFACT", "plans.fmplan"))
+    build.add_argument("--no-embeddings", action="store_true", help="No incluir embeddings de descripciones")
+    build.add_argument("--allow-missing", action="store_true", help="Permitir funciones sin implementación")
+    check = sub.add_parser("check", help="Verifica si un artefacto está desactualizado")
+    check.add_argument("path")
+    args = parser.parse_args()
+
+    from src.agent.dependency_resolver import DependencyResolver
+    resolver = DependencyResolver()
+    try:
+        if args.command == "check":
+            artifact = PlanArtifact(args.path)
+            stale = artifact.is_stale(resolver)
+            artifact.close()
+            print("⚠️  Artefacto desactualizado: recompílalo" if stale else "✅ Artefacto al día con Neo4j")
+            raise SystemExit(1 if stale else 0)
+
+        graph = resolver.get_function_graph()
+        report = validate_graph(graph)
+        _print_report(report)
+        errors = bool(report["cycles"]) or (bool(report["missing_registry"]) and not getattr(args, "allow_missing", False))
+        if errors:
+            print("\n❌ El grafo no es válido para compilar planes")
+            raise SystemExit(1)
+        if args.command == "validate":
+            print("\n✅ Grafo válido")
+            return
+
+        embeddings = None if args.no_embeddings else description_embeddings(graph)
+        stats = compile_artifact(graph, args.output, embeddings)
+        print(f"\n✅ Artefacto generado: {args.output}")
+        print(f"   • Funciones: {stats['functions']} | Dimensión: {stats['dim']} | Tamaño: {stats['bytes']} bytes")
+    finally:
+        resolver.close()
+
+
+if __name__ == "__main__":
+    main()
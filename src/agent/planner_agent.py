@@ -6,54 +6,269 @@ EXAMEN VAN LOS PLANEERS - Ing. Remigio Hurtado (PhD)
 
 import os
 import json
+import random
+import time
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
-from typing import List, Dict, TypedDict, Optional
+from typing import Any, Callable, List, Dict, TypedDict, Optional, Tuple
 from dotenv import load_dotenv
 
 # Carga variables de entorno
 load_dotenv()
 
 # Componentes del sistema
-from src.agent.functions import FUNCTION_REGISTRY
+from src.agent.functions import (
+    FUNCTION_REGISTRY, FUNCTION_EXECUTION_MODE, FUNCTION_CACHE_TTL, FUNCTION_INPUTS, SIDE_EFFECT_FREE_FUNCTIONS
+)
 from src.agent.dependency_resolver import DependencyResolver
+from src.agent.scheduler import CostAwareScheduler
+from src.agent.specialized_graph import compile_specialized_plan
+from src.agent.plan_compiler import PlanArtifact
+from src.agent.process_executor import ProcessStepExecutor, bind_shared_scope
+from src.agent.result_cache import ResultCache, inputs_fingerprint
+from src.agent.profiling import RequestProfiler, bind_to_request, current_profiler
+from src.agent.embedding_index import DescriptionIndex, encode_query
+from src.agent.prefetch import SpeculativePrefetcher
+from src.agent.query_cache import SemanticQueryCache
+from src.agent.job_queue import QueueStepExecutor
+from src.agent.dataflow import DataflowExecutor
+from src.agent.graph_utils import prune_optional, step_sources
+from src.agent.single_flight import SingleFlight
+from src.agent.embedding_batcher import EmbeddingBatcher
+from src.agent.catalog_partitions import PartitionedCatalog
+from src.agent.replay import RecordingRegistry, ReplayRegistry
 
 # LangGraph
 from langgraph.graph import StateGraph, END
 
-# Embeddings (código abierto - Sentence Transformers)
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
-# Inicializa modelo de embeddings (ligero, código abierto)
-print("🧠 Cargando modelo de embeddings (all-MiniLM-L6-v2)...")
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-print("✅ Modelo de embeddings cargado\n")
+# Modelo de embeddings (código abierto - Sentence Transformers), cargado en el primer uso:
+# los workers de proceso reimportan este módulo (spawn/forkserver) y no lo necesitan
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+
+def get_embedding_model():
+    """Modelo de embeddings compartido por el proceso (ligero, código abierto)"""
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            from sentence_transformers import SentenceTransformer
+            print("🧠 Cargando modelo de embeddings (all-MiniLM-L6-v2)...")
+            _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            print("✅ Modelo de embeddings cargado\n")
+        return _embedding_model
+
+# Un paso vencido solo dice que cuesta más que su presupuesto: se registra como
+# presupuesto × factor para que la EWMA lo supere y _fit_to_deadline llegue a podar
+TIMEOUT_COST_FACTOR = 2.0
+
+# Descripciones usadas para la selección semántica (compartidas con la UI Streamlit)
+FUNCTION_DESCRIPTIONS = [
+    {"name": "obtenerInfoCliente", "desc": "Obtener información del cliente por ID o nombre"},
+    {"name": "obtenerInfoProducto", "desc": "Obtener información del producto por SKU o nombre"},
+    {"name": "verificarStock", "desc": "Verificar disponibilidad de stock del producto"},
+    {"name": "calcularPrecioTotal", "desc": "Calcular el precio total incluyendo impuestos y descuentos"},
+    {"name": "crearPedido", "desc": "Crear un nuevo pedido en el sistema"},
+    {"name": "enviarConfirmacion", "desc": "Enviar correo de confirmación al cliente"}
+]
 
 # Definición del estado
 class AgentState(TypedDict):
     user_query: str
-    query_embedding: Optional[List[float]]
+    query_embedding: Optional[np.ndarray]
     target_function: Optional[str]
     execution_plan: List[Dict[str, str]]
     executed_functions: List[str]
     current_step: int
     results: Dict[str, Dict]
+    durations_ms: Dict[str, float]
+    specialized: bool
+    prefetched: Dict[str, Any]
+    cache_entry: Optional[Dict[str, Any]]
+    namespace: Optional[str]
+    deadline: Optional[float]
+    skipped: List[str]
+    timed_out_ms: Dict[str, float]
     final_response: str
     logs: List[str]
 
+# ========== CACHÉ DE WORKFLOWS COMPILADOS ==========
+# El StateGraph se compila una sola vez por proceso y modo de ejecución.
+# Los nodos no capturan al agente: lo reciben en config["configurable"]["agent"],
+# así un mismo grafo compilado sirve a cualquier instancia y a cualquier request.
+_COMPILED_WORKFLOWS: Dict[str, Any] = {}
+_WORKFLOW_LOCK = threading.Lock()
+
+# Entradas de log que conserva el agente entre requests
+LOG_HISTORY = int(os.getenv("AGENT_LOG_HISTORY", "1000"))
+
+# Límite de supersteps de LangGraph (el bucle execute_step consume uno por paso)
+RECURSION_LIMIT = int(os.getenv("AGENT_RECURSION_LIMIT", "1000"))
+
+def _agent_node(method_name: str):
+    """Adapta un método del agente a nodo LangGraph (despacho vía config)"""
+    stage_name = method_name.replace("node_", "")
+    def node(state: AgentState, config) -> AgentState:
+        method = getattr(config["configurable"]["agent"], method_name)
+        profiler = config["configurable"].get("profiler")
+        if profiler is None:
+            return method(state)
+        with profiler.stage(stage_name):
+            return method(state)
+    return node
+
+def _route_after_selection(state: AgentState) -> str:
+    """Los objetivos con plan especializado saltan la resolución de dependencias"""
+    return "run_specialized" if state.get("specialized") else "resolve_dependencies"
+
+def _route_next_step(state: AgentState) -> str:
+    """Decide si continuar ejecutando"""
+    if state["current_step"] < len(state["execution_plan"]):
+        return "execute_step"
+    return END
+
+def _build_workflow(parallel: bool):
+    """Construye y compila el grafo LangGraph del agente"""
+    workflow = StateGraph(AgentState)
+    workflow.add_node("receive_input", _agent_node("node_receive_input"))
+    workflow.add_node("generate_embedding", _agent_node("node_generate_embedding"))
+    workflow.add_node("select_function", _agent_node("node_select_function"))
+    workflow.add_node("resolve_dependencies", _agent_node("node_resolve_dependencies"))
+    workflow.add_node("run_specialized", _agent_node("node_run_specialized"))
+    workflow.add_node("generate_response", _agent_node("node_generate_response"))
+    
+    # Define flujo
+    workflow.set_entry_point("receive_input")
+    workflow.add_edge("receive_input", "generate_embedding")
+    workflow.add_edge("generate_embedding", "select_function")
+    workflow.add_conditional_edges(
+        "select_function",
+        _route_after_selection,
+        {"run_specialized": "run_specialized", "resolve_dependencies": "resolve_dependencies"}
+    )
+    workflow.add_edge("run_specialized", "generate_response")
+    if parallel:
+        workflow.add_node("execute_parallel", _agent_node("node_execute_parallel"))
+        workflow.add_edge("resolve_dependencies", "execute_parallel")
+        workflow.add_edge("execute_parallel", "generate_response")
+    else:
+        workflow.add_node("execute_step", _agent_node("node_execute_step"))
+        workflow.add_edge("resolve_dependencies", "execute_step")
+        workflow.add_conditional_edges(
+            "execute_step",
+            _route_next_step,
+            {"execute_step": "execute_step", END: "generate_response"}
+        )
+    workflow.add_edge("generate_response", END)
+    return workflow.compile()
+
+def get_compiled_workflow(parallel: bool = False):
+    """Retorna el workflow compilado del proceso (lo compila la primera vez)"""
+    key = "parallel" if parallel else "sequential"
+    if key not in _COMPILED_WORKFLOWS:
+        with _WORKFLOW_LOCK:
+            if key not in _COMPILED_WORKFLOWS:
+                _COMPILED_WORKFLOWS[key] = _build_workflow(parallel)
+    return _COMPILED_WORKFLOWS[key]
+
 class FunctionMatcherAgent:
-    def __init__(self):
-        self.resolver = DependencyResolver()
+    def __init__(self, max_workers: int = 1, specialize_after: Optional[int] = None,
+                 plan_artifact: Optional[str] = None, process_workers: int = 0,
+                 result_cache_size: int = 0, profile_sample_rate: float = 0.0,
+                 profile_dir: str = "profiles", resolver=None, verbose: bool = True,
+                 speculative_top_k: int = 0, query_cache_size: int = 0,
+                 query_cache_threshold: float = 0.92, job_queue: Optional[str] = None,
+                 dataflow: bool = False, deadline_ms: Optional[float] = None,
+                 step_timeout_ms: Optional[float] = None, single_flight: bool = False,
+                 embedding_batch_window_ms: Optional[float] = None, embedding_batch_size: int = 32,
+                 partitions: bool = False, partition_max: int = 8, partition_max_mb: float = 0.0,
+                 registry: Optional[Dict[str, Callable]] = None, step_pool_size: int = 32):
+        # Con un artefacto precompilado los planes se sirven desde mmap: arranque sin Neo4j
+        self.plan_artifact = PlanArtifact(plan_artifact) if plan_artifact else None
+        # resolver inyectable (p. ej. InMemoryResolver en pruebas de carga)
+        self.resolver = resolver if resolver is not None else (None if self.plan_artifact else DependencyResolver())
+        self.plan_source = self.plan_artifact or self.resolver
+        # max_workers > 1 activa el planificador por camino crítico (ejecución paralela)
+        self.max_workers = max_workers
+        self.scheduler = CostAwareScheduler(max_workers=max_workers) if max_workers > 1 else None
+        # dataflow: cada paso se dispara desde los futures de sus entradas declaradas
+        self.dataflow = DataflowExecutor(max_workers=max(max_workers, 2)) if dataflow else None
+        # Presupuesto por request (ms) y timeout por paso: lo que no alcanza se omite
+        self.deadline_ms = deadline_ms
+        self.step_timeout_s = step_timeout_ms / 1000 if step_timeout_ms else None
+        self._cost_estimator = self.scheduler or CostAwareScheduler(max_workers=1)
+        # Un solo pool de pasos por agente (camino crítico, dataflow y pasos con timeout):
+        # los hilos viven entre requests; cada plan sigue acotado a max_workers
+        self.step_pool_size = max(step_pool_size, max_workers)
+        self._step_pool = None
+        self._step_pool_lock = threading.Lock()
+        # specialize_after = N compila un grafo estático para objetivos con N o más requests
+        self.specialize_after = specialize_after
+        self._target_hits = Counter()
+        self._specialized: Dict[Tuple[Optional[str], str], Dict] = {}  # (namespace, objetivo)
+        self._specialize_lock = threading.Lock()
+        # registry sustituye a FUNCTION_REGISTRY (p. ej. grabación o reproducción de trazas);
+        # los workers de procesos y de la cola siempre importan el registro real
+        if registry is not None and (process_workers > 0 or job_queue):
+            raise ValueError("❌ Un registro propio solo aplica a la ejecución en el proceso del agente")
+        self.registry = registry if registry is not None else FUNCTION_REGISTRY
+        # process_workers > 0 pre-crea un pool para las funciones marcadas como "process"
+        self.process_executor = ProcessStepExecutor(process_workers) if process_workers > 0 else None
+        # job_queue = ruta SQLite: cada paso se publica y lo ejecutan workers externos
+        self.queue_executor = QueueStepExecutor(job_queue) if job_queue else None
+        # single_flight: requests concurrentes idénticos comparten plan y pasos en curso
+        self.single_flight = SingleFlight() if single_flight else None
+        # result_cache_size > 0 memoiza resultados entre requests (TTL en FUNCTION_CACHE_TTL)
+        self.result_cache = ResultCache(result_cache_size, ttls=FUNCTION_CACHE_TTL) if result_cache_size > 0 else None
+        # Perfilado opcional: por flag en invoke() o muestreando una fracción de requests
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_dir = profile_dir
+        # speculative_top_k > 0 adelanta las hojas compartidas por los top-k candidatos
+        self.prefetcher = SpeculativePrefetcher(
+            top_k=speculative_top_k, plan_source=self.plan_artifact
+        ) if speculative_top_k > 0 else None
+        # query_cache_size > 0 reutiliza objetivo y plan de queries casi idénticos
+        self.query_cache = SemanticQueryCache(
+            query_cache_size, threshold=query_cache_threshold
+        ) if query_cache_size > 0 else None
+        self.embedding_model = get_embedding_model()
+        # Ventana de micro-batching: queries concurrentes comparten una pasada del modelo
+        self.embedding_batcher = EmbeddingBatcher(
+            self.embedding_model, embedding_batch_window_ms, embedding_batch_size
+        ) if embedding_batch_window_ms is not None else None
+        # partitions: requests con namespace buscan y recorren solo su partición (carga perezosa)
+        if partitions and self.resolver is None:
+            raise ValueError("❌ Los catálogos por namespace requieren un resolver (Neo4j o en memoria)")
+        self.catalog = PartitionedCatalog(
+            self.resolver, self.embedding_model, partition_max, int(partition_max_mb * 1e6)
+        ) if partitions else None
+        # Matriz de descripciones normalizada una sola vez (el artefacto ya la trae)
+        if self.plan_artifact is not None and self.plan_artifact.embeddings is not None:
+            self.description_index = DescriptionIndex(
+                self.plan_artifact.names, self.plan_artifact.embeddings, normalized=True
+            )
+        else:
+            self.description_index = DescriptionIndex.from_descriptions(self.embedding_model, FUNCTION_DESCRIPTIONS)
         self.start_time = datetime.now()
-        self.logs = []
-        self._print_header()
+        # Historial acotado: un agente de larga vida no debe crecer sin límite
+        self.logs = deque(maxlen=LOG_HISTORY)
+        self.verbose = verbose
+        if verbose:
+            self._print_header()
     
     def _print_header(self):
         print("="*70)
         print("🚀 FUNCTION MATCHER PLANNER")
         print("="*70)
-        print(f"📍 Conexión Neo4j: {os.getenv('NEO4J_URI', 'bolt://localhost:7687')}")
+        if self.plan_artifact is not None:
+            print(f"📦 Planes precompilados: {self.plan_artifact.path} (sin Neo4j)")
+        else:
+            print(f"📍 Conexión Neo4j: {os.getenv('NEO4J_URI', 'bolt://localhost:7687')}")
         print(f"🧠 Modelo de embeddings: all-MiniLM-L6-v2 (código abierto)")
         print("="*70 + "\n")
     
@@ -61,12 +276,16 @@ class FunctionMatcherAgent:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] [{level}] {message}"
         self.logs.append(log_entry)
-        print(log_entry)
+        if self.verbose:
+            print(log_entry)
     
     # ========== NODOS DEL GRAFO ==========
     
     def node_receive_input(self, state: AgentState) -> AgentState:
         """1.a. Recibe input del usuario"""
+        if state["user_query"]:
+            self.log(f"✅ Query recibido: '{state['user_query']}'", "INPUT")
+            return state
         self.log("🔄 Esperando input del usuario...", "INPUT")
         print()
         user_query = input("💬 Usuario: ")
@@ -76,42 +295,236 @@ class FunctionMatcherAgent:
     
     def node_generate_embedding(self, state: AgentState) -> AgentState:
         """1.c. Genera embedding del query"""
+        if self.query_cache is not None:
+            entry = self.query_cache.lookup_text(state["user_query"], state["namespace"])
+            if entry is not None:
+                self.log("♻️  Query idéntico en caché semántica: se omite el modelo", "EMBEDDING")
+                return {**state, "query_embedding": entry["embedding"], "cache_entry": entry}
         self.log("🧠 Generando embedding del query...", "EMBEDDING")
-        embedding = embedding_model.encode([state["user_query"]])[0].tolist()
-        self.log(f"✅ Embedding generado (dimensión: {len(embedding)})", "EMBEDDING")
+        if self.embedding_batcher is not None:
+            embedding = self.embedding_batcher.encode(state["user_query"])
+        else:
+            embedding = encode_query(self.embedding_model, state["user_query"])
+        self.log(f"✅ Embedding generado (dimensión: {embedding.shape[0]}, {embedding.dtype})", "EMBEDDING")
         return {**state, "query_embedding": embedding}
     
     def node_select_function(self, state: AgentState) -> AgentState:
         """1.d. Búsqueda semántica para seleccionar función objetivo"""
         self.log("🔍 Búsqueda semántica: seleccionando función objetivo...", "SELECTION")
+        partition = self._partition(state)
+        entry = self._entry_in_scope(state["cache_entry"], partition)
+        if entry is None and self.query_cache is not None:
+            entry, similarity = self.query_cache.lookup_embedding(state["query_embedding"], state["namespace"])
+            entry = self._entry_in_scope(entry, partition)
+            if entry is not None:
+                self.log(f"♻️  Paráfrasis de '{entry['query']}' (similitud: {similarity:.2%})", "SELECTION")
+                # La paráfrasis queda como entrada propia: la próxima vez es acierto exacto
+                entry = self.query_cache.put(
+                    state["user_query"], state["query_embedding"],
+                    entry["target"], entry["confidence"], entry["plan"], state["namespace"]
+                )
+        if entry is not None:
+            target_function = entry["target"]
+            self.log(f"✅ Función objetivo: {target_function} (desde caché semántica)", "SELECTION")
+            return {
+                **state,
+                "target_function": target_function,
+                "specialized": (state["namespace"], target_function) in self._specialized,
+                "cache_entry": entry,
+            }
         
-        # Descripciones de funciones
-        function_descriptions = [
-            {"name": "obtenerInfoCliente", "desc": "Obtener información del cliente por ID o nombre"},
-            {"name": "obtenerInfoProducto", "desc": "Obtener información del producto por SKU o nombre"},
-            {"name": "verificarStock", "desc": "Verificar disponibilidad de stock del producto"},
-            {"name": "calcularPrecioTotal", "desc": "Calcular el precio total incluyendo impuestos y descuentos"},
-            {"name": "crearPedido", "desc": "Crear un nuevo pedido en el sistema"},
-            {"name": "enviarConfirmacion", "desc": "Enviar correo de confirmación al cliente"}
-        ]
-        
-        # Generar embeddings y calcular similitud
-        desc_embeddings = embedding_model.encode([f["desc"] for f in function_descriptions])
-        query_embedding = np.array(state["query_embedding"]).reshape(1, -1)
-        similarities = cosine_similarity(query_embedding, desc_embeddings)[0]
-        best_idx = int(np.argmax(similarities))
-        target_function = function_descriptions[best_idx]["name"]
-        confidence = float(similarities[best_idx])
+        # Similitud coseno = producto matriz-vector sobre la matriz pre-normalizada
+        index = partition["index"] if partition is not None else self.description_index
+        prefetched = {}
+        if self.prefetcher is not None:
+            candidates = index.top_k(state["query_embedding"], self.prefetcher.top_k)
+            target_function, confidence = candidates[0]
+            # Las hojas comunes corren mientras se resuelve el plan del objetivo
+            prefetched = self.prefetcher.launch(
+                [name for name, _ in candidates], bind_shared_scope(self._prefetch_step), state["namespace"]
+            )
+            if prefetched:
+                self.log(f"🔮 Prefetch especulativo: {', '.join(prefetched)}", "SELECTION")
+        else:
+            target_function, confidence = index.best(state["query_embedding"])
         
         self.log(f"✅ Función objetivo: {target_function} (confianza: {confidence:.2%})", "SELECTION")
-        return {**state, "target_function": target_function}
+        if self.query_cache is not None:
+            self.query_cache.put(
+                state["user_query"], state["query_embedding"], target_function, confidence,
+                namespace=state["namespace"]
+            )
+        return {
+            **state,
+            "target_function": target_function,
+            "specialized": (state["namespace"], target_function) in self._specialized,
+            "prefetched": prefetched,
+        }
+    
+    def _partition(self, state: AgentState) -> Optional[Dict[str, Any]]:
+        """Partición del namespace del request (None = catálogo global)"""
+        if state["namespace"] is None:
+            return None
+        partition = self.catalog.partition(state["namespace"])
+        self.log(f"🗂️  Namespace '{state['namespace']}' ({len(partition['names'])} funciones)", "SELECTION")
+        return partition
+    
+    @staticmethod
+    def _entry_in_scope(entry: Optional[Dict[str, Any]], partition: Optional[Dict[str, Any]]):
+        """Una entrada de la caché semántica de otro namespace no sirve como selección"""
+        if entry is None or partition is None or entry["target"] in partition["names"]:
+            return entry
+        return None
+    
+    def _prefetch_step(self, func_name: str):
+        """Ejecución especulativa de una hoja (sin dependencias de entrada)"""
+        return self._run_step(func_name, {})
     
     def node_resolve_dependencies(self, state: AgentState) -> AgentState:
         """1.e. Explora grafo Neo4j y crea plan ordenado"""
         self.log(f"🕸️  Resolviendo dependencias para '{state['target_function']}'", "GRAPH")
-        plan = self.resolver.get_execution_plan(state["target_function"])
-        self.log(f"✅ Plan generado con {len(plan)} pasos", "GRAPH")
-        return {**state, "execution_plan": plan, "current_step": 0}
+        entry = state["cache_entry"]
+        if entry is not None and entry["plan"] is not None:
+            plan = entry["plan"]
+            self.log(f"♻️  Plan reutilizado desde caché semántica ({len(plan)} pasos)", "GRAPH")
+        else:
+            plan = self._resolve_plan(state["target_function"], state["namespace"])
+            self.log(f"✅ Plan generado con {len(plan)} pasos", "GRAPH")
+            if self.query_cache is not None:
+                self.query_cache.store_plan(state["user_query"], plan, state["namespace"])
+        if self.result_cache is not None:
+            self.result_cache.observe_plan(plan)
+        if self.prefetcher is not None:
+            self.prefetcher.observe_plan(state["target_function"], plan, state["namespace"])
+        self._maybe_specialize(state["target_function"], plan, state["namespace"])
+        plan, pruned = self._fit_to_deadline(state, plan)
+        return {**state, "execution_plan": plan, "current_step": 0, "skipped": state["skipped"] + pruned}
+    
+    def _resolve_plan(self, target: str, namespace: Optional[str] = None) -> List[Dict]:
+        # Con namespace el plan sale de la instantánea de la partición (sin ir a Neo4j)
+        source = self.catalog.partition(namespace)["resolver"] if namespace is not None else self.plan_source
+        if self.single_flight is None:
+            return source.get_execution_plan(target)
+        plan, shared = self.single_flight.do(("plan", namespace, target), lambda: source.get_execution_plan(target))
+        if shared:
+            self.log(f"🔗 Plan de '{target}' compartido con una resolución en curso", "GRAPH")
+        return plan
+    
+    def _remaining_ms(self, state: AgentState) -> Optional[float]:
+        if state["deadline"] is None:
+            return None
+        return (state["deadline"] - time.monotonic()) * 1000
+    
+    def _fit_to_deadline(self, state: AgentState, plan: List[Dict]):
+        """Poda las dependencias opcionales si el costo estimado no cabe en el presupuesto"""
+        remaining = self._remaining_ms(state)
+        if remaining is None or not any(step.get("optional_requires") for step in plan):
+            return plan, []
+        estimate = self._cost_estimator.simulate(plan)["makespan_ms"]
+        if estimate <= remaining:
+            return plan, []
+        plan, pruned = prune_optional(plan, state["target_function"])
+        if pruned:
+            self.log(
+                f"✂️  Presupuesto corto ({remaining:.0f} ms < {estimate:.0f} ms estimados): "
+                f"se omiten dependencias opcionales {', '.join(pruned)}", "GRAPH"
+            )
+        return plan, pruned
+    
+    def _maybe_specialize(self, target: str, plan: List[Dict], namespace: Optional[str] = None):
+        """Compila un grafo estático para el objetivo (por namespace) cuando se vuelve frecuente"""
+        if self.specialize_after is None:
+            return
+        key = (namespace, target)
+        with self._specialize_lock:
+            self._target_hits[key] += 1
+            if key in self._specialized or self._target_hits[key] < self.specialize_after:
+                return
+            self._specialized[key] = {"plan": plan, "app": compile_specialized_plan(plan)}
+        self.log(f"⚡ Plan especializado compilado para '{target}'", "GRAPH")
+    
+    def _refresh_specialized_costs(self, observed: Dict[str, float], alpha: float = 0.3):
+        """
+        Los planes especializados no se vuelven a resolver: sus costos siguen las
+        observaciones locales (misma EWMA que el resolver) para que la poda por
+        presupuesto de node_run_specialized use estimaciones al día
+        """
+        if not observed or not self._specialized:
+            return
+        with self._specialize_lock:
+            for entry in self._specialized.values():
+                plan = []
+                for step in entry["plan"]:
+                    ms = observed.get(step["name"])
+                    if ms is not None:
+                        avg = step.get("avg_duration_ms")
+                        step = {**step, "avg_duration_ms": ms if avg is None else avg * (1 - alpha) + ms * alpha}
+                    plan.append(step)
+                entry["plan"] = plan
+    
+    def invalidate_specialized(self, target: Optional[str] = None):
+        """Descarta planes especializados (p. ej. tras cambiar el grafo en Neo4j), en todos los namespaces"""
+        with self._specialize_lock:
+            if target is None:
+                self._specialized.clear()
+                self._target_hits.clear()
+            else:
+                for key in [key for key in self._target_hits if key[1] == target]:
+                    self._specialized.pop(key, None)
+                    self._target_hits.pop(key, None)
+    
+    def invalidate_query_cache(self):
+        """Vacía la caché semántica (planes o descripciones cambiaron)"""
+        if self.query_cache is not None:
+            self.query_cache.clear()
+    
+    def node_run_specialized(self, state: AgentState) -> AgentState:
+        """1.e + 1.f. Ejecuta el grafo estático precompilado del objetivo"""
+        entry = self._specialized[(state["namespace"], state["target_function"])]
+        self.log(
+            f"⚡ Usando plan especializado de '{state['target_function']}' ({len(entry['plan'])} pasos)", "GRAPH"
+        )
+        # El grafo compilado tiene todos los nodos: los podados por presupuesto no ejecutan
+        plan, pruned = self._fit_to_deadline(state, entry["plan"])
+        output = entry["app"].invoke(
+            {"results": {}, "durations_ms": {}, "executed_functions": [], "skipped": [], "timed_out_ms": {}},
+            config={
+                "configurable": {
+                    "agent": self, "prefetched": state["prefetched"], "deadline": state["deadline"],
+                    "profiler": current_profiler(), "pruned": set(pruned)
+                },
+                "recursion_limit": RECURSION_LIMIT
+            }
+        )
+        return {
+            **state,
+            "execution_plan": plan,
+            "results": {**state["results"], **output["results"]},
+            "durations_ms": {**state["durations_ms"], **output["durations_ms"]},
+            "executed_functions": state["executed_functions"] + output["executed_functions"],
+            "skipped": state["skipped"] + pruned + output["skipped"],
+            "timed_out_ms": {**state["timed_out_ms"], **output["timed_out_ms"]},
+            "current_step": len(plan),
+        }
+    
+    def run_specialized_step(self, func_name: str, dep_results: Dict[str, Any],
+                             prefetched: Optional[Dict[str, Any]] = None,
+                             deadline: Optional[float] = None, blocked: List[str] = ()) -> Dict:
+        """Ejecuta un nodo de un grafo especializado (actualización parcial del estado)"""
+        if func_name not in self.registry:
+            self.log(f"❌ Función '{func_name}' no encontrada", "ERROR")
+            return {}
+        timeouts = {}
+        outcome = self._run_step_bounded(func_name, dep_results, prefetched, deadline, blocked, timeouts)
+        if outcome is None:
+            return {"skipped": [func_name], "timed_out_ms": timeouts}
+        result, duration_ms, cached = outcome
+        self._log_step_done(func_name, duration_ms, cached)
+        return {
+            "results": {func_name: result},
+            "durations_ms": {} if cached else {func_name: duration_ms},
+            "executed_functions": [func_name]
+        }
     
     def node_execute_step(self, state: AgentState) -> AgentState:
         """1.f. Ejecuta un paso del plan"""
@@ -119,24 +532,246 @@ class FunctionMatcherAgent:
         if step_idx >= len(state["execution_plan"]):
             return {**state, "current_step": step_idx + 1}
         
+        remaining = self._remaining_ms(state)
+        if remaining is not None and remaining <= 0:
+            rest = [step["name"] for step in state["execution_plan"][step_idx:]]
+            self.log(f"⏱️  Deadline vencido: se omiten {', '.join(rest)}", "EXEC")
+            return {**state, "current_step": len(state["execution_plan"]), "skipped": state["skipped"] + rest}
+        
         func_name = state["execution_plan"][step_idx]["name"]
         self.log(f"⚙️  Ejecutando [{step_idx+1}/{len(state['execution_plan'])}]: {func_name}", "EXEC")
         
         # Ejecuta función simulada
-        if func_name in FUNCTION_REGISTRY:
-            result = FUNCTION_REGISTRY[func_name]()
+        if func_name in self.registry:
+            step = state["execution_plan"][step_idx]
+            sources = step_sources(step, FUNCTION_INPUTS)
+            dep_results = {dep: state["results"][dep] for dep in sources if dep in state["results"]}
+            # Solo bloquea una dependencia obligatoria; sin la opcional el paso corre igual
+            optional = step.get("optional_requires", [])
+            blocked = [dep for dep in step.get("requires", []) if dep in state["skipped"] and dep not in optional]
+            timeouts = {}
+            outcome = self._run_step_bounded(
+                func_name, dep_results, state["prefetched"], state["deadline"], blocked, timeouts
+            )
+            if outcome is None:
+                return {
+                    **state, "current_step": step_idx + 1, "skipped": state["skipped"] + [func_name],
+                    "timed_out_ms": {**state["timed_out_ms"], **timeouts},
+                }
+            result, duration_ms, cached = outcome
             state["results"][func_name] = result
-            self.log(f"✅ {func_name} completado", "EXEC")
+            if not cached:
+                state["durations_ms"][func_name] = duration_ms
+            self._log_step_done(func_name, duration_ms, cached)
         else:
             self.log(f"❌ Función '{func_name}' no encontrada", "ERROR")
         
         return {**state, "current_step": step_idx + 1, "executed_functions": state["executed_functions"] + [func_name]}
     
-    def node_should_continue(self, state: AgentState) -> str:
-        """Decide si continuar ejecutando"""
-        if state["current_step"] < len(state["execution_plan"]):
-            return "execute_step"
-        return END
+    def _step_budget_s(self, deadline: Optional[float]) -> Optional[float]:
+        """Tiempo máximo del próximo paso: su timeout acotado por el deadline del request"""
+        limits = []
+        if self.step_timeout_s is not None:
+            limits.append(self.step_timeout_s)
+        if deadline is not None:
+            limits.append(deadline - time.monotonic())
+        return max(0.0, min(limits)) if limits else None
+    
+    def _run_step_bounded(self, func_name: str, dep_results: Dict[str, Any],
+                          prefetched: Optional[Dict[str, Any]], deadline: Optional[float],
+                          blocked: List[str] = (), timeouts: Optional[Dict[str, float]] = None):
+        """
+        _run_step con deadline y timeout por paso; None si el paso se omite
+
+        Un paso que agota su tiempo se anota en `timeouts` con el presupuesto
+        consumido (ms): una cota inferior de su costo (ver TIMEOUT_COST_FACTOR).
+        """
+        if blocked:
+            self.log(f"⏭️  {func_name} omitido: depende de {', '.join(blocked)}", "EXEC")
+            return None
+        budget = self._step_budget_s(deadline)
+        if budget is None:
+            return self._run_step(func_name, dep_results, prefetched)
+        if budget <= 0:
+            self.log(f"⏱️  Deadline vencido: se omite {func_name}", "EXEC")
+            return None
+        future = self._shared_pool().submit(
+            bind_shared_scope(bind_to_request(self._run_step)), func_name, dep_results, prefetched)
+        try:
+            return future.result(timeout=budget)
+        except TimeoutError:
+            if future.done():
+                raise  # TimeoutError propio de la función, no del presupuesto
+            # El hilo no se puede interrumpir: termina en segundo plano y su resultado se descarta
+            self.log(f"⏱️  {func_name} superó su tiempo ({budget * 1000:.0f} ms): se omite", "EXEC")
+            if timeouts is not None:
+                timeouts[func_name] = budget * 1000
+            return None
+    
+    def _shared_pool(self) -> ThreadPoolExecutor:
+        with self._step_pool_lock:
+            if self._step_pool is None:
+                self._step_pool = ThreadPoolExecutor(max_workers=self.step_pool_size, thread_name_prefix="step")
+            return self._step_pool
+    
+    def _log_step_done(self, func_name: str, duration_ms: float, cached: bool):
+        if cached:
+            self.log(f"♻️  {func_name} reutilizado desde caché", "EXEC")
+        else:
+            self.log(f"✅ {func_name} completado ({duration_ms:.1f} ms)", "EXEC")
+    
+    def _run_step(self, func_name: str, dep_results: Dict[str, Any],
+                  prefetched: Optional[Dict[str, Any]] = None):
+        """
+        Ejecuta un paso del plan consultando antes el prefetch y la caché de resultados
+        
+        Returns:
+            (resultado, duración en ms, si vino de caché)
+        """
+        future = self.prefetcher.adopt(prefetched, func_name) if self.prefetcher is not None else None
+        if future is not None:
+            self.log(f"🔮 {func_name} adoptado del prefetch", "EXEC")
+            return future.result()
+        cacheable = self.result_cache is not None and self.result_cache.is_cacheable(func_name)
+        # Solo funciones sin efectos: dos pedidos idénticos sí deben crearse dos veces
+        coalesce = self.single_flight is not None and func_name in SIDE_EFFECT_FREE_FUNCTIONS
+        inputs_fp = inputs_fingerprint(dep_results) if cacheable or coalesce else None
+        if cacheable:
+            hit, result = self.result_cache.get(func_name, inputs_fp)
+            if hit:
+                return result, 0.0, True
+        kwargs = self._function_kwargs(func_name, dep_results)
+        if coalesce:
+            (result, duration_ms), shared = self.single_flight.do(
+                ("step", func_name, inputs_fp), lambda: self._invoke_shareable(func_name, kwargs)
+            )
+            if shared:
+                self.log(f"🔗 {func_name} compartido con una ejecución idéntica en curso", "EXEC")
+                return result, 0.0, True
+        else:
+            result, duration_ms = self._invoke_function(func_name, kwargs)
+        if cacheable:
+            # Lo cacheado sobrevive al request: nunca debe ser un segmento compartido
+            if self.process_executor is not None:
+                result = self.process_executor.materialize(result)
+            self.result_cache.put(func_name, inputs_fp, result)
+        return result, duration_ms, False
+    
+    def invalidate_result(self, func_name: str) -> List[str]:
+        """Invalida el resultado cacheado de una función y de sus dependientes"""
+        if self.result_cache is None:
+            return []
+        affected = self.result_cache.invalidate(func_name)
+        self.log(f"♻️  Caché invalidada: {', '.join(affected)}", "CACHE")
+        return affected
+    
+    @staticmethod
+    def _function_kwargs(func_name: str, dep_results: Dict[str, Any]) -> Dict[str, Any]:
+        """Argumentos declarados en FUNCTION_INPUTS (referencias a las salidas, sin copia)"""
+        return {
+            param: dep_results[source]
+            for param, source in FUNCTION_INPUTS.get(func_name, {}).items()
+            if source in dep_results
+        }
+    
+    def _invoke_function(self, func_name: str, kwargs: Optional[Dict[str, Any]] = None):
+        """Ejecuta una función del registro y mide su duración (ms)"""
+        kwargs = kwargs or {}
+        start = time.perf_counter()
+        if self.queue_executor is not None:
+            result = self.queue_executor.run(func_name, kwargs)
+        elif self.process_executor is not None and FUNCTION_EXECUTION_MODE.get(func_name) == "process":
+            # Puede retornar un SharedResult: se materializa al terminar el request
+            result = self.process_executor.run(func_name, kwargs)
+        else:
+            if self.process_executor is not None:
+                kwargs = {param: self.process_executor.read(value) for param, value in kwargs.items()}
+            result = self.registry[func_name](**kwargs)
+        return result, (time.perf_counter() - start) * 1000
+    
+    def _invoke_shareable(self, func_name: str, kwargs: Dict[str, Any]):
+        """Como _invoke_function, pero con un resultado que otros requests pueden retener"""
+        result, duration_ms = self._invoke_function(func_name, kwargs)
+        if self.process_executor is not None:
+            # Cada request libera sus segmentos al terminar: el compartido se copia antes
+            result = self.process_executor.materialize(result)
+        return result, duration_ms
+    
+    def node_execute_parallel(self, state: AgentState) -> AgentState:
+        """1.f. Ejecuta el plan completo (camino crítico o flujo de datos)"""
+        plan = state["execution_plan"]
+        if self.dataflow is not None:
+            executor = self.dataflow
+            self.log(f"⚙️  Ejecutando {len(plan)} pasos por flujo de datos ({executor.max_workers} workers)", "EXEC")
+        else:
+            executor = self.scheduler
+            estimate = self.scheduler.simulate(plan)
+            self.log(
+                f"⚙️  Ejecutando {len(plan)} pasos con {self.max_workers} workers "
+                f"(makespan estimado: {estimate['makespan_ms']:.1f} ms)", "EXEC"
+            )
+        
+        missing = [step["name"] for step in plan if step["name"] not in self.registry]
+        for func_name in missing:
+            self.log(f"❌ Función '{func_name}' no encontrada", "ERROR")
+        runnable = [step for step in plan if step["name"] not in missing]
+        
+        cached = set()
+        adopted = {}
+        started = {}
+        def run_step(name, dep_results):
+            started[name] = time.perf_counter()
+            speculative = name in state["prefetched"]
+            result, duration_ms, from_cache = self._run_step(name, dep_results, state["prefetched"])
+            if from_cache:
+                cached.add(name)
+            elif speculative:
+                adopted[name] = duration_ms  # Costo real, no el tiempo de espera del future
+            return result
+        
+        # Con perfilado, los workers del pool cuentan como hilos de este request
+        results, durations, completed = executor.execute(
+            runnable, bind_shared_scope(bind_to_request(run_step)), deadline=state["deadline"], step_timeout_s=self.step_timeout_s,
+            pool=self._shared_pool()
+        )
+        durations.update({name: ms for name, ms in list(adopted.items()) if name in results})
+        skipped = [step["name"] for step in runnable if step["name"] not in results]
+        if skipped:
+            self.log(f"⏱️  Sin resultado a tiempo (vencidos u omitidos): {', '.join(skipped)}", "EXEC")
+        # Los que llegaron a arrancar y no terminaron cuestan al menos lo que corrieron
+        now = time.perf_counter()
+        timed_out = {name: (now - started[name]) * 1000 for name in skipped if name in started}
+        for func_name in completed:
+            self._log_step_done(func_name, durations[func_name], func_name in cached)
+        durations = {name: ms for name, ms in durations.items() if name not in cached}
+        
+        return {
+            **state,
+            "results": {**state["results"], **results},
+            "durations_ms": {**state["durations_ms"], **durations},
+            "executed_functions": state["executed_functions"] + completed,
+            "skipped": state["skipped"] + skipped,
+            "timed_out_ms": {**state["timed_out_ms"], **timed_out},
+            "current_step": len(plan),
+        }
+    
+    def _record_costs(self, state: AgentState):
+        """Retroalimenta las duraciones medidas en los nodos Function de Neo4j"""
+        # Un paso vencido entra por encima del tiempo consumido: con solo la cota
+        # inferior la EWMA converge justo bajo el presupuesto y nunca se poda
+        observed = {name: ms * TIMEOUT_COST_FACTOR for name, ms in state["timed_out_ms"].items()}
+        observed.update(state["durations_ms"])
+        self._refresh_specialized_costs(observed)
+        if self.resolver is None:
+            return
+        partition = self.catalog.loaded(state["namespace"]) if state["namespace"] is not None else None
+        if partition is not None:
+            # La instantánea también aprende: el planificador usa sus costos
+            partition["resolver"].record_executions(observed)
+        try:
+            self.resolver.record_executions(observed)
+        except Exception as e:
+            self.log(f"⚠️  No se pudieron registrar estadísticas: {e}", "WARNING")
     
     def node_generate_response(self, state: AgentState) -> AgentState:
         """1.g. Genera respuesta natural"""
@@ -144,6 +779,10 @@ class FunctionMatcherAgent:
         
         # Template de respuesta simple
         target = state["target_function"]
+        if state["skipped"] and target not in state["results"]:
+            response = self._degraded_response(state)
+            self.log("⚠️  Respuesta degradada (el objetivo no terminó a tiempo)", "RESPONSE")
+            return {**state, "final_response": response}
         if "crearPedido" in target or "comprar" in state["user_query"].lower():
             response = "✅ ¡Pedido creado exitosamente! Tu pedido #ORD-78901 ha sido confirmado y recibirás un email con los detalles."
         elif "stock" in state["user_query"].lower() or "verificarStock" in target:
@@ -154,10 +793,21 @@ class FunctionMatcherAgent:
             response = "✅ Información del cliente: Erika (ID: 12345)."
         else:
             response = f"✅ Solicitud procesada: {target}"
+        if state["skipped"]:
+            response += f" (respuesta parcial: se omitió {', '.join(state['skipped'])} por tiempo)"
         
         self.log("✅ Respuesta generada", "RESPONSE")
         return {**state, "final_response": response}
     
+    @staticmethod
+    def _degraded_response(state: AgentState) -> str:
+        """Respuesta con lo que alcanzó a completarse dentro del presupuesto"""
+        completed = [name for name in state["executed_functions"] if name in state["results"]]
+        response = f"⚠️ No fue posible completar {state['target_function']} dentro del tiempo disponible."
+        if completed:
+            response += f" Pasos completados: {', '.join(completed)}."
+        return response + " Intenta de nuevo en unos momentos."
+    
     def show_summary(self, state: AgentState):
         """Muestra resumen final"""
         print("\n" + "="*70)
@@ -174,47 +824,80 @@ class FunctionMatcherAgent:
         print(f"• Plan:")
         for i, func in enumerate(state['executed_functions'], 1):
             print(f"   {i}. {func}")
+        if state["skipped"]:
+            print(f"• Pasos omitidos: {', '.join(state['skipped'])}")
         print(f"• Tiempo total: {datetime.now() - self.start_time}")
         print("="*70)
     
-    def run(self):
-        """Construye y ejecuta el grafo LangGraph"""
+    def invoke(self, user_query: str = "", profile: bool = False, deadline_ms: Optional[float] = None,
+               namespace: Optional[str] = None) -> AgentState:
+        """Ejecuta un request completo con el workflow compilado del proceso"""
+        if namespace is not None and self.catalog is None:
+            raise ValueError("❌ Enrutar por namespace requiere partitions=True")
+        # El presupuesto corre desde la llegada del request (embedding y selección incluidos)
+        deadline_ms = deadline_ms if deadline_ms is not None else self.deadline_ms
+        deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+        app = get_compiled_workflow(parallel=self.scheduler is not None or self.dataflow is not None)
+        profiler = None
+        if profile or (self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate):
+            profiler = RequestProfiler(self.profile_dir)
+        # Con pool de procesos: los segmentos del request se liberan aunque falle a mitad
+        scope = self.process_executor.request_scope() if self.process_executor is not None else nullcontext()
+        with scope:
+            try:
+                final_state = app.invoke(
+                    {
+                        "user_query": user_query,
+                        "query_embedding": None,
+                        "target_function": None,
+                        "execution_plan": [],
+                        "executed_functions": [],
+                        "current_step": 0,
+                        "results": {},
+                        "durations_ms": {},
+                        "specialized": False,
+                        "prefetched": {},
+                        "cache_entry": None,
+                        "namespace": namespace,
+                        "deadline": deadline,
+                        "skipped": [],
+                        "timed_out_ms": {},
+                        "final_response": "",
+                        "logs": []
+                    },
+                    config={"configurable": {"agent": self, "profiler": profiler}, "recursion_limit": RECURSION_LIMIT}
+                )
+            finally:
+                # Aunque el request falle: el perfilador suelta tracemalloc
+                summary = profiler.finish() if profiler is not None else None
+            if summary is not None:
+                self.log(
+                    f"🔬 Perfil guardado en {profiler.output_dir} "
+                    f"(overhead de orquestación: {summary['orchestration_overhead_ms']:.1f} ms)", "PROFILE"
+                )
+            if self.prefetcher is not None:
+                self._discard_prefetched(final_state["prefetched"])
+            self._record_costs(final_state)
+            if self.process_executor is not None:
+                final_state["results"] = {
+                    name: self.process_executor.materialize(result) for name, result in final_state["results"].items()
+                }
+            return final_state
+    
+    def _discard_prefetched(self, prefetched: Dict[str, Any]):
+        """Descarta el trabajo especulativo que el plan final no usó"""
+        if prefetched:
+            self.log(f"🗑️  Prefetch descartado: {', '.join(prefetched)}", "EXEC")
+        release = None
+        if self.process_executor is not None:
+            release = lambda output: self.process_executor.release([output[0]])
+        self.prefetcher.discard(prefetched, release)
+    
+    def run(self, user_query: str = "", namespace: Optional[str] = None):
+        """Ejecuta el grafo LangGraph (pide el query por consola si no se entrega)"""
         try:
-            # Define el grafo
-            workflow = StateGraph(AgentState)
-            workflow.add_node("receive_input", self.node_receive_input)
-            workflow.add_node("generate_embedding", self.node_generate_embedding)
-            workflow.add_node("select_function", self.node_select_function)
-            workflow.add_node("resolve_dependencies", self.node_resolve_dependencies)
-            workflow.add_node("execute_step", self.node_execute_step)
-            workflow.add_node("generate_response", self.node_generate_response)
-            
-            # Define flujo
-            workflow.set_entry_point("receive_input")
-            workflow.add_edge("receive_input", "generate_embedding")
-            workflow.add_edge("generate_embedding", "select_function")
-            workflow.add_edge("select_function", "resolve_dependencies")
-            workflow.add_edge("resolve_dependencies", "execute_step")
-            workflow.add_conditional_edges(
-                "execute_step",
-                self.node_should_continue,
-                {"execute_step": "execute_step", END: "generate_response"}
-            )
-            workflow.add_edge("generate_response", END)
-            
-            # Ejecuta
-            app = workflow.compile()
-            final_state = app.invoke({
-                "user_query": "",
-                "query_embedding": None,
-                "target_function": None,
-                "execution_plan": [],
-                "executed_functions": [],
-                "current_step": 0,
-                "results": {},
-                "final_response": "",
-                "logs": []
-            })
+            self.start_time = datetime.now()
+            final_state = self.invoke(user_query, namespace=namespace)
             
             # Muestra resumen
             self.show_summary(final_state)
@@ -226,6 +909,7 @@ class FunctionMatcherAgent:
             print("   • Exploración de grafo Neo4j")
             print("   • Ejecución orquestada con LangGraph")
             print("   • Respuesta natural + resumen")
+            return final_state
             
         except KeyboardInterrupt:
             print("\n🛑 Ejecución cancelada")
@@ -233,9 +917,59 @@ class FunctionMatcherAgent:
             self.log(f"❌ Error: {str(e)}", "ERROR")
             import traceback
             traceback.print_exc()
-        finally:
+    
+    def close(self):
+        if self._step_pool is not None:
+            self._step_pool.shutdown(wait=False, cancel_futures=True)
+        if self.embedding_batcher is not None:
+            self.embedding_batcher.close()
+        if self.queue_executor is not None:
+            self.queue_executor.shutdown()
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+        if self.process_executor is not None:
+            self.process_executor.shutdown()
+        if self.plan_artifact is not None:
+            self.plan_artifact.close()
+        if self.resolver is not None:
             self.resolver.close()
 
 if __name__ == "__main__":
-    agent = FunctionMatcherAgent()
-    agent.run()
\ No newline at end of file
+    specialize_after = os.getenv("AGENT_SPECIALIZE_AFTER")
+    # Trazas: AGENT_RECORD_TRACE graba las ejecuciones, AGENT_REPLAY_TRACE las reproduce
+    registry = None
+    if os.getenv("AGENT_REPLAY_TRACE"):
+        registry = ReplayRegistry(os.environ["AGENT_REPLAY_TRACE"], timing=os.getenv("AGENT_REPLAY_TIMING", "sequence"))
+    elif os.getenv("AGENT_RECORD_TRACE"):
+        registry = RecordingRegistry(FUNCTION_REGISTRY, os.environ["AGENT_RECORD_TRACE"])
+    agent = FunctionMatcherAgent(
+        max_workers=int(os.getenv("AGENT_MAX_WORKERS", "1")),
+        specialize_after=int(specialize_after) if specialize_after else None,
+        plan_artifact=os.getenv("AGENT_PLAN_ARTIFACT") or None,
+        process_workers=int(os.getenv("AGENT_PROCESS_WORKERS", "0")),
+        result_cache_size=int(os.getenv("AGENT_RESULT_CACHE_SIZE", "0")),
+        profile_sample_rate=float(os.getenv("AGENT_PROFILE_SAMPLE_RATE", "0")),
+        profile_dir=os.getenv("AGENT_PROFILE_DIR", "profiles"),
+        speculative_top_k=int(os.getenv("AGENT_SPECULATIVE_TOP_K", "0")),
+        query_cache_size=int(os.getenv("AGENT_QUERY_CACHE_SIZE", "0")),
+        query_cache_threshold=float(os.getenv("AGENT_QUERY_CACHE_THRESHOLD", "0.92")),
+        job_queue=os.getenv("AGENT_JOB_QUEUE") or None,
+        dataflow=os.getenv("AGENT_DATAFLOW", "0") == "1",
+        deadline_ms=float(os.getenv("AGENT_DEADLINE_MS", "0")) or None,
+        step_timeout_ms=float(os.getenv("AGENT_STEP_TIMEOUT_MS", "0")) or None,
+        single_flight=os.getenv("AGENT_SINGLE_FLIGHT", "0") == "1",
+        embedding_batch_window_ms=float(os.environ["AGENT_EMBEDDING_BATCH_WINDOW_MS"])
+        if os.getenv("AGENT_EMBEDDING_BATCH_WINDOW_MS") else None,
+        embedding_batch_size=int(os.getenv("AGENT_EMBEDDING_BATCH_SIZE", "32")),
+        partitions=os.getenv("AGENT_PARTITIONS", "0") == "1",
+        partition_max=int(os.getenv("AGENT_PARTITION_MAX", "8")),
+        partition_max_mb=float(os.getenv("AGENT_PARTITION_MAX_MB", "0")),
+        registry=registry,
+        step_pool_size=int(os.getenv("AGENT_STEP_POOL_SIZE", "32"))
+    )
+    try:
+        agent.run(namespace=os.getenv("AGENT_NAMESPACE") or None)
+    finally:
+        agent.close()
+        if isinstance(registry, RecordingRegistry):
+            print(f"🎞️  Traza guardada en {registry.save()} ({registry.calls()} llamadas)")
\ No newline at end of file
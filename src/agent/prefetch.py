@@ -0,0 +1,104 @@
+"""
+Prefetch especulativo de dependencias hoja
+Con los top-k candidatos de la selección semántica se lanzan, antes de resolver
+el plan, las dependencias hoja que comparten todos ellos (solo funciones sin
+efectos secundarios). El plan final adopta los resultados que usa; el resto se descarta.
+Las hojas se aprenden por (namespace, objetivo): cada partición tiene su propio plan.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.agent.functions import SIDE_EFFECT_FREE_FUNCTIONS
+
+
+class SpeculativePrefetcher:
+    """Aprende las hojas de cada objetivo y ejecuta por adelantado las compartidas"""
+
+    def __init__(self, top_k: int = 3, max_workers: int = 2, plan_source=None,
+                 side_effect_free: Iterable[str] = SIDE_EFFECT_FREE_FUNCTIONS):
+        self.top_k = top_k
+        # Fuente local de planes (artefacto mmap): se consulta sin costo de red
+        self.plan_source = plan_source
+        self.side_effect_free = set(side_effect_free)
+        self._leaves: Dict[Tuple[Optional[str], str], List[str]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.launched = 0
+        self.adopted = 0
+        self.discarded = 0
+
+    def observe_plan(self, target: str, plan: List[Dict], namespace: Optional[str] = None):
+        """Registra las hojas sin efectos secundarios del plan de un objetivo"""
+        leaves = sorted(
+            step["name"] for step in plan
+            if not step.get("requires") and step["name"] in self.side_effect_free
+        )
+        with self._lock:
+            self._leaves[(namespace, target)] = leaves
+
+    def _known_leaves(self, target: str, namespace: Optional[str] = None) -> Optional[List[str]]:
+        with self._lock:
+            if (namespace, target) in self._leaves:
+                return self._leaves[(namespace, target)]
+        # El artefacto describe el catálogo global: no sirve para una partición
+        if self.plan_source is None or namespace is not None:
+            return None
+        try:
+            self.observe_plan(target, self.plan_source.get_execution_plan(target))
+        except ValueError:
+            return None
+        return self._leaves[(None, target)]
+
+    def shared_leaves(self, candidates: List[str], namespace: Optional[str] = None) -> List[str]:
+        """Intersección de las hojas conocidas de los candidatos"""
+        shared = None
+        for target in candidates:
+            leaves = self._known_leaves(target, namespace)
+            if leaves is None:
+                continue  # Objetivo aún no resuelto: no restringe la intersección
+            shared = set(leaves) if shared is None else shared & set(leaves)
+        return sorted(shared or [])
+
+    def launch(self, candidates: List[str], run: Callable[[str], Any],
+               namespace: Optional[str] = None) -> Dict[str, Future]:
+        """Lanza `run(nombre)` para cada hoja compartida; retorna los futures por nombre"""
+        prefetched = {name: self._executor.submit(run, name) for name in self.shared_leaves(candidates, namespace)}
+        with self._lock:
+            self.launched += len(prefetched)
+        return prefetched
+
+    def adopt(self, prefetched: Dict[str, Future], name: str) -> Optional[Future]:
+        """Retira el future de una función que el plan final sí usa"""
+        future = prefetched.pop(name, None) if prefetched else None
+        if future is not None:
+            with self._lock:
+                self.adopted += 1
+        return future
+
+    def discard(self, prefetched: Dict[str, Future], on_result: Optional[Callable[[Any], None]] = None):
+        """Descarta los futures no adoptados (on_result libera recursos al terminar)"""
+        if not prefetched:
+            return
+        for future in prefetched.values():
+            future.cancel()
+            if on_result is not None:
+                future.add_done_callback(
+                    lambda f: on_result(f.result()) if not f.cancelled() and f.exception() is None else None
+                )
+        with self._lock:
+            self.discarded += len(prefetched)
+        prefetched.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "launched": self.launched,
+                "adopted": self.adopted,
+                "discarded": self.discarded,
+                "adoption_rate": self.adopted / self.launched if self.launched else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
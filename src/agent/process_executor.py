@@ -0,0 +1,253 @@
+"""
+Ejecución en pool de procesos para funciones intensivas en CPU
+Los workers se pre-crean con FUNCTION_REGISTRY ya importado y los resultados
+grandes viajan por memoria compartida en lugar de serializarse por el pipe.
+"""
+
+import contextvars
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.agent.result_cache import fingerprint
+
+# Resultados cuyo pickle + buffers superen este tamaño (bytes) van a memoria compartida
+SHARED_MEMORY_THRESHOLD = int(os.getenv("AGENT_SHM_THRESHOLD", str(64 * 1024)))
+
+# Segmentos creados por el request en curso (ver ProcessStepExecutor.request_scope)
+_REQUEST_SEGMENTS = contextvars.ContextVar("shared_segments", default=None)
+
+
+class SharedResult:
+    """
+    Referencia a un resultado guardado en un segmento de memoria compartida
+
+    Es lo único que cruza el pipe entre procesos: nombre del segmento y spans.
+    Los buffers fuera de banda (pickle protocolo 5, p. ej. arrays numpy) se
+    reconstruyen sin copia sobre el segmento en los workers que lo consumen.
+    El coordinador es el dueño del segmento: lo materializa o lo libera.
+    content_fingerprint es la huella del valor (no del segmento): la misma que
+    tendría el resultado sin compartir, para caché y single-flight.
+    """
+
+    def __init__(self, shm_name: str, meta_span: Tuple[int, int], buffer_spans: List[Tuple[int, int]],
+                 content_fingerprint: str):
+        self.shm_name = shm_name
+        self.meta_span = meta_span
+        self.buffer_spans = buffer_spans
+        self.content_fingerprint = content_fingerprint
+
+    def attach(self):
+        """Abre el segmento en un worker sin registrarlo en el resource tracker"""
+        shm = shared_memory.SharedMemory(name=self.shm_name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    def load_from(self, shm) -> Any:
+        """Reconstruye el valor sobre un segmento abierto (zero-copy)"""
+        view = shm.buf
+        start, end = self.meta_span
+        return pickle.loads(view[start:end], buffers=[view[a:b] for a, b in self.buffer_spans])
+
+    def materialize(self) -> Any:
+        """En el coordinador: copia el valor a memoria propia y libera el segmento"""
+        shm = shared_memory.SharedMemory(name=self.shm_name)
+        start, end = self.meta_span
+        meta = bytes(shm.buf[start:end])
+        buffers = [bytearray(shm.buf[a:b]) for a, b in self.buffer_spans]
+        shm.close()
+        shm.unlink()
+        return pickle.loads(meta, buffers=buffers)
+
+    def read(self) -> Any:
+        """Copia del valor sin liberar el segmento (el coordinador sigue siendo dueño)"""
+        shm = self.attach()
+        try:
+            start, end = self.meta_span
+            buffers = [bytearray(shm.buf[a:b]) for a, b in self.buffer_spans]
+            return pickle.loads(bytes(shm.buf[start:end]), buffers=buffers)
+        finally:
+            shm.close()
+
+    def release(self):
+        """Libera el segmento sin leerlo"""
+        try:
+            shm = shared_memory.SharedMemory(name=self.shm_name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def _pack_result(result: Any, threshold: int) -> Any:
+    """En el worker: deja el resultado en memoria compartida si es grande"""
+    buffers: List[pickle.PickleBuffer] = []
+    meta = pickle.dumps(result, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    total = len(meta) + sum(raw.nbytes for raw in raws)
+    if total < threshold:
+        return result
+
+    shm = shared_memory.SharedMemory(create=True, size=total)
+    # El coordinador es quien hace unlink: el worker no debe rastrear el segmento
+    resource_tracker.unregister(shm._name, "shared_memory")
+    pos = 0
+    spans = []
+    for chunk in [memoryview(meta)] + raws:
+        shm.buf[pos:pos + chunk.nbytes] = chunk.cast("B")
+        spans.append((pos, pos + chunk.nbytes))
+        pos += chunk.nbytes
+    shm.close()
+    # Huella calculada aquí, con el valor vivo: el coordinador no necesita leer el segmento
+    return SharedResult(shm.name, spans[0], spans[1:], fingerprint(result))
+
+
+class _SegmentScope:
+    """Segmentos de un request; los que llegan tras cerrarlo (pasos vencidos) se liberan al llegar"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segments: List[SharedResult] = []
+        self._closed = False
+
+    def add(self, result: SharedResult):
+        with self._lock:
+            if not self._closed:
+                self._segments.append(result)
+                return
+        result.release()
+
+    def close(self) -> List[SharedResult]:
+        with self._lock:
+            self._closed = True
+            segments, self._segments = self._segments, []
+        return segments
+
+
+def bind_shared_scope(fn: Callable) -> Callable:
+    """
+    Envuelve fn para que los segmentos que cree en otro hilo (p. ej. un worker
+    del pool de pasos) queden en el ámbito del request actual; sin ámbito, fn tal cual
+    """
+    scope = _REQUEST_SEGMENTS.get()
+    if scope is None:
+        return fn
+    def bound(*args, **kwargs):
+        token = _REQUEST_SEGMENTS.set(scope)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _REQUEST_SEGMENTS.reset(token)
+    return bound
+
+
+def _init_worker():
+    """Inicializador: importa el registro una vez por proceso"""
+    global FUNCTION_REGISTRY
+    from src.agent.functions import FUNCTION_REGISTRY
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_in_worker(func_name: str, inputs: Optional[Dict[str, Any]], threshold: int) -> Any:
+    """Ejecuta la función en el worker; las entradas compartidas se leen sin copiar"""
+    kwargs = {}
+    segments = []
+    value = None
+    for key, value in (inputs or {}).items():
+        if isinstance(value, SharedResult):
+            shm = value.attach()
+            segments.append(shm)
+            value = value.load_from(shm)
+        kwargs[key] = value
+    result = FUNCTION_REGISTRY[func_name](**kwargs)
+    packed = _pack_result(result, threshold)
+    # Suelta las vistas antes de cerrar los segmentos de entrada
+    del kwargs, result, value
+    for shm in segments:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # El resultado aún referencia la entrada; se desmapea al recolectarlo
+    return packed
+
+
+class ProcessStepExecutor:
+    """Pool de procesos pre-creado para las funciones marcadas como "process" """
+
+    def __init__(self, max_workers: Optional[int] = None, shm_threshold: int = SHARED_MEMORY_THRESHOLD,
+                 start_method: Optional[str] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shm_threshold = shm_threshold
+        # forkserver evita heredar los hilos del driver Neo4j / LangGraph al hacer fork
+        methods = multiprocessing.get_all_start_methods()
+        start_method = start_method or os.getenv(
+            "AGENT_PROCESS_START_METHOD", "forkserver" if "forkserver" in methods else "spawn"
+        )
+        context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # El servidor precarga solo el registro, no __main__: importar el script
+            # del agente arrastraría el modelo de embeddings a cada worker
+            context.set_forkserver_preload(["src.agent.functions"])
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker
+        )
+        self._prefork()
+
+    def _prefork(self):
+        """Arranca todos los workers ahora para no pagar el costo en el primer request"""
+        futures = [self.pool.submit(_ping) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+        print(f"✅ Pool de procesos listo ({self.max_workers} workers)")
+
+    def run(self, func_name: str, inputs: Optional[Dict[str, Any]] = None) -> Any:
+        """Ejecuta la función en un worker y retorna el resultado o un SharedResult"""
+        result = self.pool.submit(_run_in_worker, func_name, inputs, self.shm_threshold).result()
+        scope = _REQUEST_SEGMENTS.get()
+        if scope is not None and isinstance(result, SharedResult):
+            scope.add(result)
+        return result
+
+    @contextmanager
+    def request_scope(self):
+        """
+        Ámbito de un request: al salir, también si el request lanzó una excepción,
+        libera los segmentos que creó y nadie materializó (liberar uno ya
+        materializado no hace nada)
+        """
+        scope = _SegmentScope()
+        token = _REQUEST_SEGMENTS.set(scope)
+        try:
+            yield
+        finally:
+            _REQUEST_SEGMENTS.reset(token)
+            self.release(scope.close())
+
+    @staticmethod
+    def materialize(value: Any) -> Any:
+        return value.materialize() if isinstance(value, SharedResult) else value
+
+    @staticmethod
+    def read(value: Any) -> Any:
+        """Entrada para una función que corre en el hilo del coordinador"""
+        return value.read() if isinstance(value, SharedResult) else value
+
+    @staticmethod
+    def release(values) -> None:
+        """Libera los segmentos compartidos de un request terminado"""
+        for value in values:
+            if isinstance(value, SharedResult):
+                value.release()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,214 @@
+"""
+Perfilado opcional por request
+Por cada etapa del pipeline guarda: perfil cProfile (.prof), pilas colapsadas de
+un muestreador (.collapsed, entrada de flamegraph.pl / speedscope) y el diff de
+memoria de tracemalloc (.mem.txt). Sin perfilador activo no se ejecuta nada de esto.
+"""
+
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+# Perfilador del request que se ejecuta en el contexto actual (lo fija stage())
+_CURRENT_PROFILER = contextvars.ContextVar("request_profiler", default=None)
+
+# tracemalloc es global al proceso: lo arranca el primer perfilador activo y lo
+# detiene el último, nunca uno que termina mientras otros siguen midiendo
+_TRACEMALLOC_LOCK = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _TRACEMALLOC_LOCK:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _TRACEMALLOC_LOCK:
+        _tracemalloc_users -= 1
+        # Si lo arrancó otro (p. ej. PYTHONTRACEMALLOC) no se detiene
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def current_profiler() -> Optional["RequestProfiler"]:
+    return _CURRENT_PROFILER.get()
+
+
+def bind_to_request(fn: Callable) -> Callable:
+    """
+    Envuelve fn para que el hilo que la ejecute (p. ej. un worker del pool de
+    pasos) cuente como hilo del request perfilado actual; sin perfilador, fn tal cual
+    """
+    profiler = _CURRENT_PROFILER.get()
+    if profiler is None:
+        return fn
+    def bound(*args, **kwargs):
+        with profiler.thread():
+            return fn(*args, **kwargs)
+    return bound
+
+
+class StackSampler:
+    """Muestreador de pilas en un hilo aparte (hilos dados o todos los del proceso)"""
+
+    def __init__(self, interval_ms: float = 1.0, threads: Optional[Callable[[], Set[int]]] = None):
+        self.interval = interval_ms / 1000
+        # threads() = idents a muestrear; con requests concurrentes evita mezclar pilas ajenas
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _collapse(frame, thread_name: str) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        return ";".join(reversed(parts))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            wanted = self.threads() if self.threads is not None else None
+            for ident, frame in sys._current_frames().items():
+                if ident != own and (wanted is None or ident in wanted):
+                    self.stacks[self._collapse(frame, names.get(ident, str(ident)))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """
+    Perfilador de un único request
+
+    Se crea solo cuando el request se perfila (flag o muestreo); las etapas se
+    envuelven con `stage(nombre)` y `finish()` escribe el resumen.
+    """
+
+    def __init__(self, output_dir: str = "profiles", interval_ms: float = 1.0, trace_memory: bool = True):
+        self.request_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.output_dir = os.path.join(output_dir, self.request_id)
+        self.interval_ms = interval_ms
+        self.trace_memory = trace_memory
+        self.stages: List[Dict] = []
+        self._counter = 0
+        self._lock = threading.Lock()
+        # Hilos que trabajan para este request (ident → anidamiento)
+        self._threads: Counter = Counter()
+        self._finished = False
+        self._bookkeeping_ms = 0.0
+        self._start = time.perf_counter()
+        os.makedirs(self.output_dir, exist_ok=True)
+        if trace_memory:
+            _acquire_tracemalloc()
+
+    @contextmanager
+    def thread(self):
+        """Atribuye el hilo actual a este request mientras dura el bloque"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+        token = _CURRENT_PROFILER.set(self)
+        try:
+            yield
+        finally:
+            _CURRENT_PROFILER.reset(token)
+            with self._lock:
+                self._threads[ident] -= 1
+                if self._threads[ident] <= 0:
+                    del self._threads[ident]
+
+    def active_threads(self) -> Set[int]:
+        with self._lock:
+            return set(self._threads)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Perfila una etapa: cProfile + muestreo de pilas + diff de memoria"""
+        setup_start = time.perf_counter()
+        with self._lock:
+            self._counter += 1
+            prefix = os.path.join(self.output_dir, f"{self._counter:03d}_{name}")
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            profile = None  # Otro perfilador activo en este hilo (request concurrente)
+        sampler = StackSampler(self.interval_ms, threads=self.active_threads)
+        sampler.start()
+        before = tracemalloc.take_snapshot() if self.trace_memory else None
+        start = time.perf_counter()
+        try:
+            with self.thread():
+                yield
+        finally:
+            end = time.perf_counter()
+            elapsed_ms = (end - start) * 1000
+            sampler.stop()
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(f"{prefix}.prof")
+            sampler.write_collapsed(f"{prefix}.collapsed")
+            if before is not None:
+                after = tracemalloc.take_snapshot()
+                with open(f"{prefix}.mem.txt", "w", encoding="utf-8") as f:
+                    for stat in after.compare_to(before, "lineno")[:25]:
+                        f.write(f"{stat}\n")
+            with self._lock:
+                self.stages.append({"stage": name, "file_prefix": os.path.basename(prefix), "wall_ms": elapsed_ms})
+                # El costo del propio perfilador no debe contarse como overhead del pipeline
+                self._bookkeeping_ms += ((start - setup_start) + (time.perf_counter() - end)) * 1000
+
+    def finish(self) -> Dict:
+        """Cierra el request: resumen con tiempos por etapa y overhead fuera de ellas"""
+        if self.trace_memory and not self._finished:
+            _release_tracemalloc()
+        self._finished = True
+        total_ms = (time.perf_counter() - self._start) * 1000
+        staged_ms = sum(stage["wall_ms"] for stage in self.stages)
+        summary = {
+            "request_id": self.request_id,
+            "total_ms": total_ms,
+            "stages": self.stages,
+            "profiler_ms": self._bookkeeping_ms,
+            # Tiempo no atribuido a ninguna etapa: orquestación de LangGraph y pegamento
+            "orchestration_overhead_ms": max(0.0, total_ms - staged_ms - self._bookkeeping_ms),
+        }
+        with open(os.path.join(self.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
@@ -0,0 +1,139 @@
+"""
+Caché semántica de queries
+Guarda los embeddings de queries recientes junto con el objetivo seleccionado y
+su plan. Un query idéntico (normalizado) no pasa por el modelo; una paráfrasis
+dentro del umbral coseno reutiliza la selección y el plan. Desalojo LRU.
+Las entradas son por namespace: un query de una partición nunca reutiliza la
+selección ni el plan de otra (ni del catálogo global, namespace None).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticQueryCache:
+    """Caché LRU de (query → objetivo, plan) con búsqueda por similitud coseno"""
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.92):
+        if not 0 < threshold <= 1:
+            raise ValueError("❌ El umbral coseno debe estar en (0, 1]")
+        self.max_entries = max_entries
+        self.threshold = threshold
+        # Clave: (namespace, query normalizado)
+        self._entries: "OrderedDict[Tuple[Hashable, str], Dict[str, Any]]" = OrderedDict()
+        # Matriz preasignada de embeddings normalizados: una fila por entrada
+        self._matrix: Optional[np.ndarray] = None
+        self._free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+        self._slot_keys: List[Optional[Tuple[Hashable, str]]] = [None] * max_entries
+        # Namespace de cada fila (como entero): la búsqueda coseno solo mira el propio
+        self._namespace_ids: Dict[Hashable, int] = {}
+        self._slot_namespaces = np.full(max(max_entries, 0), -1, dtype=np.int32)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_text(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def lookup_text(self, query: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Acierto exacto: no requiere calcular el embedding"""
+        key = (namespace, self.normalize_text(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry
+
+    def lookup_embedding(self, embedding: np.ndarray,
+                         namespace: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Entrada más similar del namespace si supera el umbral (embedding ya normalizado)"""
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if not self._entries or namespace_id is None:
+                self.misses += 1
+                return None, 0.0
+            # Las filas libres (namespace -1) y las de otros namespaces nunca aciertan
+            scores = self._matrix @ embedding.astype(np.float32, copy=False)
+            scores = np.where(self._slot_namespaces == namespace_id, scores, -np.inf)
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                # -inf: el namespace ya no tiene entradas (desalojadas)
+                return None, similarity if np.isfinite(similarity) else 0.0
+            key = self._slot_keys[slot]
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return self._entries[key], similarity
+
+    def put(self, query: str, embedding: np.ndarray, target: str, confidence: float,
+            plan: Optional[List[Dict]] = None, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Registra la selección de un query (el plan puede llegar después)"""
+        if self.max_entries <= 0:
+            return {}
+        key = (namespace, self.normalize_text(query))
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if not self._free_slots:
+                    self._evict_lru()
+                if self._matrix is None:
+                    self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                entry = {"slot": self._free_slots.pop()}
+                self._entries[key] = entry
+                self._slot_keys[entry["slot"]] = key
+                self._slot_namespaces[entry["slot"]] = self._namespace_ids.setdefault(
+                    namespace, len(self._namespace_ids)
+                )
+            self._entries.move_to_end(key)
+            self._matrix[entry["slot"]] = vector
+            entry.update({"query": key[1], "namespace": namespace, "embedding": embedding, "target": target,
+                          "confidence": confidence, "plan": plan})
+            return entry
+
+    def store_plan(self, query: str, plan: List[Dict], namespace: Optional[str] = None):
+        """Adjunta el plan resuelto a la entrada del query"""
+        with self._lock:
+            entry = self._entries.get((namespace, self.normalize_text(query)))
+            if entry is not None:
+                entry["plan"] = plan
+
+    def _evict_lru(self):
+        _, entry = self._entries.popitem(last=False)
+        self._matrix[entry["slot"]] = 0.0
+        self._slot_keys[entry["slot"]] = None
+        self._slot_namespaces[entry["slot"]] = -1
+        self._free_slots.append(entry["slot"])
+        self.evictions += 1
+
+    def clear(self):
+        """Vacía la caché (p. ej. tras cambiar el grafo o las descripciones)"""
+        with self._lock:
+            self._entries.clear()
+            if self._matrix is not None:
+                self._matrix[:] = 0.0
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+            self._slot_keys = [None] * self.max_entries
+            self._slot_namespaces[:] = -1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
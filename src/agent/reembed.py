@@ -0,0 +1,198 @@
+"""
+Re-embedding masivo del catálogo de funciones
+Lee las descripciones de Neo4j por páginas, las codifica en lotes grandes en
+varios procesos locales y escribe los vectores en transacciones por lote.
+Guarda un checkpoint tras cada página para poder reanudar; al terminar lo
+marca como completo y la siguiente corrida vuelve a recorrer todo.
+
+Uso:
+    python -m src.agent.reembed --workers 4 --page-size 5000 --batch-size 256
+    python -m src.agent.reembed --model all-mpnet-base-v2 --reset
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.agent.init_graph import FunctionGraphInitializer, NEO4J_PASSWORD, NEO4J_URI, NEO4J_USER
+from src.agent.plan_compiler import EMBEDDING_MODEL
+
+_worker_model = None
+
+
+def _init_encoder(model_name: str, threads: int):
+    """Carga el modelo una sola vez por worker"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)  # Sin sobre-suscripción entre workers
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_chunk(texts: List[str], batch_size: int) -> np.ndarray:
+    return _worker_model.encode(
+        texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+    ).astype(np.float32, copy=False)
+
+
+def load_checkpoint(path: str, model_name: str) -> Dict:
+    """Checkpoint previo e incompleto del mismo modelo, o uno vacío"""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("complete"):
+            print("♻️  La corrida anterior terminó: se empieza desde cero")
+        elif checkpoint.get("model") == model_name:
+            return checkpoint
+        else:
+            print(f"⚠️  Checkpoint de otro modelo ({checkpoint.get('model')}): se empieza desde cero")
+    return {"model": model_name, "after": "", "processed": 0}
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class BulkReembedder:
+    """Pipeline lectura por páginas → codificación multiproceso → escritura por lotes"""
+
+    def __init__(self, initializer: FunctionGraphInitializer, model_name: str = EMBEDDING_MODEL,
+                 workers: Optional[int] = None, page_size: int = 5000, batch_size: int = 256,
+                 write_batch: int = 1000, checkpoint_path: str = "reembed.checkpoint.json"):
+        self.initializer = initializer
+        self.model_name = model_name
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.write_batch = write_batch
+        self.checkpoint_path = checkpoint_path
+        self.timings = {"read_s": 0.0, "encode_wait_s": 0.0, "write_s": 0.0}
+
+    def _submit_page(self, pool: ProcessPoolExecutor, page: List[Dict]):
+        texts = [row["description"] for row in page]
+        # Un trozo por lote: se reparte entre todos los workers
+        return [
+            pool.submit(_encode_chunk, texts[i:i + self.batch_size], self.batch_size)
+            for i in range(0, len(texts), self.batch_size)
+        ]
+
+    def _write_page(self, page: List[Dict], futures, checkpoint: Dict):
+        start = time.perf_counter()
+        vectors = np.concatenate([future.result() for future in futures])
+        self.timings["encode_wait_s"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(0, len(page), self.write_batch):
+            self.initializer.update_embeddings([
+                {"name": row["name"], "embedding": vector.tolist()}
+                for row, vector in zip(page[i:i + self.write_batch], vectors[i:i + self.write_batch])
+            ])
+        self.timings["write_s"] += time.perf_counter() - start
+
+        # Solo después de escribir la página completa avanza el cursor
+        checkpoint["after"] = page[-1]["name"]
+        checkpoint["processed"] += len(page)
+        save_checkpoint(self.checkpoint_path, checkpoint)
+        print(f"   • {checkpoint['processed']} funciones (hasta '{checkpoint['after']}')")
+
+    def run(self, reset: bool = False) -> Dict:
+        """Re-codifica todo el catálogo (o lo que falta según el checkpoint)"""
+        checkpoint = {"model": self.model_name, "after": "", "processed": 0} if reset \
+            else load_checkpoint(self.checkpoint_path, self.model_name)
+        resumed_from = checkpoint["processed"]
+        if resumed_from:
+            print(f"♻️  Reanudando después de '{checkpoint['after']}' ({resumed_from} ya procesadas)")
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            os.getenv("AGENT_PROCESS_START_METHOD", "forkserver" if "forkserver" in methods else "spawn")
+        )
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        print(f"🧠 {self.workers} workers × {threads} hilos con {self.model_name}")
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_init_encoder, initargs=(self.model_name, threads)) as pool:
+            pending = None
+            pages = self.initializer.iter_descriptions(self.page_size, after=checkpoint["after"])
+            while True:
+                read_start = time.perf_counter()
+                page = next(pages, None)
+                self.timings["read_s"] += time.perf_counter() - read_start
+                if page is None:
+                    break
+                futures = self._submit_page(pool, page)
+                # La página anterior se escribe mientras los workers codifican esta
+                if pending is not None:
+                    self._write_page(*pending, checkpoint)
+                pending = (page, futures)
+            if pending is not None:
+                self._write_page(*pending, checkpoint)
+        elapsed = time.perf_counter() - start
+        # Solo una corrida sin errores llega aquí: reanudar ya no tiene sentido
+        checkpoint["complete"] = True
+        save_checkpoint(self.checkpoint_path, checkpoint)
+
+        processed = checkpoint["processed"] - resumed_from
+        return {
+            "model": self.model_name,
+            "processed": processed,
+            "total_processed": checkpoint["processed"],
+            "elapsed_s": elapsed,
+            "functions_per_s": processed / elapsed if elapsed else 0.0,
+            **self.timings,
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Re-embedding masivo del catálogo de funciones")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de codificación")
+    parser.add_argument("--page-size", type=int, default=5000, help="Funciones leídas por página")
+    parser.add_argument("--batch-size", type=int, default=256, help="Descripciones por lote de codificación")
+    parser.add_argument("--write-batch", type=int, default=1000, help="Filas por transacción de escritura")
+    parser.add_argument("--checkpoint", default="reembed.checkpoint.json")
+    parser.add_argument("--reset", action="store_true", help="Ignora el checkpoint y recorre todo")
+    parser.add_argument("--report", help="Guarda el reporte de throughput en JSON")
+    args = parser.parse_args(argv)
+
+    initializer = FunctionGraphInitializer(
+        os.getenv("NEO4J_URI", NEO4J_URI),
+        os.getenv("NEO4J_USER", NEO4J_USER),
+        os.getenv("NEO4J_PASSWORD", NEO4J_PASSWORD)
+    )
+    try:
+        report = BulkReembedder(
+            initializer, args.model, args.workers, args.page_size,
+            args.batch_size, args.write_batch, args.checkpoint
+        ).run(reset=args.reset)
+    finally:
+        initializer.close()
+
+    print("\n📊 Throughput")
+    print(f"   • Funciones: {report['processed']} en {report['elapsed_s']:.1f} s "
+          f"({report['functions_per_s']:.1f} funciones/s)")
+    print(f"   • Lectura: {report['read_s']:.1f} s | Espera de codificación: {report['encode_wait_s']:.1f} s "
+          f"| Escritura: {report['write_s']:.1f} s")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print("✅ Re-embedding completado (recompila el artefacto de planes si lo usas)")
+
+
+if __name__ == "__main__":
+    main()
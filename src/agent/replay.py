@@ -0,0 +1,196 @@
+"""
+Grabación y reproducción de ejecuciones de FUNCTION_REGISTRY
+En modo grabación cada llamada guarda su salida y su duración medida en una
+traza compacta (JSON + gzip, salidas deduplicadas). En modo reproducción un
+registro sustituto devuelve las salidas grabadas y simula las duraciones, sin
+efectos secundarios: planificador, cachés y concurrencia se comparan offline
+contra la misma carga.
+
+Uso:
+    AGENT_RECORD_TRACE=trace.json.gz python -m src.agent.planner_agent
+    python -m src.agent.load_test --levels 4,8 --replay trace.json.gz
+    python -m src.agent.replay summary trace.json.gz
+
+La traza solo cubre funciones ejecutadas en el proceso del agente (sin
+AGENT_PROCESS_WORKERS ni AGENT_JOB_QUEUE: esos workers usan el registro real).
+"""
+
+import argparse
+import copy
+import gzip
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.agent.result_cache import fingerprint
+
+TRACE_VERSION = 1
+
+
+def load_trace(path: str) -> Dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        trace = json.load(f)
+    if trace.get("version") != TRACE_VERSION:
+        raise ValueError(f"❌ Versión de traza no soportada: {trace.get('version')}")
+    return trace
+
+
+class RecordingRegistry(dict):
+    """Registro que envuelve las funciones reales y graba cada llamada"""
+
+    def __init__(self, registry: Dict[str, Callable], path: str):
+        super().__init__({name: self._wrap(name, fn) for name, fn in registry.items()})
+        self.path = path
+        # Salidas distintas una sola vez; cada llamada guarda [huella de entradas, salida, ms]
+        self._outputs: List[Any] = []
+        self._output_ids: Dict[str, int] = {}
+        self._calls: Dict[str, List[List]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _wrap(self, name: str, fn: Callable) -> Callable:
+        def recorded(**kwargs):
+            start = time.perf_counter()
+            result = fn(**kwargs)
+            self._record(name, kwargs, result, (time.perf_counter() - start) * 1000)
+            return result
+        return recorded
+
+    def _record(self, name: str, kwargs: Dict[str, Any], result: Any, duration_ms: float):
+        inputs_fp = fingerprint(kwargs)[:16]
+        output_fp = fingerprint(result)
+        with self._lock:
+            output_id = self._output_ids.get(output_fp)
+            if output_id is None:
+                output_id = len(self._outputs)
+                self._outputs.append(copy.deepcopy(result))
+                self._output_ids[output_fp] = output_id
+            self._calls[name].append([inputs_fp, output_id, round(duration_ms, 3)])
+
+    def calls(self) -> int:
+        with self._lock:
+            return sum(len(calls) for calls in self._calls.values())
+
+    def save(self) -> str:
+        """Escribe la traza (se puede llamar varias veces: reescribe con todo lo grabado)"""
+        with self._lock:
+            trace = {
+                "version": TRACE_VERSION,
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "outputs": self._outputs,
+                "calls": dict(self._calls),
+            }
+            with gzip.open(self.path, "wt", encoding="utf-8") as f:
+                json.dump(trace, f, ensure_ascii=False, separators=(",", ":"))
+        return self.path
+
+
+class ReplayRegistry(dict):
+    """
+    Registro sustituto que reproduce una traza grabada
+
+    timing:
+        "sequence": duraciones en el orden grabado para cada (función, entradas)
+        "sample":   duraciones muestreadas de la distribución grabada (semilla fija)
+        "none":     sin espera (solo salidas)
+    """
+
+    TIMINGS = ("sequence", "sample", "none")
+
+    def __init__(self, path: str, timing: str = "sequence", speed: float = 1.0, seed: int = 0):
+        if timing not in self.TIMINGS:
+            raise ValueError(f"❌ timing debe ser uno de {', '.join(self.TIMINGS)}")
+        if speed <= 0:
+            raise ValueError("❌ speed debe ser > 0")
+        trace = load_trace(path)
+        self.path = path
+        self.timing = timing
+        self.speed = speed
+        self._outputs = trace["outputs"]
+        self._by_key: Dict[tuple, List[List]] = defaultdict(list)
+        self._durations: Dict[str, np.ndarray] = {}
+        for name, calls in trace["calls"].items():
+            for call in calls:
+                self._by_key[(name, call[0])].append(call)
+            self._durations[name] = np.asarray([call[2] for call in calls], dtype=np.float64)
+        self._all_calls = {name: calls for name, calls in trace["calls"].items()}
+        self._cursors: Dict[tuple, int] = defaultdict(int)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.unmatched = 0
+        super().__init__({name: self._replayer(name) for name in trace["calls"]})
+
+    def _replayer(self, name: str) -> Callable:
+        def replayed(**kwargs):
+            output, duration_ms = self._next(name, fingerprint(kwargs)[:16])
+            if duration_ms > 0:
+                time.sleep(duration_ms / 1000 / self.speed)
+            # Copia: como la función real, cada llamada entrega un objeto nuevo
+            return copy.deepcopy(output)
+        return replayed
+
+    def _next(self, name: str, inputs_fp: str):
+        with self._lock:
+            calls = self._by_key.get((name, inputs_fp))
+            key = (name, inputs_fp)
+            if not calls:
+                # Entradas nunca grabadas: cualquier llamada de la función, en orden
+                calls, key = self._all_calls[name], (name, None)
+                self.unmatched += 1
+            call = calls[self._cursors[key] % len(calls)]
+            self._cursors[key] += 1
+            self.replayed += 1
+            if self.timing == "sequence":
+                duration_ms = call[2]
+            elif self.timing == "sample":
+                samples = self._durations[name]
+                duration_ms = float(samples[self._rng.randrange(len(samples))])
+            else:
+                duration_ms = 0.0
+        return self._outputs[call[1]], duration_ms
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"replayed": self.replayed, "unmatched": self.unmatched}
+
+
+def summarize(trace: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Llamadas, salidas distintas y percentiles de duración por función"""
+    rows = []
+    for name, calls in sorted(trace["calls"].items()):
+        durations = np.asarray([call[2] for call in calls], dtype=np.float64)
+        rows.append({
+            "function": name,
+            "calls": len(calls),
+            "distinct_inputs": len({call[0] for call in calls}),
+            "distinct_outputs": len({call[1] for call in calls}),
+            "p50_ms": float(np.percentile(durations, 50)),
+            "p95_ms": float(np.percentile(durations, 95)),
+            "max_ms": float(durations.max()),
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Trazas de grabación/reproducción del FunctionMatcher Planner")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="Resumen de una traza")
+    summary.add_argument("trace")
+    args = parser.parse_args(argv)
+
+    trace = load_trace(args.trace)
+    print(f"🎞️  {args.trace} (grabada {trace['recorded_at']}, {len(trace['outputs'])} salidas distintas)")
+    for row in summarize(trace):
+        print(
+            f"   • {row['function']:<22} {row['calls']:>6} llamadas | {row['distinct_inputs']:>4} entradas | "
+            f"p50 {row['p50_ms']:8.2f} ms | p95 {row['p95_ms']:8.2f} ms | máx {row['max_ms']:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
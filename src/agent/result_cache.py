@@ -0,0 +1,146 @@
+"""
+Memoización de resultados de funciones entre requests
+Clave = (función, huella de entradas); TTL por función, LRU acotado e
+invalidación en cascada siguiendo el grafo [:REQUIRES] hacia los dependientes.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.agent.graph_utils import build_dependents
+
+
+def _canonical(value: Any) -> Any:
+    """Forma serializable de lo que JSON no conoce (repr solo como último recurso)"""
+    if hasattr(value, "tobytes") and hasattr(value, "dtype"):
+        # El repr de un array grande se trunca con "...": se usa su contenido
+        return {"dtype": str(value.dtype), "shape": list(getattr(value, "shape", ())),
+                "sha1": hashlib.sha1(value.tobytes()).hexdigest()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def fingerprint(value: Any) -> str:
+    """Huella estable del contenido de un valor"""
+    # Un SharedResult trae la huella de su contenido calculada en el worker: la
+    # referencia (nombre del segmento) cambia en cada ejecución, el valor no
+    content = getattr(value, "content_fingerprint", None)
+    if content is not None:
+        return content
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, default=_canonical, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def inputs_fingerprint(dep_results: Dict[str, Any]) -> str:
+    """
+    Huella de las entradas de un paso: los resultados de sus dependencias
+
+    Si un resultado de aguas arriba cambia, cambia la clave de todo lo que depende de él.
+    """
+    return fingerprint({name: fingerprint(result) for name, result in sorted(dep_results.items())})
+
+
+class ResultCache:
+    """Caché LRU thread-safe de resultados con TTL por función"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 0.0, ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._keys_by_function: Dict[str, Set[str]] = {}
+        self._requires: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, func_name: str) -> float:
+        return self.ttls.get(func_name, self.default_ttl)
+
+    def is_cacheable(self, func_name: str) -> bool:
+        """TTL 0 = nunca se cachea (p. ej. funciones con efectos secundarios)"""
+        return self.ttl_for(func_name) > 0
+
+    def get(self, func_name: str, inputs_fp: str) -> Tuple[bool, Any]:
+        """Retorna (hit, resultado); las entradas vencidas cuentan como miss"""
+        key = (func_name, inputs_fp)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, func_name: str, inputs_fp: str, result: Any):
+        ttl = self.ttl_for(func_name)
+        if ttl <= 0:
+            return
+        key = (func_name, inputs_fp)
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            self._keys_by_function.setdefault(func_name, set()).add(inputs_fp)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        fps = self._keys_by_function.get(key[0])
+        if fps is not None:
+            fps.discard(key[1])
+            if not fps:
+                del self._keys_by_function[key[0]]
+
+    def observe_plan(self, plan: Iterable[Dict]):
+        """Aprende aristas [:REQUIRES] de un plan para la invalidación en cascada"""
+        with self._lock:
+            for step in plan:
+                self._requires.setdefault(step["name"], set()).update(step.get("requires", []))
+
+    def invalidate(self, func_name: str) -> List[str]:
+        """
+        Invalida los resultados de una función y de todo lo que depende de ella
+
+        Returns:
+            Funciones invalidadas (la original y sus dependientes transitivos)
+        """
+        with self._lock:
+            dependents = build_dependents(self._requires)
+            affected = {func_name}
+            stack = [func_name]
+            while stack:
+                for dependent in dependents.get(stack.pop(), []):
+                    if dependent not in affected:
+                        affected.add(dependent)
+                        stack.append(dependent)
+            for name in affected:
+                for fp in list(self._keys_by_function.get(name, ())):
+                    self._remove((name, fp))
+        return sorted(affected)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_function.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,209 @@
+"""
+Planificador consciente de costos (HEFT / camino crítico primero)
+Ordena las funciones listas usando las estadísticas de ejecución observadas en Neo4j
+"""
+
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from src.agent.functions import FUNCTION_INPUTS
+from src.agent.graph_utils import build_dependents, step_sources, topological_order
+
+
+class CostAwareScheduler:
+    """
+    Planificador de listas con número acotado de workers
+
+    Prioriza cada función lista por su rango ascendente (upward rank de HEFT):
+    su costo estimado más el camino más costoso hasta el final del plan.
+    Así las funciones del camino crítico arrancan primero y se reduce el makespan
+    cuando hay más funciones listas que workers.
+    """
+
+    def __init__(self, max_workers: int = 4, default_cost_ms: float = 1.0,
+                 inputs: Mapping[str, Dict[str, str]] = FUNCTION_INPUTS):
+        if max_workers < 1:
+            raise ValueError("❌ max_workers debe ser >= 1")
+        self.max_workers = max_workers
+        self.default_cost_ms = default_cost_ms
+        # Entradas declaradas: {función: {parámetro: función productora}}
+        self.inputs = inputs
+
+    def estimate_costs(self, plan: List[Dict]) -> Dict[str, float]:
+        """Costo estimado por función (ms); usa el valor por defecto si no hay historial"""
+        costs = {}
+        for step in plan:
+            avg = step.get("avg_duration_ms")
+            costs[step["name"]] = float(avg) if avg is not None else self.default_cost_ms
+        return costs
+
+    def _plan_requires(self, plan: List[Dict]) -> Dict[str, List[str]]:
+        """
+        Dependencias de cada paso restringidas al propio plan: sus [:REQUIRES] más
+        sus entradas declaradas (en un grafo reducido pueden no ser aristas directas)
+        """
+        names = {step["name"] for step in plan}
+        return {
+            step["name"]: sorted(step_sources(step, self.inputs) & names)
+            for step in plan
+        }
+
+    def upward_ranks(self, plan: List[Dict]) -> Dict[str, float]:
+        """rank(f) = costo(f) + max(rank(d)) sobre las funciones d que requieren a f"""
+        costs = self.estimate_costs(plan)
+        requires = self._plan_requires(plan)
+        dependents = build_dependents(requires)
+        ranks: Dict[str, float] = {}
+        for name in reversed(topological_order(requires)):
+            tail = max((ranks[d] for d in dependents.get(name, [])), default=0.0)
+            ranks[name] = costs[name] + tail
+        return ranks
+
+    def _priority_order(self, ready: List[str], ranks: Dict[str, float]) -> List[str]:
+        return sorted(ready, key=lambda name: (-ranks[name], name))
+
+    def simulate(self, plan: List[Dict]) -> Dict[str, Any]:
+        """
+        Simula la planificación con los costos estimados
+
+        Returns:
+            {"schedule": [{name, worker, start_ms, finish_ms}], "makespan_ms": float}
+        """
+        costs = self.estimate_costs(plan)
+        ranks = self.upward_ranks(plan)
+        requires = self._plan_requires(plan)
+        dependents = build_dependents(requires)
+        remaining = {name: len(set(deps)) for name, deps in requires.items()}
+        ready_at = {name: 0.0 for name in requires}
+        workers = [0.0] * self.max_workers
+        ready = [name for name, count in remaining.items() if count == 0]
+        schedule = []
+
+        while ready:
+            # Elige la función lista con mayor rango y el worker libre más temprano
+            name = self._priority_order(ready, ranks)[0]
+            ready.remove(name)
+            worker = min(range(self.max_workers), key=lambda w: workers[w])
+            start = max(workers[worker], ready_at[name])
+            finish = start + costs[name]
+            workers[worker] = finish
+            schedule.append({"name": name, "worker": worker, "start_ms": start, "finish_ms": finish})
+            for dependent in dependents.get(name, []):
+                remaining[dependent] -= 1
+                ready_at[dependent] = max(ready_at[dependent], finish)
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        makespan = max((item["finish_ms"] for item in schedule), default=0.0)
+        return {"schedule": schedule, "makespan_ms": makespan}
+
+    @staticmethod
+    def _timed(run_step: Callable[[str, Dict[str, Any]], Any], name: str, inputs: Dict[str, Any],
+               started: Dict[str, float]) -> Tuple[Any, float]:
+        # El timeout corre desde que un worker toma el paso, no desde que se encola
+        started[name] = time.monotonic()
+        start = time.perf_counter()
+        result = run_step(name, inputs)
+        return result, (time.perf_counter() - start) * 1000
+
+    def execute(self, plan: List[Dict], run_step: Callable[[str, Dict[str, Any]], Any],
+                deadline: Optional[float] = None, step_timeout_s: Optional[float] = None,
+                pool: Optional[Executor] = None) -> Tuple[Dict[str, Any], Dict[str, float], List[str]]:
+        """
+        Ejecuta el plan respetando dependencias con como máximo `max_workers` en paralelo
+
+        Args:
+            plan: Pasos con {name, requires, avg_duration_ms}
+            run_step: Callable(nombre, {función productora: salida}) que retorna el resultado
+            deadline: Instante límite (time.monotonic()); al vencer no se lanzan más pasos
+            step_timeout_s: Tiempo máximo por paso; se omiten los dependientes que lo
+                requieren como obligatorio, los que lo tienen como opcional corren sin él
+            pool: Pool de larga vida compartido entre requests (sin él se crea uno por plan);
+                el paralelismo del plan sigue acotado a `max_workers`
+
+        Returns:
+            (resultados por función, duraciones medidas en ms, orden de finalización)
+            Los pasos vencidos u omitidos no aparecen en los resultados.
+        """
+        ranks = self.upward_ranks(plan)
+        requires = self._plan_requires(plan)
+        dependents = build_dependents(requires)
+        remaining = {name: len(set(deps)) for name, deps in requires.items()}
+        ready = [name for name, count in remaining.items() if count == 0]
+        results: Dict[str, Any] = {}
+        durations: Dict[str, float] = {}
+        completed: List[str] = []
+        running = {}
+        started: Dict[str, float] = {}
+        mandatory = {step["name"]: set(step.get("requires", [])) - set(step.get("optional_requires", []))
+                     for step in plan}
+        dropped = set()
+
+        def release(name: str, ok: bool):
+            # Un paso terminado o perdido libera a sus dependientes; uno perdido arrastra
+            # a los que lo requieren como obligatorio (y en cascada a los suyos)
+            for dependent in dependents.get(name, []):
+                if dependent in dropped:
+                    continue
+                if not ok and name in mandatory[dependent]:
+                    dropped.add(dependent)
+                    release(dependent, False)
+                    continue
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        own_pool = pool is None
+        if own_pool:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while ready or running:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                ready = self._priority_order(ready, ranks)
+                while ready and len(running) < self.max_workers:
+                    name = ready.pop(0)
+                    inputs = {dep: results[dep] for dep in requires[name] if dep in results}
+                    running[pool.submit(self._timed, run_step, name, inputs, started)] = name
+
+                done, _ = wait(running, timeout=self._wait_timeout(running, started, deadline, step_timeout_s),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name], durations[name] = future.result()
+                    completed.append(name)
+                    release(name, True)
+
+                if step_timeout_s is not None:
+                    # El hilo vencido sigue hasta terminar, pero su resultado se descarta
+                    now = time.monotonic()
+                    for future, name in list(running.items()):
+                        if name in started and now - started[name] >= step_timeout_s:
+                            running.pop(future)
+                            release(name, False)
+        finally:
+            if own_pool:
+                # Sin esperar: un paso vencido no debe bloquear el retorno
+                pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                for future in running:
+                    future.cancel()  # Solo los que aún esperan un worker del pool compartido
+
+        return results, durations, completed
+
+    @staticmethod
+    def _wait_timeout(running: Dict, started: Dict[str, float], deadline: Optional[float],
+                      step_timeout_s: Optional[float]) -> Optional[float]:
+        """Segundos hasta el próximo vencimiento (deadline o timeout de algún paso)"""
+        limits = []
+        if deadline is not None:
+            limits.append(deadline)
+        if step_timeout_s is not None:
+            # Un paso aún en cola vence como muy pronto dentro de step_timeout_s
+            now = time.monotonic()
+            limits.extend(started.get(name, now) + step_timeout_s for name in running.values())
+        if not limits:
+            return None
+        return max(0.0, min(limits) - time.monotonic())
@@ -0,0 +1,84 @@
+"""
+Coalescencia single-flight de trabajo idéntico en curso
+Si varias solicitudes concurrentes piden la misma clave (el plan de un objetivo,
+o una función con la misma huella de entradas), solo la primera ejecuta el
+trabajo; las demás esperan su future y reciben el mismo resultado (o error).
+No es una caché: al terminar, la clave sale de vuelo y la próxima llamada ejecuta.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Deduplica llamadas concurrentes por clave con métricas por clave"""
+
+    def __init__(self, max_tracked_keys: int = 1024):
+        # Métricas acotadas (LRU): las claves con huella de entradas no tienen límite
+        self.max_tracked_keys = max_tracked_keys
+        self._inflight: Dict[Hashable, Future] = {}
+        self._stats: "OrderedDict[Hashable, Dict[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Ejecuta fn() o se une a la ejecución en curso de la misma clave
+
+        Returns:
+            (resultado, si fue compartido con otra llamada en curso)
+        """
+        with self._lock:
+            stats = self._key_stats(key)
+            stats["calls"] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                stats["coalesced"] += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                self._key_stats(key)["errors"] += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value, False
+
+    def _key_stats(self, key: Hashable) -> Dict[str, int]:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = {"calls": 0, "coalesced": 0, "errors": 0}
+            self._stats[key] = stats
+            if len(self._stats) > self.max_tracked_keys:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Totales y métricas por clave (solo claves con llamadas coalescidas)"""
+        with self._lock:
+            calls = sum(s["calls"] for s in self._stats.values())
+            coalesced = sum(s["coalesced"] for s in self._stats.values())
+            return {
+                "in_flight": len(self._inflight),
+                "calls": calls,
+                "coalesced": coalesced,
+                "coalesced_rate": coalesced / calls if calls else 0.0,
+                "by_key": {
+                    " | ".join(map(str, key)) if isinstance(key, tuple) else str(key): dict(s)
+                    for key, s in self._stats.items() if s["coalesced"]
+                },
+            }
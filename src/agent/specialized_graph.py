@@ -0,0 +1,87 @@
+"""
+Grafos LangGraph especializados por función objetivo
+El DAG de dependencias se desenrolla como aristas: sin resolución ni bucle execute_step
+"""
+
+import operator
+from typing import Annotated, Dict, List, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from src.agent.functions import FUNCTION_INPUTS
+from src.agent.graph_utils import step_sources
+
+
+def _merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer: combina resultados de ramas que se ejecutan en paralelo"""
+    return {**left, **right}
+
+
+class SpecializedState(TypedDict):
+    results: Annotated[Dict[str, Dict], _merge_dicts]
+    durations_ms: Annotated[Dict[str, float], _merge_dicts]
+    executed_functions: Annotated[List[str], operator.add]
+    skipped: Annotated[List[str], operator.add]
+    timed_out_ms: Annotated[Dict[str, float], _merge_dicts]
+
+
+def _node_id(func_name: str) -> str:
+    # Prefijo para que los nombres de nodo nunca choquen con las claves del estado
+    return f"exec_{func_name}"
+
+
+def _step_node(func_name: str, requires: List[str], optional: List[str] = ()):
+    """Nodo que delega la ejecución en el agente recibido por config"""
+    # Entradas declaradas: siempre ancestros en el plan, ya resueltas al llegar aquí
+    sources = step_sources({"name": func_name, "requires": requires}, FUNCTION_INPUTS)
+    def node(state: SpecializedState, config) -> Dict:
+        if func_name in config["configurable"].get("pruned", ()):
+            return {}  # Podado por presupuesto: sus dependientes corren sin esa entrada
+        agent = config["configurable"]["agent"]
+        dep_results = {dep: state["results"][dep] for dep in sources if dep in state["results"]}
+        # Una dependencia obligatoria vencida u omitida bloquea al nodo; una opcional no
+        blocked = [dep for dep in requires if dep in state.get("skipped", []) and dep not in optional]
+        run = lambda: agent.run_specialized_step(
+            func_name, dep_results, config["configurable"].get("prefetched"),
+            config["configurable"].get("deadline"), blocked
+        )
+        # Las ramas corren en hilos de LangGraph: con perfilado cuentan como hilos del request
+        profiler = config["configurable"].get("profiler")
+        if profiler is None:
+            return run()
+        with profiler.thread():
+            return run()
+    return node
+
+
+def compile_specialized_plan(plan: List[Dict]):
+    """
+    Compila un StateGraph estático para un plan ya resuelto
+
+    Cada función es un nodo; cada [:REQUIRES] es una arista dependencia → función.
+    Un nodo con varias dependencias espera a todas (arista de unión de LangGraph),
+    y las ramas independientes se ejecutan en el mismo superstep.
+    """
+    names = {step["name"] for step in plan}
+    workflow = StateGraph(SpecializedState)
+    has_dependents = set()
+
+    for step in plan:
+        workflow.add_node(_node_id(step["name"]), _step_node(
+            step["name"], step.get("requires", []), step.get("optional_requires", [])
+        ))
+
+    for step in plan:
+        deps = sorted(set(dep for dep in step.get("requires", []) if dep in names))
+        has_dependents.update(deps)
+        if not deps:
+            workflow.add_edge(START, _node_id(step["name"]))
+        elif len(deps) == 1:
+            workflow.add_edge(_node_id(deps[0]), _node_id(step["name"]))
+        else:
+            workflow.add_edge([_node_id(dep) for dep in deps], _node_id(step["name"]))
+
+    for name in names - has_dependents:
+        workflow.add_edge(_node_id(name), END)
+
+    return workflow.compile()
@@ -0,0 +1,85 @@
+"""El mismo objetivo en dos namespaces: particiones, cachés y grafos aislados"""
+
+import numpy as np
+import pytest
+
+from src.agent.catalog_partitions import PartitionedCatalog
+
+QUERY = "calcular el precio total"
+TARGET = "calcularPrecioTotal"
+# Mismo objetivo, distinta dependencia en cada namespace
+LEAF = {"ventas": "obtenerInfoProducto", "soporte": "obtenerInfoCliente"}
+
+
+class _Catalogs:
+    """Fuente tipo resolver: un grafo por namespace, con embeddings ya guardados"""
+
+    def __init__(self, target_embedding):
+        self.target_embedding = list(target_embedding)
+        self.leaf_embedding = [-x for x in self.target_embedding]
+
+    def get_function_graph(self, namespace=None):
+        if namespace not in LEAF:
+            return []
+        leaf = LEAF[namespace]
+        return [
+            {"name": leaf, "description": f"Dato base de {namespace}", "requires": [], "optional": [],
+             "avg_duration_ms": None, "exec_count": 0, "embedding": self.leaf_embedding, "namespace": namespace},
+            {"name": TARGET, "description": f"Total en {namespace}", "requires": [leaf], "optional": [],
+             "avg_duration_ms": None, "exec_count": 0, "embedding": self.target_embedding, "namespace": namespace},
+        ]
+
+    def record_executions(self, durations_ms, alpha=0.3):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_same_target_resolves_per_partition_and_unknown_namespace_fails():
+    catalog = PartitionedCatalog(_Catalogs([1.0, 0.0]), model=None)
+    plans = {
+        namespace: [step["name"] for step in catalog.partition(namespace)["resolver"].get_execution_plan(TARGET)]
+        for namespace in LEAF
+    }
+    assert plans == {namespace: [leaf, TARGET] for namespace, leaf in LEAF.items()}
+    with pytest.raises(ValueError, match="finanzas"):
+        catalog.partition("finanzas")
+    # El fallo no deja una partición vacía ni bloquea la clave
+    assert sorted(catalog.stats()["loaded"]) == ["soporte", "ventas"]
+    with pytest.raises(ValueError):
+        catalog.partition("finanzas")
+
+
+def test_agent_isolates_caches_and_graphs_by_namespace():
+    pytest.importorskip("sentence_transformers")
+    import src.agent.planner_agent as planner_agent
+    from src.agent.embedding_index import encode_query
+
+    embedding = encode_query(planner_agent.get_embedding_model(), QUERY)
+    agent = planner_agent.FunctionMatcherAgent(
+        resolver=_Catalogs(embedding.tolist()), verbose=False, partitions=True,
+        query_cache_size=8, specialize_after=1, speculative_top_k=2
+    )
+    try:
+        # Dos rondas: la segunda usa la caché semántica y el grafo especializado
+        for _ in range(2):
+            for namespace, leaf in LEAF.items():
+                state = agent.invoke(QUERY, namespace=namespace)
+                assert state["target_function"] == TARGET
+                assert [step["name"] for step in state["execution_plan"]] == [leaf, TARGET]
+                assert set(state["results"]) == {leaf, TARGET}
+
+        for namespace, leaf in LEAF.items():
+            assert [step["name"] for step in agent._specialized[(namespace, TARGET)]["plan"]] == [leaf, TARGET]
+            assert [step["name"] for step in agent.query_cache.lookup_text(QUERY, namespace)["plan"]] == [leaf, TARGET]
+            assert agent.prefetcher.shared_leaves([TARGET], namespace) == [leaf]
+        assert (None, TARGET) not in agent._specialized
+        assert agent.query_cache.lookup_text(QUERY) is None
+        assert agent.query_cache.stats()["entries"] == 2
+
+        with pytest.raises(ValueError, match="finanzas"):
+            agent.invoke(QUERY, namespace="finanzas")
+        assert agent.invoke(QUERY, namespace="ventas")["results"][TARGET]
+    finally:
+        agent.close()
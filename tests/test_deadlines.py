@@ -0,0 +1,107 @@
+"""Con deadline o timeout por paso, una dependencia opcional vencida no bloquea a su dependiente"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.agent.dataflow import DataflowExecutor
+from src.agent.functions import FUNCTION_REGISTRY
+from src.agent.init_graph import FUNCTIONS
+from src.agent.scheduler import CostAwareScheduler
+
+# lento es opcional para total y obligatorio para envio
+PLAN = [
+    {"name": "lento", "requires": []},
+    {"name": "base", "requires": []},
+    {"name": "total", "requires": ["base", "lento"], "optional_requires": ["lento"]},
+    {"name": "envio", "requires": ["lento"]},
+    {"name": "cierre", "requires": ["total", "envio"], "optional_requires": ["envio"]},
+]
+
+MODES = {
+    "sequential": {},
+    "scheduler": {"max_workers": 3},
+    "dataflow": {"max_workers": 3, "dataflow": True},
+    "specialized": {"specialize_after": 1},
+}
+
+
+@pytest.mark.parametrize("executor", [CostAwareScheduler(max_workers=3), DataflowExecutor(max_workers=3)],
+                         ids=["scheduler", "dataflow"])
+def test_optional_timeout_releases_dependents(executor):
+    release = threading.Event()
+    received = {}
+
+    def run_step(name, dep_results):
+        if name == "lento":
+            release.wait(5)
+        received[name] = sorted(dep_results)
+        return name
+
+    try:
+        results, _, _ = executor.execute(PLAN, run_step, step_timeout_s=0.05)
+    finally:
+        release.set()
+    # envio requiere a lento: se omite; cierre lo tiene como opcional y corre igual
+    assert set(results) == {"base", "total", "cierre"}
+    assert received["total"] == ["base"]
+    assert received["cierre"] == ["total"]
+
+
+def _agent(planner_agent, registry, **options):
+    from src.agent.embedding_index import DescriptionIndex
+    from src.agent.memory_resolver import InMemoryResolver
+
+    agent = planner_agent.FunctionMatcherAgent(
+        resolver=InMemoryResolver(FUNCTIONS), verbose=False, registry=registry, **options
+    )
+    # Un único candidato: la selección siempre elige calcularPrecioTotal
+    dim = agent.description_index.matrix.shape[1]
+    agent.description_index = DescriptionIndex(["calcularPrecioTotal"], np.ones((1, dim), dtype=np.float32))
+    return agent
+
+
+def _slow_client_registry(delay_s):
+    def obtenerInfoCliente(**kwargs):
+        time.sleep(delay_s)
+        return FUNCTION_REGISTRY["obtenerInfoCliente"](**kwargs)
+    return {**FUNCTION_REGISTRY, "obtenerInfoCliente": obtenerInfoCliente}
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_agent_runs_target_without_timed_out_optional_dependency(mode):
+    pytest.importorskip("sentence_transformers")
+    import src.agent.planner_agent as planner_agent
+
+    agent = _agent(planner_agent, _slow_client_registry(0.3),
+                   deadline_ms=200, step_timeout_ms=100, **MODES[mode])
+    try:
+        # Dos requests: con especialización el segundo recorre el grafo compilado
+        for _ in range(2):
+            state = agent.invoke("calcular el precio total")
+            assert "calcularPrecioTotal" in state["results"], mode
+            assert "obtenerInfoCliente" not in state["results"], mode
+            assert "calcularPrecioTotal" not in state["skipped"], mode
+    finally:
+        agent.close()
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_timeout_cost_prunes_slow_optional_dependency_next_time(mode):
+    pytest.importorskip("sentence_transformers")
+    import src.agent.planner_agent as planner_agent
+
+    agent = _agent(planner_agent, _slow_client_registry(0.3), deadline_ms=200, **MODES[mode])
+    try:
+        # Sin historial el primer request espera a la opcional y agota el deadline
+        first = agent.invoke("calcular el precio total")
+        assert "obtenerInfoCliente" in first["timed_out_ms"], mode
+        # Su costo queda por encima del presupuesto: el siguiente la poda de entrada
+        second = agent.invoke("calcular el precio total")
+        assert "calcularPrecioTotal" in second["results"], mode
+        assert "obtenerInfoCliente" in second["skipped"], mode
+        assert "obtenerInfoCliente" not in second["timed_out_ms"], mode
+    finally:
+        agent.close()
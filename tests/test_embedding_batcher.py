@@ -0,0 +1,124 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.agent.embedding_batcher import EmbeddingBatcher
+
+
+class _Model:
+    """Modelo falso: registra el tamaño de cada lote y puede bloquearse"""
+
+    def __init__(self, gate=None):
+        self.batch_sizes = []
+        self.gate = gate
+        self.entered = threading.Event()
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batch_sizes.append(len(texts))
+        if "falla" in texts:
+            raise RuntimeError("modelo caído")
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float64)
+
+
+def _encode_all(batcher, texts):
+    results = {}
+    threads = [
+        threading.Thread(target=lambda text=text: results.__setitem__(text, batcher.encode(text)))
+        for text in texts
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_window_timeout_flushes_a_partial_batch():
+    model = _Model()
+    batcher = EmbeddingBatcher(model, window_ms=50, max_batch=32)
+    try:
+        start = time.perf_counter()
+        vector = batcher.encode("hola")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        batcher.close()
+    # Nadie más llegó: el lote de 1 sale al vencer la ventana
+    assert model.batch_sizes == [1]
+    assert elapsed_ms >= 40
+    assert vector.dtype == np.float32 and vector.tolist() == [4.0, 1.0]
+
+
+def test_max_batch_flushes_before_the_window():
+    model = _Model()
+    batcher = EmbeddingBatcher(model, window_ms=10_000, max_batch=3)
+    try:
+        start = time.perf_counter()
+        results = _encode_all(batcher, ["a", "bb", "ccc"])
+        elapsed_s = time.perf_counter() - start
+    finally:
+        batcher.close()
+    # El lote se llenó: no espera los 10 s de la ventana
+    assert model.batch_sizes == [3]
+    assert elapsed_s < 5
+    assert {text: vector[0] for text, vector in results.items()} == {"a": 1, "bb": 2, "ccc": 3}
+    assert batcher.stats()["max_batch"] == 3
+
+
+def test_close_processes_pending_requests_then_rejects_new_ones():
+    gate = threading.Event()
+    model = _Model(gate)
+    batcher = EmbeddingBatcher(model, window_ms=0, max_batch=2)
+    results = {}
+    first = threading.Thread(target=lambda: results.__setitem__("uno", batcher.encode("uno")))
+    first.start()
+    model.entered.wait(5)  # El modelo está ocupado con "uno"
+    pending = [
+        threading.Thread(target=lambda text=text: results.__setitem__(text, batcher.encode(text)))
+        for text in ["dos", "tres", "cuatro"]
+    ]
+    for thread in pending:
+        thread.start()
+    while len(batcher._pending) < 3:
+        time.sleep(0.001)
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    gate.set()
+    closer.join(5)
+    for thread in [first] + pending:
+        thread.join(5)
+    # Nada pendiente se pierde al cerrar, y los lotes respetan max_batch
+    assert set(results) == {"uno", "dos", "tres", "cuatro"}
+    assert model.batch_sizes == [1, 2, 1]
+    with pytest.raises(RuntimeError):
+        batcher.encode("cinco")
+
+
+def test_model_error_reaches_every_caller_in_the_batch():
+    model = _Model()
+    batcher = EmbeddingBatcher(model, window_ms=10_000, max_batch=2)
+    errors = []
+
+    def call(text):
+        try:
+            batcher.encode(text)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call, args=(text,)) for text in ["falla", "otro"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    try:
+        assert errors == ["modelo caído"] * 2
+        # El hilo sigue vivo para el siguiente lote
+        assert _encode_all(batcher, ["ok", "sí"])["ok"].tolist() == [2.0, 1.0]
+    finally:
+        batcher.close()
+    with pytest.raises(ValueError):
+        EmbeddingBatcher(model, max_batch=0)
@@ -0,0 +1,98 @@
+"""Todos los modos de ejecución pasan los mismos argumentos, también sobre el grafo reducido"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from src.agent.dataflow import DataflowExecutor
+from src.agent.functions import FUNCTION_INPUTS, FUNCTION_REGISTRY
+from src.agent.graph_utils import step_sources, topological_order, transitive_reduction
+from src.agent.init_graph import FUNCTIONS
+from src.agent.scheduler import CostAwareScheduler
+
+REQUIRES = {f["name"]: list(f["requires"]) for f in FUNCTIONS}
+REDUCED = transitive_reduction(REQUIRES)
+
+# Lo que recibe cada función en el modo secuencial sobre el grafo completo
+EXPECTED = {
+    name: sorted(FUNCTION_INPUTS.get(name, {}))
+    for name in REQUIRES
+}
+
+
+def _plan(requires):
+    return [{"name": name, "requires": requires[name], "avg_duration_ms": 1.0} for name in topological_order(requires)]
+
+
+def test_reduction_drops_declared_input_edges():
+    # Sin esta condición el test de paridad no probaría nada
+    assert "obtenerInfoCliente" not in REDUCED["crearPedido"]
+    assert "obtenerInfoCliente" not in REDUCED["enviarConfirmacion"]
+
+
+@pytest.mark.parametrize("executor", [CostAwareScheduler(max_workers=3), DataflowExecutor(max_workers=3)],
+                         ids=["scheduler", "dataflow"])
+@pytest.mark.parametrize("requires", [REQUIRES, REDUCED], ids=["full", "reduced"])
+def test_executors_receive_every_declared_input(executor, requires):
+    received = {}
+    lock = threading.Lock()
+
+    def run_step(name, dep_results):
+        with lock:
+            received[name] = sorted(dep_results)
+        return name
+
+    plan = _plan(requires)
+    results, _, _ = executor.execute(plan, run_step)
+    assert set(results) == set(REQUIRES)
+    for step in plan:
+        expected = sorted(step_sources(step, FUNCTION_INPUTS))
+        assert received[step["name"]] == expected
+        assert set(FUNCTION_INPUTS.get(step["name"], {}).values()) <= set(received[step["name"]])
+
+
+def test_agent_modes_pass_the_same_kwargs():
+    pytest.importorskip("sentence_transformers")
+    import src.agent.planner_agent as planner_agent
+    from src.agent.embedding_index import DescriptionIndex
+    from src.agent.memory_resolver import InMemoryResolver
+
+    reduced_functions = [{**f, "requires": REDUCED[f["name"]]} for f in FUNCTIONS]
+    modes = {
+        "sequential": {},
+        "scheduler": {"max_workers": 3},
+        "dataflow": {"max_workers": 3, "dataflow": True},
+        "specialized": {"specialize_after": 1},
+    }
+    seen = {}
+    for mode, options in modes.items():
+        calls = {}
+        lock = threading.Lock()
+
+        def recording(name):
+            def call(**kwargs):
+                with lock:
+                    calls[name] = sorted(kwargs)
+                return FUNCTION_REGISTRY[name](**kwargs)
+            return call
+
+        agent = planner_agent.FunctionMatcherAgent(
+            resolver=InMemoryResolver(reduced_functions), verbose=False,
+            registry={name: recording(name) for name in FUNCTION_REGISTRY}, **options
+        )
+        # Un único candidato: la selección siempre elige enviarConfirmacion
+        dim = agent.description_index.matrix.shape[1]
+        agent.description_index = DescriptionIndex(["enviarConfirmacion"], np.ones((1, dim), dtype=np.float32))
+        try:
+            # Dos requests: el segundo recorre el grafo especializado
+            for _ in range(2):
+                calls.clear()
+                state = agent.invoke("enviar confirmación del pedido")
+                assert not state["skipped"]
+        finally:
+            agent.close()
+        seen[mode] = dict(calls)
+
+    for mode, calls in seen.items():
+        assert calls == EXPECTED, mode
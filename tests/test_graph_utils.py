@@ -0,0 +1,133 @@
+import pytest
+
+from src.agent.graph_reduction import verify_equivalent
+from src.agent.graph_utils import (
+    build_dependents, find_cycles, prune_optional, redundant_edges, topological_order,
+    topological_waves, transitive_closure, transitive_reduction
+)
+
+# Catálogo de init_graph (solo [:REQUIRES])
+REQUIRES = {
+    "obtenerInfoCliente": [],
+    "obtenerInfoProducto": [],
+    "verificarStock": ["obtenerInfoProducto"],
+    "calcularPrecioTotal": ["obtenerInfoProducto", "obtenerInfoCliente"],
+    "crearPedido": ["obtenerInfoCliente", "obtenerInfoProducto", "verificarStock", "calcularPrecioTotal"],
+    "enviarConfirmacion": ["crearPedido", "obtenerInfoCliente"],
+}
+# calcularPrecioTotal → obtenerInfoCliente es opcional (solo para descuentos)
+OPTIONAL = {"calcularPrecioTotal": ["obtenerInfoCliente"]}
+
+
+def _plan(requires, optional, target):
+    closure = transitive_closure(requires, target)
+    return [
+        {"name": name, "requires": sorted(requires[name]), "optional_requires": optional.get(name, [])}
+        for name in topological_order({name: requires[name] for name in closure})
+    ]
+
+
+def test_build_dependents_inverts_requires():
+    dependents = build_dependents(REQUIRES)
+    assert sorted(dependents["obtenerInfoProducto"]) == ["calcularPrecioTotal", "crearPedido", "verificarStock"]
+    assert dependents["enviarConfirmacion"] == []
+
+
+def test_topological_waves_group_independent_functions():
+    assert topological_waves(REQUIRES) == [
+        ["obtenerInfoCliente", "obtenerInfoProducto"],
+        ["calcularPrecioTotal", "verificarStock"],
+        ["crearPedido"],
+        ["enviarConfirmacion"],
+    ]
+
+
+def test_topological_waves_ignore_dependencies_outside_the_map():
+    assert topological_waves({"a": ["fuera"], "b": ["a"]}) == [["a"], ["b"]]
+
+
+def test_topological_order_respects_every_edge():
+    order = topological_order(REQUIRES)
+    position = {name: i for i, name in enumerate(order)}
+    for name, deps in REQUIRES.items():
+        assert all(position[dep] < position[name] for dep in deps)
+
+
+def test_topological_waves_reject_cycles():
+    with pytest.raises(ValueError, match="Ciclo"):
+        topological_waves({"a": ["b"], "b": ["a"], "c": []})
+
+
+def test_transitive_closure_includes_target():
+    assert transitive_closure(REQUIRES, "verificarStock") == ["obtenerInfoProducto", "verificarStock"]
+    assert transitive_closure(REQUIRES, "enviarConfirmacion") == sorted(REQUIRES)
+
+
+def test_find_cycles_reports_components_and_self_loops():
+    requires = {"a": ["b"], "b": ["c"], "c": ["a"], "d": ["d"], "e": ["a"]}
+    assert sorted(find_cycles(requires)) == [["a", "b", "c"], ["d"]]
+    assert find_cycles(REQUIRES) == []
+
+
+def test_transitive_reduction_keeps_reachability_and_waves():
+    reduced = transitive_reduction(REQUIRES)
+    assert reduced["crearPedido"] == ["calcularPrecioTotal", "verificarStock"]
+    assert reduced["enviarConfirmacion"] == ["crearPedido"]
+    for name in REQUIRES:
+        assert transitive_closure(reduced, name) == transitive_closure(REQUIRES, name)
+    assert topological_waves(reduced) == topological_waves(REQUIRES)
+
+
+def test_redundant_edges_are_the_removed_ones():
+    assert redundant_edges(REQUIRES) == [
+        ("crearPedido", "obtenerInfoCliente"),
+        ("crearPedido", "obtenerInfoProducto"),
+        ("enviarConfirmacion", "obtenerInfoCliente"),
+    ]
+
+
+def test_optional_paths_do_not_make_mandatory_edges_redundant():
+    reduced = transitive_reduction(REQUIRES, OPTIONAL)
+    # Solo se llega a obtenerInfoCliente vía la arista opcional: la obligatoria se conserva
+    assert reduced["crearPedido"] == ["calcularPrecioTotal", "obtenerInfoCliente", "verificarStock"]
+    assert redundant_edges(REQUIRES, OPTIONAL) == [
+        ("crearPedido", "obtenerInfoProducto"),
+        ("enviarConfirmacion", "obtenerInfoCliente"),
+    ]
+
+
+def test_redundant_optional_edge_is_removed():
+    requires = {"a": ["b", "c"], "b": ["c"], "c": []}
+    assert transitive_reduction(requires, {"a": ["c"]})["a"] == ["b"]
+    # La obligatoria a → c no se implica por un camino con una arista opcional
+    assert transitive_reduction(requires, {"b": ["c"]})["a"] == ["b", "c"]
+
+
+def test_prune_optional_keeps_dependencies_required_elsewhere():
+    plan, pruned = prune_optional(_plan(REQUIRES, OPTIONAL, "crearPedido"), "crearPedido")
+    assert pruned == []
+    assert {step["name"] for step in plan} == set(REQUIRES) - {"enviarConfirmacion"}
+    plan, pruned = prune_optional(_plan(REQUIRES, OPTIONAL, "calcularPrecioTotal"), "calcularPrecioTotal")
+    assert pruned == ["obtenerInfoCliente"]
+    assert plan == [{"name": "obtenerInfoProducto", "requires": [], "optional_requires": []},
+                    {"name": "calcularPrecioTotal", "requires": ["obtenerInfoProducto"],
+                     "optional_requires": ["obtenerInfoCliente"]}]
+
+
+def test_pruning_the_reduced_graph_matches_the_original():
+    naive = transitive_reduction(REQUIRES)
+    aware = transitive_reduction(REQUIRES, OPTIONAL)
+
+    def kept(requires):
+        return {step["name"] for step in prune_optional(_plan(requires, OPTIONAL, "crearPedido"), "crearPedido")[0]}
+
+    assert kept(aware) == kept(REQUIRES)
+    # La reducción que ignora el flag pierde la dependencia obligatoria al podar
+    assert "obtenerInfoCliente" in kept(REQUIRES) and "obtenerInfoCliente" not in kept(naive)
+    assert verify_equivalent(REQUIRES, aware, OPTIONAL) == []
+    assert verify_equivalent(REQUIRES, naive, OPTIONAL) == ["crearPedido", "enviarConfirmacion"]
+
+
+def test_verify_equivalent_compares_optional_flags():
+    aware = transitive_reduction(REQUIRES, OPTIONAL)
+    assert verify_equivalent(REQUIRES, aware, OPTIONAL, reduced_flags={}) == ["calcularPrecioTotal"]
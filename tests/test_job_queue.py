@@ -0,0 +1,96 @@
+import os
+import threading
+
+import pytest
+
+from src.agent.job_queue import SQLiteJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_lease_and_complete(queue):
+    job_id = queue.publish("verificarStock", {"producto": {"id": 1}})
+    job = queue.lease("w1")
+    assert job == {"id": job_id, "func_name": "verificarStock", "inputs": {"producto": {"id": 1}}, "attempts": 1}
+    # Nadie más lo ve mientras el lease está vigente
+    assert queue.lease("w2") is None
+    assert queue.complete(job_id, {"ok": True}, 1.5)
+    assert not queue.complete(job_id, {"ok": False}, 2.0)  # Entrega repetida: gana la primera
+    assert queue.fetch([job_id])[job_id]["result"] == {"ok": True}
+    assert queue.stats() == {"done": 1}
+
+
+def test_expired_lease_is_redelivered(queue):
+    job_id = queue.publish("f")
+    assert queue.lease("w1", lease_s=-1)["attempts"] == 1
+    job = queue.lease("w2", lease_s=30)
+    assert job["id"] == job_id and job["attempts"] == 2
+    # El worker original ya no puede renovar
+    assert not queue.heartbeat(job_id, "w1")
+    assert queue.heartbeat(job_id, "w2")
+
+
+def test_expired_lease_after_max_attempts_goes_dead(queue):
+    job_id = queue.publish("f")
+    queue.lease("w1", lease_s=-1)
+    queue.lease("w2", lease_s=-1)
+    assert queue.lease("w3") is None
+    done = queue.fetch([job_id])[job_id]
+    assert done["status"] == "dead" and "2 intentos" in done["error"]
+    assert not queue.complete(job_id, "tarde", 1.0)
+
+
+def test_fail_requeues_then_marks_failed(queue):
+    job_id = queue.publish("f")
+    queue.fail(queue.lease("w1")["id"], "w1", "boom")
+    assert queue.stats() == {"pending": 1}
+    queue.fail(queue.lease("w1")["id"], "w1", "boom")
+    assert queue.fetch([job_id])[job_id]["status"] == "failed"
+
+
+def test_connections_are_bounded_across_threads(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite"), pool_size=2)
+    fd_dir = "/proc/self/fd"
+    before = len(os.listdir(fd_dir)) if os.path.isdir(fd_dir) else None
+
+    def work():
+        queue.fetch([queue.publish("f")])
+
+    for _ in range(20):
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert queue._idle.qsize() <= 2
+    if before is not None:
+        # Cada conexión WAL abre la base, el -wal y el -shm: a lo sumo pool_size de más
+        assert len(os.listdir(fd_dir)) - before <= 2 * 3
+    queue.close()
+    assert queue._idle.qsize() == 0
+
+
+def test_worker_heartbeat_reuses_the_worker_queue(tmp_path, monkeypatch):
+    from src.agent import job_queue
+
+    path = str(tmp_path / "jobs.sqlite")
+    publisher = SQLiteJobQueue(path)
+    job_id = publisher.publish("obtenerInfoProducto")
+    opened = []
+
+    class CountingQueue(SQLiteJobQueue):
+        def __init__(self, *args, **kwargs):
+            opened.append(args)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(job_queue, "SQLiteJobQueue", CountingQueue)
+    job_queue.run_worker(path, worker_id="w1", lease_s=0.003, max_jobs=1)
+    # Una sola cola (esquema + pool) para todo el worker, no una por trabajo
+    assert len(opened) == 1
+    assert publisher.fetch([job_id])[job_id]["status"] == "done"
+    publisher.close()
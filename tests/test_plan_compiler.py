@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from src.agent.graph_utils import prune_optional
+from src.agent.init_graph import FUNCTIONS
+from src.agent.memory_resolver import InMemoryResolver
+from src.agent.plan_compiler import PlanArtifact, compile_artifact, graph_checksum, validate_graph
+
+
+def _graph():
+    """Filas con la forma de DependencyResolver.get_function_graph"""
+    return [
+        {
+            "name": f["name"],
+            "description": f["description"],
+            "requires": list(f["requires"]),
+            "optional": list(f.get("optional", [])),
+            "avg_duration_ms": float(i + 1),
+            "embedding": [],
+        }
+        for i, f in enumerate(FUNCTIONS)
+    ]
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    graph = _graph()
+    embeddings = np.eye(len(graph), 8, dtype=np.float32)
+    path = str(tmp_path / "plans.fmplan")
+    compile_artifact(graph, path, embeddings)
+    artifact = PlanArtifact(path)
+    yield artifact
+    artifact.close()
+
+
+def test_round_trip_matches_the_resolver_plans(artifact):
+    resolver = InMemoryResolver(_graph())
+    for f in FUNCTIONS:
+        expected = resolver.get_execution_plan(f["name"])
+        plan = artifact.get_execution_plan(f["name"])
+        assert [step["name"] for step in plan] == [step["name"] for step in expected]
+        for step, reference in zip(plan, expected):
+            assert step["requires"] == reference["requires"]
+            assert step["optional_requires"] == reference["optional_requires"]
+            assert step["description"] == reference["description"]
+            assert step["avg_duration_ms"] == pytest.approx(reference["avg_duration_ms"])
+
+
+def test_round_trip_keeps_names_and_embeddings(artifact):
+    assert artifact.names == sorted(f["name"] for f in FUNCTIONS)
+    np.testing.assert_array_equal(artifact.embeddings, np.eye(len(FUNCTIONS), 8, dtype=np.float32))
+
+
+def test_artifact_plans_can_be_pruned(artifact):
+    plan, pruned = prune_optional(artifact.get_execution_plan("calcularPrecioTotal"), "calcularPrecioTotal")
+    assert pruned == ["obtenerInfoCliente"]
+    assert [step["name"] for step in plan] == ["obtenerInfoProducto", "calcularPrecioTotal"]
+
+
+def test_unknown_target_raises(artifact):
+    with pytest.raises(ValueError):
+        artifact.get_execution_plan("noExiste")
+
+
+def test_corrupted_artifact_is_rejected(tmp_path):
+    path = tmp_path / "plans.fmplan"
+    compile_artifact(_graph(), str(path))
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="corrupto"):
+        PlanArtifact(str(path))
+
+
+def test_checksum_ignores_costs_but_not_edges():
+    graph = _graph()
+    changed_cost = [{**f, "avg_duration_ms": 99.0} for f in graph]
+    assert graph_checksum(changed_cost) == graph_checksum(graph)
+    changed_edges = [{**f, "requires": []} if f["name"] == "verificarStock" else f for f in graph]
+    assert graph_checksum(changed_edges) != graph_checksum(graph)
+    changed_flags = [{**f, "optional": []} for f in graph]
+    assert graph_checksum(changed_flags) != graph_checksum(graph)
+
+
+def test_validate_graph_reports_cycles_missing_and_orphans():
+    graph = [
+        {"name": "a", "description": "", "requires": ["b"]},
+        {"name": "b", "description": "", "requires": ["a"]},
+        {"name": "solo", "description": "", "requires": []},
+    ]
+    report = validate_graph(graph, registry={"a": None, "b": None})
+    assert report == {"cycles": [["a", "b"]], "missing_registry": ["solo"], "orphans": ["solo"]}
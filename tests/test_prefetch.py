@@ -0,0 +1,25 @@
+from src.agent.prefetch import SpeculativePrefetcher
+
+
+def _plan(*leaves):
+    return [{"name": leaf, "requires": []} for leaf in leaves] + [{"name": "objetivo", "requires": list(leaves)}]
+
+
+def test_shared_leaves_intersect_known_targets():
+    prefetcher = SpeculativePrefetcher(side_effect_free={"a", "b", "c"})
+    prefetcher.observe_plan("f", _plan("a", "b"))
+    prefetcher.observe_plan("g", _plan("b", "c", "efecto"))
+    assert prefetcher.shared_leaves(["f", "g", "desconocido"]) == ["b"]
+    prefetcher.shutdown()
+
+
+def test_leaves_are_learned_per_namespace():
+    prefetcher = SpeculativePrefetcher(side_effect_free={"a", "b"})
+    prefetcher.observe_plan("f", _plan("a"), namespace="ventas")
+    prefetcher.observe_plan("f", _plan("b"))
+    assert prefetcher.shared_leaves(["f"], "ventas") == ["a"]
+    assert prefetcher.shared_leaves(["f"]) == ["b"]
+    assert prefetcher.shared_leaves(["f"], "soporte") == []
+    futures = prefetcher.launch(["f"], lambda name: name.upper(), "ventas")
+    assert {name: future.result() for name, future in futures.items()} == {"a": "A"}
+    prefetcher.shutdown()
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.agent.process_executor import ProcessStepExecutor, SharedResult, bind_shared_scope
+from src.agent.result_cache import fingerprint, inputs_fingerprint
+
+
+@pytest.fixture(scope="module")
+def executor():
+    # Umbral 0: todo resultado viaja por memoria compartida
+    executor = ProcessStepExecutor(max_workers=1, shm_threshold=0)
+    yield executor
+    executor.shutdown()
+
+
+def test_shared_results_have_the_fingerprint_of_their_value(executor):
+    first = executor.run("calcularPrecioTotal")
+    second = executor.run("calcularPrecioTotal")
+    try:
+        assert isinstance(first, SharedResult) and first.shm_name != second.shm_name
+        # Mismo valor lógico → misma clave de caché / single-flight en cada ejecución
+        assert fingerprint(first) == fingerprint(second) == fingerprint(executor.read(first))
+        assert inputs_fingerprint({"calcularPrecioTotal": first}) == inputs_fingerprint(
+            {"calcularPrecioTotal": executor.read(second)}
+        )
+    finally:
+        executor.release([first, second])
+
+
+def test_shared_inputs_reach_the_worker(executor):
+    producto = executor.run("obtenerInfoProducto")
+    try:
+        stock = executor.materialize(executor.run("verificarStock", {"producto": producto}))
+        assert stock == {"disponible": True, "cantidad": 15}
+    finally:
+        executor.release([producto])
+
+
+def _exists(result):
+    try:
+        result.attach().close()  # Sin registrarlo en el resource tracker
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def test_request_scope_releases_segments_when_the_request_fails(executor):
+    created = []
+    with pytest.raises(RuntimeError):
+        with executor.request_scope():
+            created.append(executor.run("obtenerInfoProducto"))
+            # También los creados desde un worker del pool de pasos
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                created.append(pool.submit(bind_shared_scope(executor.run), "obtenerInfoCliente").result())
+            assert all(_exists(result) for result in created)
+            raise RuntimeError("falla a mitad del request")
+    assert not any(_exists(result) for result in created)
+
+
+def test_request_scope_keeps_materialized_values_and_drops_late_segments(executor):
+    with executor.request_scope():
+        producto = executor.materialize(executor.run("obtenerInfoProducto"))
+        late = bind_shared_scope(executor.run)
+    # Un paso vencido que termina después del request no deja su segmento vivo
+    orphan = late("obtenerInfoCliente")
+    assert producto["precio"] > 0
+    assert not _exists(orphan)
+
+
+def test_array_fingerprint_uses_the_whole_content():
+    a = np.zeros(10_000)
+    b = a.copy()
+    b[5_000] = 1.0  # Fuera de lo que muestra el repr truncado
+    assert fingerprint(a) != fingerprint(b)
+    assert fingerprint(a) == fingerprint(a.copy())
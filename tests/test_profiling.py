@@ -0,0 +1,61 @@
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from src.agent.profiling import RequestProfiler, StackSampler, bind_to_request, current_profiler
+
+
+@pytest.fixture(autouse=True)
+def _no_external_tracing():
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc ya activo fuera del perfilador")
+    yield
+
+
+def test_tracemalloc_stays_on_until_last_profiler_finishes(tmp_path):
+    first = RequestProfiler(output_dir=str(tmp_path))
+    second = RequestProfiler(output_dir=str(tmp_path))
+    assert tracemalloc.is_tracing()
+    first.finish()
+    assert tracemalloc.is_tracing()
+    # Un segundo finish() del mismo perfilador no libera la referencia ajena
+    first.finish()
+    assert tracemalloc.is_tracing()
+    second.finish()
+    assert not tracemalloc.is_tracing()
+
+
+def test_bind_to_request_attributes_worker_thread(tmp_path):
+    profiler = RequestProfiler(output_dir=str(tmp_path), trace_memory=False)
+    seen = {}
+
+    def work():
+        seen["profiler"] = current_profiler()
+        seen["registered"] = threading.get_ident() in profiler.active_threads()
+
+    with profiler.thread():
+        bound = bind_to_request(work)
+    worker = threading.Thread(target=bound)
+    worker.start()
+    worker.join()
+    assert seen == {"profiler": profiler, "registered": True}
+    assert profiler.active_threads() == set()
+    assert bind_to_request(work) is work
+    profiler.finish()
+
+
+def test_sampler_only_records_selected_threads():
+    stop = threading.Event()
+    other = threading.Thread(target=stop.wait, name="ajeno", daemon=True)
+    other.start()
+    main = threading.get_ident()
+    sampler = StackSampler(interval_ms=1, threads=lambda: {main})
+    sampler.start()
+    time.sleep(0.05)
+    sampler.stop()
+    stop.set()
+    other.join()
+    roots = {stack.split(";")[0] for stack in sampler.stacks}
+    assert roots == {threading.current_thread().name}
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from src.agent.query_cache import SemanticQueryCache
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_exact_hit_ignores_case_and_spacing():
+    cache = SemanticQueryCache(max_entries=4)
+    cache.put("Crear  un pedido", _unit(1, 0, 0), "crearPedido", 0.9)
+    entry = cache.lookup_text("crear un PEDIDO ")
+    assert entry["target"] == "crearPedido"
+    assert cache.lookup_text("enviar confirmación") is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_semantic_hit_respects_threshold():
+    cache = SemanticQueryCache(max_entries=4, threshold=0.9)
+    cache.put("crear pedido", _unit(1, 0, 0), "crearPedido", 0.9)
+    entry, similarity = cache.lookup_embedding(_unit(1, 0.2, 0))
+    assert entry["target"] == "crearPedido" and similarity >= 0.9
+    entry, similarity = cache.lookup_embedding(_unit(1, 1, 0))
+    assert entry is None and similarity < 0.9
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1 and stats["misses"] == 1
+
+
+def test_store_plan_attaches_to_existing_entry():
+    cache = SemanticQueryCache(max_entries=4)
+    cache.put("crear pedido", _unit(1, 0, 0), "crearPedido", 0.9)
+    plan = [{"name": "crearPedido", "requires": []}]
+    cache.store_plan("CREAR pedido", plan)
+    cache.store_plan("otro query", plan)
+    assert cache.lookup_text("crear pedido")["plan"] == plan
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_eviction_frees_slot_for_new_entry():
+    cache = SemanticQueryCache(max_entries=2)
+    cache.put("a", _unit(1, 0, 0), "fa", 1.0)
+    cache.put("b", _unit(0, 1, 0), "fb", 1.0)
+    cache.lookup_text("a")  # "b" pasa a ser el menos reciente
+    cache.put("c", _unit(0, 0, 1), "fc", 1.0)
+    assert cache.lookup_text("b") is None
+    assert cache.lookup_text("a")["target"] == "fa"
+    # La fila de "b" quedó en cero: su embedding ya no acierta
+    entry, _ = cache.lookup_embedding(_unit(0, 1, 0))
+    assert entry is None
+    assert cache.lookup_embedding(_unit(0, 0, 1))[0]["target"] == "fc"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_clear_drops_exact_and_semantic_matches():
+    cache = SemanticQueryCache(max_entries=2)
+    cache.put("a", _unit(1, 0, 0), "fa", 1.0)
+    cache.clear()
+    assert cache.lookup_text("a") is None
+    assert cache.lookup_embedding(_unit(1, 0, 0)) == (None, 0.0)
+    cache.put("b", _unit(0, 1, 0), "fb", 1.0)
+    cache.put("c", _unit(0, 0, 1), "fc", 1.0)
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 0
+
+
+def test_disabled_cache_and_invalid_threshold():
+    cache = SemanticQueryCache(max_entries=0)
+    assert cache.put("a", _unit(1, 0), "fa", 1.0) == {}
+    assert cache.lookup_text("a") is None
+    with pytest.raises(ValueError):
+        SemanticQueryCache(threshold=0)
+
+
+def test_entries_are_scoped_by_namespace():
+    cache = SemanticQueryCache(max_entries=4, threshold=0.9)
+    cache.put("crear pedido", _unit(1, 0, 0), "crearPedido", 0.9, namespace="ventas")
+    assert cache.lookup_text("crear pedido") is None
+    assert cache.lookup_text("crear pedido", "soporte") is None
+    assert cache.lookup_text("crear pedido", "ventas")["target"] == "crearPedido"
+    assert cache.lookup_embedding(_unit(1, 0, 0))[0] is None
+    assert cache.lookup_embedding(_unit(1, 0, 0), "ventas")[0]["namespace"] == "ventas"
+    # Mismo texto en el catálogo global: entrada propia, sin pisar la de la partición
+    cache.put("crear pedido", _unit(1, 0, 0), "otroObjetivo", 0.9)
+    cache.store_plan("crear pedido", [{"name": "otroObjetivo", "requires": []}])
+    assert cache.lookup_text("crear pedido", "ventas")["plan"] is None
+    assert cache.stats()["entries"] == 2
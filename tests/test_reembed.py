@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from src.agent.reembed import BulkReembedder, load_checkpoint, save_checkpoint
+
+
+class _Catalog:
+    """Doble de FunctionGraphInitializer: descripciones por páginas y escrituras en memoria"""
+
+    def __init__(self, names):
+        self.rows = [{"name": name, "description": f"función {name}"} for name in sorted(names)]
+        self.written = []
+
+    def iter_descriptions(self, page_size, after=""):
+        rows = [row for row in self.rows if row["name"] > after]
+        for i in range(0, len(rows), page_size):
+            yield rows[i:i + page_size]
+
+    def update_embeddings(self, rows):
+        self.written.extend(row["name"] for row in rows)
+
+
+def test_incomplete_checkpoint_of_the_same_model_resumes(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    save_checkpoint(path, {"model": "m", "after": "b", "processed": 2})
+    assert load_checkpoint(path, "m")["after"] == "b"
+    assert load_checkpoint(path, "otro") == {"model": "otro", "after": "", "processed": 0}
+
+
+def test_completed_checkpoint_starts_over(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    save_checkpoint(path, {"model": "m", "after": "c", "processed": 3, "complete": True})
+    assert load_checkpoint(path, "m") == {"model": "m", "after": "", "processed": 0}
+
+
+def test_rerun_after_a_completed_run_reembeds_everything(tmp_path):
+    pytest.importorskip("sentence_transformers")
+    path = str(tmp_path / "checkpoint.json")
+    catalog = _Catalog(["a", "b", "c"])
+    reembedder = BulkReembedder(catalog, workers=1, page_size=2, batch_size=2, checkpoint_path=path)
+    assert reembedder.run()["processed"] == 3
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["complete"]
+    # La segunda corrida no "reanuda" una corrida terminada con 0 filas
+    assert reembedder.run()["processed"] == 3
+    assert catalog.written == ["a", "b", "c"] * 2
@@ -0,0 +1,84 @@
+import gzip
+import json
+
+import pytest
+
+from src.agent import replay
+from src.agent.replay import RecordingRegistry, ReplayRegistry, load_trace, summarize
+
+
+def _registry():
+    return {
+        "precio": lambda producto=None: {"total": (producto or {}).get("precio", 0) * 2},
+        "stock": lambda producto=None: {"disponible": True},
+    }
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    path = str(tmp_path / "trace.json.gz")
+    recording = RecordingRegistry(_registry(), path)
+    recording["precio"](producto={"precio": 10})
+    recording["precio"](producto={"precio": 5})
+    recording["precio"](producto={"precio": 10})
+    recording["stock"](producto={"precio": 10})
+    assert recording.calls() == 4
+    recording.save()
+    return path
+
+
+def test_trace_deduplicates_outputs(trace_path):
+    trace = load_trace(trace_path)
+    # {"total": 20} se grabó dos veces pero se guarda una sola
+    assert len(trace["outputs"]) == 3
+    assert [call[1] for call in trace["calls"]["precio"]] == [0, 1, 0]
+
+
+def test_replay_returns_recorded_outputs_by_inputs(trace_path):
+    registry = ReplayRegistry(trace_path, timing="none")
+    assert registry["precio"](producto={"precio": 5}) == {"total": 10}
+    first = registry["precio"](producto={"precio": 10})
+    assert first == {"total": 20}
+    first["total"] = -1  # Cada llamada entrega una copia
+    assert registry["precio"](producto={"precio": 10}) == {"total": 20}
+    assert registry.stats() == {"replayed": 3, "unmatched": 0}
+
+
+def test_sequence_timing_replays_recorded_durations_in_order(trace_path, monkeypatch):
+    slept = []
+    monkeypatch.setattr(replay.time, "sleep", slept.append)
+    registry = ReplayRegistry(trace_path, timing="sequence", speed=2.0)
+    recorded = [call[2] for call in load_trace(trace_path)["calls"]["precio"] if call[1] == 0]
+    for _ in range(3):
+        registry["precio"](producto={"precio": 10})
+    # Cursor por (función, entradas): vuelve al inicio al agotar la secuencia
+    expected = [ms / 1000 / 2.0 for ms in recorded + recorded[:1] if ms > 0]
+    assert slept == pytest.approx(expected)
+
+
+def test_unmatched_inputs_fall_back_to_any_recorded_call(trace_path):
+    registry = ReplayRegistry(trace_path, timing="none")
+    assert registry["precio"](producto={"precio": 99}) == {"total": 20}
+    assert registry["precio"](producto={"precio": 99}) == {"total": 10}
+    assert registry.stats()["unmatched"] == 2
+    assert "otra" not in registry
+
+
+def test_summarize_counts_calls_inputs_and_outputs(trace_path):
+    rows = {row["function"]: row for row in summarize(load_trace(trace_path))}
+    assert rows["precio"]["calls"] == 3
+    assert rows["precio"]["distinct_inputs"] == 2
+    assert rows["precio"]["distinct_outputs"] == 2
+    assert rows["stock"]["max_ms"] >= rows["stock"]["p50_ms"] >= 0
+
+
+def test_rejects_unknown_version_and_bad_options(tmp_path, trace_path):
+    path = tmp_path / "old.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"version": 0, "outputs": [], "calls": {}}, f)
+    with pytest.raises(ValueError, match="Versión"):
+        load_trace(str(path))
+    with pytest.raises(ValueError):
+        ReplayRegistry(trace_path, timing="real")
+    with pytest.raises(ValueError):
+        ReplayRegistry(trace_path, speed=0)
@@ -0,0 +1,77 @@
+from src.agent.result_cache import ResultCache, fingerprint, inputs_fingerprint
+
+PLAN = [
+    {"name": "obtenerInfoProducto", "requires": []},
+    {"name": "verificarStock", "requires": ["obtenerInfoProducto"]},
+    {"name": "calcularPrecioTotal", "requires": ["obtenerInfoProducto"]},
+    {"name": "crearPedido", "requires": ["verificarStock", "calcularPrecioTotal"]},
+]
+
+
+def _filled_cache():
+    cache = ResultCache(max_entries=16, default_ttl=60)
+    cache.observe_plan(PLAN)
+    for step in PLAN:
+        cache.put(step["name"], "fp", step["name"])
+    cache.put("otraFuncion", "fp", "x")
+    return cache
+
+
+def test_hit_after_put_and_miss_for_other_inputs():
+    cache = ResultCache(default_ttl=60)
+    cache.put("f", "a", {"v": 1})
+    assert cache.get("f", "a") == (True, {"v": 1})
+    assert cache.get("f", "b") == (False, None)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_zero_ttl_is_never_cached():
+    cache = ResultCache(ttls={"crearPedido": 0, "f": 10})
+    assert not cache.is_cacheable("crearPedido") and cache.is_cacheable("f")
+    cache.put("crearPedido", "a", 1)
+    assert cache.get("crearPedido", "a") == (False, None)
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.agent.result_cache.time.monotonic", lambda: now[0])
+    cache = ResultCache(ttls={"f": 5})
+    cache.put("f", "a", 1)
+    now[0] = 104.0
+    assert cache.get("f", "a") == (True, 1)
+    now[0] = 106.0
+    assert cache.get("f", "a") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = ResultCache(max_entries=2, default_ttl=60)
+    cache.put("f", "a", 1)
+    cache.put("f", "b", 2)
+    cache.get("f", "a")
+    cache.put("f", "c", 3)
+    assert cache.get("f", "b") == (False, None)
+    assert cache.get("f", "a")[0] and cache.get("f", "c")[0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidation_cascades_to_transitive_dependents():
+    cache = _filled_cache()
+    assert cache.invalidate("obtenerInfoProducto") == sorted(step["name"] for step in PLAN)
+    for step in PLAN:
+        assert cache.get(step["name"], "fp") == (False, None)
+    assert cache.get("otraFuncion", "fp") == (True, "x")
+
+
+def test_invalidation_leaves_upstream_functions():
+    cache = _filled_cache()
+    assert cache.invalidate("verificarStock") == ["crearPedido", "verificarStock"]
+    assert cache.get("obtenerInfoProducto", "fp")[0]
+    assert cache.get("calcularPrecioTotal", "fp")[0]
+
+
+def test_inputs_fingerprint_follows_upstream_results():
+    base = inputs_fingerprint({"a": {"x": 1, "y": [1, 2]}, "b": 2})
+    assert base == inputs_fingerprint({"b": 2, "a": {"y": [1, 2], "x": 1}})
+    assert base != inputs_fingerprint({"a": {"x": 2, "y": [1, 2]}, "b": 2})
+    assert fingerprint({1, 2}) == fingerprint({2, 1})
@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.agent.scheduler import CostAwareScheduler
+
+
+def _step(name, cost, requires=()):
+    return {"name": name, "requires": list(requires), "avg_duration_ms": cost}
+
+
+# Una cadena larga (a → b → c) y dos pasos cortos independientes
+PLAN = [
+    _step("a", 10), _step("b", 10, ["a"]), _step("c", 10, ["b"]),
+    _step("x", 5), _step("y", 5),
+]
+
+
+def test_upward_rank_is_cost_plus_longest_tail():
+    ranks = CostAwareScheduler(max_workers=2).upward_ranks(PLAN)
+    assert ranks == {"a": 30.0, "b": 20.0, "c": 10.0, "x": 5.0, "y": 5.0}
+
+
+def test_missing_costs_use_the_default():
+    scheduler = CostAwareScheduler(max_workers=1, default_cost_ms=3.0)
+    assert scheduler.estimate_costs([{"name": "a", "requires": [], "avg_duration_ms": None}]) == {"a": 3.0}
+
+
+def test_simulate_starts_the_critical_path_first():
+    schedule = CostAwareScheduler(max_workers=2).simulate(PLAN)
+    first = {item["name"] for item in schedule["schedule"] if item["start_ms"] == 0.0}
+    assert "a" in first
+    # La cadena marca el makespan: los pasos cortos caben en el otro worker
+    assert schedule["makespan_ms"] == 30.0
+
+
+def test_simulate_with_one_worker_is_the_sum_of_costs():
+    assert CostAwareScheduler(max_workers=1).simulate(PLAN)["makespan_ms"] == 40.0
+
+
+def test_requires_outside_the_plan_are_ignored():
+    plan = [_step("b", 1, ["a"])]
+    assert CostAwareScheduler(max_workers=1).simulate(plan)["makespan_ms"] == 1.0
+
+
+def test_rejects_non_positive_workers():
+    with pytest.raises(ValueError):
+        CostAwareScheduler(max_workers=0)
+
+
+def test_execute_runs_dependencies_first_and_passes_their_outputs():
+    seen = {}
+
+    def run_step(name, inputs):
+        seen[name] = dict(inputs)
+        return name.upper()
+
+    results, durations, completed = CostAwareScheduler(max_workers=2).execute(PLAN, run_step)
+    assert results == {name: name.upper() for name in "abcxy"}
+    assert set(durations) == set(results)
+    assert completed.index("a") < completed.index("b") < completed.index("c")
+    assert seen["c"] == {"b": "B"}
+    assert seen["a"] == {}
+
+
+@pytest.mark.parametrize("shared_pool", [False, True])
+def test_execute_bounds_parallelism_to_max_workers(shared_pool):
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def run_step(name, inputs):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+
+    plan = [_step(str(i), 1) for i in range(8)]
+    pool = ThreadPoolExecutor(max_workers=8) if shared_pool else None
+    try:
+        CostAwareScheduler(max_workers=2).execute(plan, run_step, pool=pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    assert active[1] <= 2
+
+
+def test_step_timeout_drops_the_step_and_its_dependents():
+    def run_step(name, inputs):
+        time.sleep(0.3 if name == "b" else 0.001)
+        return name
+
+    start = time.monotonic()
+    results, _, completed = CostAwareScheduler(max_workers=2).execute(PLAN, run_step, step_timeout_s=0.05)
+    assert time.monotonic() - start < 0.25
+    assert set(results) == {"a", "x", "y"}
+    assert "b" not in completed and "c" not in completed
+
+
+def test_deadline_stops_launching_new_steps():
+    def run_step(name, inputs):
+        time.sleep(0.05)
+        return name
+
+    plan = [_step("a", 1), _step("b", 1, ["a"]), _step("c", 1, ["b"])]
+    results, _, _ = CostAwareScheduler(max_workers=1).execute(
+        plan, run_step, deadline=time.monotonic() + 0.07
+    )
+    assert "a" in results and "c" not in results
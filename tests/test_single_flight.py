@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from src.agent.single_flight import SingleFlight
+
+
+def _wait_for(condition, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "la condición no se cumplió a tiempo"
+        time.sleep(0.001)
+
+
+def _join(flight, key, fn, outcomes):
+    def call():
+        try:
+            outcomes.append(("ok", flight.do(key, fn)))
+        except Exception as e:
+            outcomes.append(("error", e))
+    thread = threading.Thread(target=call)
+    thread.start()
+    return thread
+
+
+def test_concurrent_calls_share_the_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        release.wait(5)
+        return {"total": 10}
+
+    outcomes = []
+    threads = [_join(flight, "plan", work, outcomes)]
+    _wait_for(lambda: runs)
+    threads += [_join(flight, "plan", work, outcomes) for _ in range(3)]
+    _wait_for(lambda: flight.stats()["coalesced"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(runs) == 1
+    assert sorted(shared for _, (_, shared) in outcomes) == [False, True, True, True]
+    assert all(value == {"total": 10} for _, (value, _) in outcomes)
+
+
+def test_leader_error_reaches_every_waiter_and_releases_the_key():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    outcomes = []
+    threads = [_join(flight, "plan", failing, outcomes)]
+    started.wait(5)
+    threads += [_join(flight, "plan", failing, outcomes) for _ in range(2)]
+    _wait_for(lambda: flight.stats()["coalesced"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert [kind for kind, _ in outcomes] == ["error"] * 3
+    # Todos reciben la misma excepción del líder
+    assert len({id(error) for _, error in outcomes}) == 1
+    stats = flight.stats()
+    assert stats["in_flight"] == 0 and stats["by_key"]["plan"]["errors"] == 1
+    # La clave quedó libre: la siguiente llamada ejecuta de nuevo
+    assert flight.do("plan", lambda: "ok") == ("ok", False)
+
+
+def test_different_keys_do_not_coalesce_and_stats_are_bounded():
+    flight = SingleFlight(max_tracked_keys=2)
+    for key in ["a", "b", "c"]:
+        assert flight.do(key, lambda: key) == (key, False)
+    stats = flight.stats()
+    assert stats["calls"] == 2 and stats["coalesced"] == 0
+    with pytest.raises(KeyError):
+        flight.do("d", lambda: {}["x"])
+    assert flight.stats()["in_flight"] == 0